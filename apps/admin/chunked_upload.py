@@ -0,0 +1,280 @@
+# 文档的分片上传
+# 前端把文件切成固定大小的分片，按序号分别上传，每个分片直接写到磁盘上的临时目录，不在内存里拼接整个文件；
+# 上传记录和已经收到的分片序号保存在redis里，中途断开的话查一下进度，只补传缺少的分片即可；
+# 最后一个分片到达后请求马上返回，由后台线程池把分片合并成一个文件，再按文件名推送到文件存储(utils.storage)，
+# 前端轮询进度拿到文件地址；合并时顺便计算SHA-256，同样内容的文件上传过的话不再推送
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from docs.constants import DOC_CONTENT_TYPES
+from utils import redis_lock
+from utils.storage import StorageError, get_storage
+from . import constants
+from . import upload_dedupe
+
+logger = logging.getLogger('django')
+
+# 上传状态
+STATUS_UPLOADING = 'uploading'
+STATUS_QUEUED = 'queued'
+STATUS_PUSHING = 'pushing'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+_executor = ThreadPoolExecutor(max_workers=constants.DOC_UPLOAD_PUSH_WORKERS)
+
+
+class UploadError(Exception):
+    pass
+
+
+def _upload_key(upload_id):
+    return 'doc_upload_{}'.format(upload_id)
+
+
+def _chunks_key(upload_id):
+    return 'doc_upload_{}_chunks'.format(upload_id)
+
+
+def _push_lock_key(upload_id):
+    return 'doc_upload_{}_push'.format(upload_id)
+
+
+def _spool_root():
+    return os.path.join(settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir(), 'doc_uploads')
+
+
+def _spool_dir(upload_id):
+    return os.path.join(_spool_root(), upload_id)
+
+
+def _chunk_path(upload_id, index):
+    return os.path.join(_spool_dir(upload_id), '{:06d}.part'.format(index))
+
+
+def _clean_expired_spool():
+    '''
+    删除过期的上传留下的临时目录（上传到一半就放弃了的）
+    '''
+    root = _spool_root()
+    if not os.path.isdir(root):
+        return
+    deadline = time.time() - constants.DOC_UPLOAD_EXPIRES
+    for entry in os.scandir(root):
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < deadline:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def create_upload(filename, size):
+    '''
+    新建一次上传
+    :return: 上传信息，见get_upload
+    :raise UploadError: 文件类型或大小不符合要求
+    '''
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if ext not in DOC_CONTENT_TYPES:
+        raise UploadError('不支持上传这种类型的文件')
+    if size <= 0 or size > constants.DOC_UPLOAD_MAX_SIZE:
+        raise UploadError('文件大小不能超过{}MB'.format(constants.DOC_UPLOAD_MAX_SIZE // 1024 // 1024))
+
+    _clean_expired_spool()
+    upload_id = uuid.uuid4().hex
+    os.makedirs(_spool_dir(upload_id))
+    con_redis = get_redis_connection(alias='default')
+    pl = con_redis.pipeline()
+    pl.hmset(_upload_key(upload_id), {
+        'filename': filename,
+        'ext': ext,
+        'size': size,
+        'chunk_size': constants.DOC_UPLOAD_CHUNK_SIZE,
+        'total_chunks': (size + constants.DOC_UPLOAD_CHUNK_SIZE - 1) // constants.DOC_UPLOAD_CHUNK_SIZE,
+        'status': STATUS_UPLOADING,
+    })
+    pl.expire(_upload_key(upload_id), constants.DOC_UPLOAD_EXPIRES)
+    pl.execute()
+    return get_upload(upload_id)
+
+
+def get_upload(upload_id):
+    '''
+    :return: {'upload_id', 'filename', 'size', 'chunk_size', 'total_chunks', 'received', 'status', 'error', 'url'}，
+             上传不存在或已过期时返回None
+    '''
+    # upload_id会拼到临时目录的路径里，只接受create_upload生成的格式
+    if not re.fullmatch(r'[0-9a-f]{32}', upload_id):
+        return None
+    con_redis = get_redis_connection(alias='default')
+    pl = con_redis.pipeline()
+    pl.hgetall(_upload_key(upload_id))
+    pl.smembers(_chunks_key(upload_id))
+    pl.exists(_push_lock_key(upload_id))
+    info, chunks, pushing = pl.execute()
+    if not info:
+        return None
+    info = {k.decode('utf8'): v.decode('utf8') for k, v in info.items()}
+    if info['status'] in (STATUS_QUEUED, STATUS_PUSHING) and not pushing:
+        # 推送的进程挂了（重启、部署、OOM），锁过期后按失败处理，可以重新推送
+        info['status'] = STATUS_FAILED
+        info['error'] = '保存文件中断，请重试'
+    return {
+        'upload_id': upload_id,
+        'filename': info['filename'],
+        'ext': info['ext'],
+        'size': int(info['size']),
+        'chunk_size': int(info['chunk_size']),
+        'total_chunks': int(info['total_chunks']),
+        'received': sorted(int(i) for i in chunks),
+        'status': info['status'],
+        'error': info.get('error', ''),
+        'url': info.get('url', ''),
+    }
+
+
+def save_chunk(upload_id, index, stream, length):
+    '''
+    保存一个分片，所有分片都到齐后开始推送到文件存储
+    :param stream: 有read方法的对象（request），分块读取写到磁盘
+    :param length: 分片的字节数
+    :return: 上传信息
+    :raise UploadError: 上传不存在、序号或大小不对
+    '''
+    upload = get_upload(upload_id)
+    if not upload:
+        raise UploadError('上传记录不存在或已过期，请重新上传')
+    if upload['status'] not in (STATUS_UPLOADING, STATUS_FAILED):
+        return upload
+    if not 0 <= index < upload['total_chunks']:
+        raise UploadError('分片序号不正确')
+    # 除了最后一个分片，其他分片的大小都必须是chunk_size
+    expected = min(upload['chunk_size'], upload['size'] - index * upload['chunk_size'])
+    if length != expected:
+        raise UploadError('分片大小不正确')
+
+    path = _chunk_path(upload_id, index)
+    tmp_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+    written = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while written < length:
+                data = stream.read(min(64 * 1024, length - written))
+                if not data:
+                    break
+                f.write(data)
+                written += len(data)
+        if written != length:
+            raise UploadError('分片数据不完整')
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    con_redis = get_redis_connection(alias='default')
+    pl = con_redis.pipeline()
+    pl.sadd(_chunks_key(upload_id), index)
+    pl.expire(_chunks_key(upload_id), constants.DOC_UPLOAD_EXPIRES)
+    pl.scard(_chunks_key(upload_id))
+    received = pl.execute()[2]
+    if received == upload['total_chunks']:
+        start_push(upload_id)
+    return get_upload(upload_id)
+
+
+def start_push(upload_id):
+    '''
+    放进后台线程池推送，同一个上传同时只会有一个线程在推送
+    '''
+    con_redis = get_redis_connection(alias='default')
+    # 推送的线程所在的进程挂掉的话，锁过期后get_upload返回失败，可以重新推送
+    token = redis_lock.acquire(con_redis, _push_lock_key(upload_id), constants.DOC_UPLOAD_PUSH_LOCK_EXPIRES)
+    if not token:
+        return False
+    con_redis.hset(_upload_key(upload_id), 'status', STATUS_QUEUED)
+    _executor.submit(_push, upload_id, token)
+    return True
+
+
+def _assemble(upload):
+    '''
+    按序号把分片合并成一个文件，文件名带上原来的后缀，文件存储用它作为扩展名
+    :return: (文件路径, 文件内容的SHA-256)
+    '''
+    path = os.path.join(_spool_dir(upload['upload_id']), 'file.{}'.format(upload['ext']))
+    sha = upload_dedupe.new_hash()
+    with open(path, 'wb') as f:
+        for index in range(upload['total_chunks']):
+            with open(_chunk_path(upload['upload_id'], index), 'rb') as chunk:
+                for data in iter(lambda: chunk.read(64 * 1024), b''):
+                    sha.update(data)
+                    f.write(data)
+    return path, sha.hexdigest()
+
+
+def _finish(con_redis, upload_id, file_id):
+    con_redis.hmset(_upload_key(upload_id), {
+        'status': STATUS_DONE,
+        'url': get_storage().url(file_id),
+        'error': '',
+    })
+    shutil.rmtree(_spool_dir(upload_id), ignore_errors=True)
+    logger.info('文档上传完成[ upload_id: {} file_id: {} ]'.format(upload_id, file_id))
+
+
+def _push(upload_id, token):
+    con_redis = get_redis_connection(alias='default')
+    key = _upload_key(upload_id)
+    lock_key = _push_lock_key(upload_id)
+
+    def still_locked():
+        # 续期；锁已经过期并被别的线程拿走的话（重新推送了），这里不再继续，也不再修改状态
+        if redis_lock.renew(con_redis, lock_key, token, constants.DOC_UPLOAD_PUSH_LOCK_EXPIRES):
+            return True
+        logger.warning('文档推送的锁已经被其他线程拿走，停止推送[ upload_id: {} ]'.format(upload_id))
+        return False
+
+    try:
+        # 在线程池里排队太久的话锁可能已经过期了
+        if not still_locked():
+            return
+        upload = get_upload(upload_id)
+        if not upload:
+            return
+        path, digest = _assemble(upload)
+        if not still_locked():
+            return
+        file_id = upload_dedupe.get_file(digest)
+        if file_id:
+            _finish(con_redis, upload_id, file_id)
+            return
+        con_redis.hset(key, 'status', STATUS_PUSHING)
+
+        error = ''
+        for attempt in range(constants.DOC_UPLOAD_PUSH_RETRIES):
+            if not still_locked():
+                return
+            try:
+                file_id = get_storage().save_file(path)
+            except StorageError as e:
+                error = str(e)
+                logger.error('文档推送异常[第{}次][ upload_id: {} error: {} ]'.format(attempt + 1, upload_id, e))
+                continue
+            upload_dedupe.set_file(digest, file_id)
+            _finish(con_redis, upload_id, file_id)
+            return
+        con_redis.hmset(key, {'status': STATUS_FAILED, 'error': error})
+    except Exception as e:
+        logger.error('文档合并分片异常[ upload_id: {} error: {} ]'.format(upload_id, e))
+        con_redis.hmset(key, {'status': STATUS_FAILED, 'error': str(e)})
+    finally:
+        redis_lock.release(con_redis, lock_key, token)
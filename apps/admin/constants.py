@@ -5,4 +5,45 @@ SHOW_HOTNEWS_COUNT = 3
 PER_PAGE_NEWS_COUNT = 8
 
 # 轮播图数
-SHOW_BANNER_COUNT = 6
\ No newline at end of file
+SHOW_BANNER_COUNT = 6
+
+# 分片上传文档：每个分片的大小，单位字节
+DOC_UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024
+
+# 分片上传文档：文件大小上限，单位字节
+DOC_UPLOAD_MAX_SIZE = 1024 * 1024 * 1024
+
+# 分片上传文档：上传记录和临时文件的保留时间，单位秒（过期后需要重新上传）
+DOC_UPLOAD_EXPIRES = 24 * 60 * 60
+
+# 分片上传文档：后台推送到FastDFS的线程数
+DOC_UPLOAD_PUSH_WORKERS = 4
+
+# 分片上传文档：推送到FastDFS失败时的重试次数
+DOC_UPLOAD_PUSH_RETRIES = 3
+
+# 分片上传文档：推送时加的锁的过期时间(秒)，推送的线程每一步都会续期；
+# 锁不在了而状态还是排队中/推送中，说明推送的进程挂了，可以重新推送
+DOC_UPLOAD_PUSH_LOCK_EXPIRES = 10 * 60
+
+# 上传图片生成的尺寸：(名称, 最大宽度, 最大高度)，按比例缩小，不裁剪
+# thumbnail用于新闻列表、热门新闻卡片，banner用于轮播图，full用于文章详情和富文本里的图片
+IMAGE_VARIANTS = (
+    ('thumbnail', 480, 320),
+    ('banner', 1200, 600),
+    ('full', 1920, 1920),
+)
+
+# 上传图片重新压缩成渐进式JPEG的质量
+IMAGE_JPEG_QUALITY = 82
+
+# 上传图片时并行处理和上传各个尺寸的线程数
+IMAGE_UPLOAD_WORKERS = 3
+
+# 上传文件去重：文件内容的SHA-256 -> 存储的file_id，在redis中的key（哈希）的前缀，
+# 后面接存储配置的版本，换了存储后旧的记录不再使用
+UPLOAD_DEDUPE_FILES_REDIS_KEY = 'upload_dedupe_files'
+
+# 上传图片去重：原图内容的SHA-256 -> 各个尺寸的file_id(json)，在redis中的key（哈希）的前缀，
+# 后面接存储配置和IMAGE_VARIANTS、IMAGE_JPEG_QUALITY的版本，改了尺寸或质量后重新生成
+UPLOAD_DEDUPE_IMAGES_REDIS_KEY = 'upload_dedupe_images'
\ No newline at end of file
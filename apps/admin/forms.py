@@ -19,7 +19,8 @@ class NewsPubForm(forms.ModelForm):
     class Meta:
         model = News # 与数据库模型关联
         # 把需要用到的字段进行关联
-        fields = ['title', 'digest', 'content', 'image_url', 'tag'] # 或者把不需要的字段用 exclude 排除
+        # thumbnail_url和banner_url是上传图片时生成的其他尺寸，可以为空
+        fields = ['title', 'digest', 'content', 'image_url', 'thumbnail_url', 'banner_url', 'tag'] # 或者把不需要的字段用 exclude 排除
         error_messages = {
             'title': {
                 'max_length': '文章标题长度不能超过150',
@@ -0,0 +1,106 @@
+# 上传图片的处理
+# 用Pillow解码一次，按EXIF方向摆正后丢掉EXIF等元数据，缩放出几个尺寸(见constants.IMAGE_VARIANTS)，
+# 分别压缩成渐进式JPEG，再并行上传到文件存储(utils.storage)；列表、轮播图、详情页各自使用合适的尺寸
+# 动图(GIF)缩放会丢掉动画，原样上传
+# 同一张图片再次上传时按内容的SHA-256直接返回之前的地址（见upload_dedupe.py）
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from utils.storage import StorageError, get_storage
+from . import constants
+from . import upload_dedupe
+
+logger = logging.getLogger('django')
+
+_executor = ThreadPoolExecutor(max_workers=constants.IMAGE_UPLOAD_WORKERS)
+
+# 新闻图片需要的尺寸和富文本里的图片需要的尺寸
+NEWS_VARIANTS = tuple(name for name, _, _ in constants.IMAGE_VARIANTS)
+CONTENT_VARIANTS = ('full',)
+
+
+class ImageError(Exception):
+    pass
+
+
+def _open(data):
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEG在解码时就按比例缩小（DCT缩放），手机拍的大图解码快很多，内存也小
+        max_size = max(max(w, h) for _, w, h in constants.IMAGE_VARIANTS)
+        image.draft('RGB', (max_size, max_size))
+        image.load()
+    except Exception as e:
+        raise ImageError('图片格式不正确：{}'.format(e))
+    return image
+
+
+def _normalize(image):
+    '''
+    按EXIF的方向旋转，转换成RGB，透明的部分填成白色
+    '''
+    if hasattr(ImageOps, 'exif_transpose'):
+        image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, width, height):
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    # 不传exif参数，保存出来的图片不带任何元数据
+    image.save(buffer, 'JPEG', quality=constants.IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def _upload(data, ext_name):
+    '''
+    :return: 文件存储的file_id
+    '''
+    try:
+        return get_storage().save(data, ext_name)
+    except StorageError as e:
+        logger.error('图片上传异常：{}'.format(e))
+        raise ImageError('图片上传到服务器失败')
+
+
+def _encode_and_upload(image, width, height):
+    return _upload(_encode(image, width, height), 'jpg')
+
+
+def process_and_upload(image_file, ext_name, variants=NEWS_VARIANTS):
+    '''
+    :param image_file: django的UploadedFile
+    :param ext_name: 原来的扩展名，动图原样上传时使用
+    :param variants: 需要的尺寸名称
+    :return: {尺寸名称: 图片url}
+    :raise ImageError: 图片无法解码或上传失败
+    '''
+    # 先按块计算哈希，命中的话不用把图片读进内存
+    digest = upload_dedupe.file_digest(image_file)
+    file_ids = upload_dedupe.get_image(digest)
+    missing = [name for name in variants if name not in file_ids]
+    if missing:
+        data = image_file.read()
+        image = _open(data)
+        if getattr(image, 'is_animated', False):
+            file_id = _upload(data, ext_name)
+            new_ids = {name: file_id for name in missing}
+        else:
+            image = _normalize(image)
+            sizes = {name: (w, h) for name, w, h in constants.IMAGE_VARIANTS}
+            # Pillow缩放和编码时会释放GIL，几个尺寸在线程池里同时处理和上传
+            futures = {name: _executor.submit(_encode_and_upload, image, *sizes[name]) for name in missing}
+            new_ids = {name: future.result() for name, future in futures.items()}
+        upload_dedupe.set_image(digest, new_ids)
+        file_ids = dict(file_ids, **new_ids)
+    storage = get_storage()
+    return {name: storage.url(file_ids[name]) for name in variants}
@@ -0,0 +1,64 @@
+# 后台文章管理列表的查询
+# 标题、作者、标签、时间的过滤和总数都交给搜索索引(NewsIndex)处理，不在数据库里做 LIKE '%x%' 的全表扫描和COUNT(*)；
+# 索引里只拿到当前页的主键，再按主键从数据库查出这一页的文章
+# 索引是后台任务异步更新的，刚发布或修改的文章要等flush_search_index跑过之后才会出现在列表里
+from django.utils import timezone
+from haystack.query import SearchQuerySet
+
+from news import models
+
+
+def _aware(value):
+    if value and timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+def search_news(start_time='', end_time='', title='', author_name='', tag_id=0):
+    '''
+    :return: haystack的SearchQuerySet，按更新时间倒序，可以直接交给Paginator
+    '''
+    sqs = SearchQuerySet().models(models.News)
+    # 标签和时间这种便宜的条件放在前面，先缩小范围
+    if tag_id:
+        sqs = sqs.filter(tag_id=tag_id)
+    if start_time:
+        sqs = sqs.filter(update_time__gte=_aware(start_time))
+    if end_time:
+        sqs = sqs.filter(update_time__lte=_aware(end_time))
+    # n-gram字段直接按词匹配，查询的内容同样切成n-gram，每一段都要出现
+    if title:
+        sqs = sqs.filter(title_ngram=title)
+    if author_name:
+        sqs = sqs.filter(author_ngram=author_name)
+    return sqs.order_by('-update_time')
+
+
+def search_news_db(start_time='', end_time='', title='', author_name='', tag_id=0):
+    '''
+    直接查数据库，索引不可用时使用
+    '''
+    newses = models.News.objects.select_related('author', 'tag').\
+        only('title', 'author__username', 'tag__name', 'update_time').filter(is_delete=False)
+    if tag_id:
+        newses = newses.filter(tag_id=tag_id)
+    if start_time:
+        newses = newses.filter(update_time__gte=start_time)
+    if end_time:
+        newses = newses.filter(update_time__lte=end_time)
+    if title:
+        newses = newses.filter(title__icontains=title)
+    if author_name:
+        newses = newses.filter(author__username__icontains=author_name)
+    return newses
+
+
+def load_page(page):
+    '''
+    把分页里的搜索结果换成数据库里的文章，顺序不变；已经删除、索引还没来得及更新的跳过
+    '''
+    pks = [int(result.pk) for result in page.object_list]
+    newses = models.News.objects.select_related('author', 'tag').\
+        only('title', 'author__username', 'tag__name', 'update_time').filter(is_delete=False).in_bulk(pks)
+    page.object_list = [newses[pk] for pk in pks if pk in newses]
+    return page
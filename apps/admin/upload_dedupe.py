@@ -0,0 +1,98 @@
+# 上传文件的去重
+# 用文件内容的SHA-256作为key记下上传到存储后的file_id，同样的文件再次上传时直接返回之前的地址，
+# 不再写存储；计算哈希时按块读取，不把整个文件读进内存
+# 图片记的是各个尺寸的file_id，命中时连解码、缩放都省掉了
+# redis的key里带着版本：由存储配置(FILE_STORAGE和访问地址)算出，图片还要加上IMAGE_VARIANTS和IMAGE_JPEG_QUALITY，
+# 换了存储或者改了尺寸、质量之后用的是新的key，不会返回旧存储里的、或者按旧规格生成的file_id；旧的key不再读写
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from utils.storage import get_storage
+from . import constants
+
+logger = logging.getLogger('django')
+
+
+def _version(*parts):
+    return hashlib.sha1(repr(parts).encode('utf8')).hexdigest()[:12]
+
+
+def _storage_parts():
+    # 访问地址区分了同一种存储的不同集群/目录
+    return settings.FILE_STORAGE, get_storage().url('')
+
+
+def _files_key():
+    return '{}_{}'.format(constants.UPLOAD_DEDUPE_FILES_REDIS_KEY, _version(*_storage_parts()))
+
+
+def _images_key():
+    version = _version(*_storage_parts(), constants.IMAGE_VARIANTS, constants.IMAGE_JPEG_QUALITY)
+    return '{}_{}'.format(constants.UPLOAD_DEDUPE_IMAGES_REDIS_KEY, version)
+
+
+def new_hash():
+    return hashlib.sha256()
+
+
+def file_digest(uploaded_file):
+    '''
+    :param uploaded_file: django的UploadedFile，按块计算
+    :return: 十六进制的SHA-256
+    '''
+    sha = new_hash()
+    for chunk in uploaded_file.chunks():
+        sha.update(chunk)
+    uploaded_file.seek(0)
+    return sha.hexdigest()
+
+
+def get_file(digest):
+    '''
+    :return: 之前上传过的file_id，没有时返回None
+    '''
+    try:
+        con_redis = get_redis_connection(alias='default')
+        file_id = con_redis.hget(_files_key(), digest)
+    except Exception as e:
+        # redis出问题时当作没有上传过，照常上传
+        logger.error('读取上传去重记录异常：{}'.format(e))
+        return None
+    return file_id.decode('utf8') if file_id else None
+
+
+def set_file(digest, file_id):
+    try:
+        con_redis = get_redis_connection(alias='default')
+        con_redis.hset(_files_key(), digest, file_id)
+    except Exception as e:
+        logger.error('写入上传去重记录异常：{}'.format(e))
+
+
+def get_image(digest):
+    '''
+    :return: {尺寸名称: file_id}，没有时返回空字典
+    '''
+    try:
+        con_redis = get_redis_connection(alias='default')
+        value = con_redis.hget(_images_key(), digest)
+    except Exception as e:
+        logger.error('读取上传去重记录异常：{}'.format(e))
+        return {}
+    return json.loads(value.decode('utf8')) if value else {}
+
+
+def set_image(digest, file_ids):
+    '''
+    和已有的记录合并，例如富文本里只上传过原图尺寸，之后作为文章图片上传时补上其他尺寸
+    '''
+    try:
+        merged = dict(get_image(digest), **file_ids)
+        con_redis = get_redis_connection(alias='default')
+        con_redis.hset(_images_key(), digest, json.dumps(merged))
+    except Exception as e:
+        logger.error('写入上传去重记录异常：{}'.format(e))
@@ -21,6 +21,9 @@ urlpatterns = [
     path('docs/<int:doc_id>/', views.DocsEditView.as_view(), name='docs_edit'),
     path('docs/pub/', views.DocsPubView.as_view(), name='docs_pub'),
     path('docs/files/', views.DocsUploadFile.as_view(), name='upload_text'),
+    path('docs/uploads/', views.DocsUploadsView.as_view(), name='docs_uploads'),
+    path('docs/uploads/<upload_id>/', views.DocsUploadDetailView.as_view(), name='docs_upload_detail'),
+    path('docs/uploads/<upload_id>/chunks/<int:index>/', views.DocsUploadChunkView.as_view(), name='docs_upload_chunk'),
     path('courses/', views.CoursesManageView.as_view(), name='courses_manage'),
     path('courses/<int:course_id>/', views.CoursesEditView.as_view(), name='courses_edit'),
     path('courses/pub/', views.CoursesPubView.as_view(), name='courses_pub'),
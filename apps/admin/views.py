@@ -5,6 +5,7 @@ from django.core.paginator import Paginator, EmptyPage
 from django.shortcuts import render
 from django.views import View
 from news import models
+from news import clicks
 from docs.models import Doc
 from users.models import Users
 from django.contrib.auth.models import Group, Permission
@@ -16,10 +17,13 @@ from utils.res_code import Code, error_map
 from utils import paginator_script
 from . import constants
 from datetime import datetime
-from utils.fastdfs.fdfs import FDFS_Client
-from myproject1 import settings
+from utils.storage import StorageError, get_storage
 from django.http import JsonResponse, Http404
 from . import forms
+from . import chunked_upload
+from . import image_pipeline
+from . import news_search
+from . import upload_dedupe
 
 # 记录
 logger = logging.getLogger('django')
@@ -140,7 +144,8 @@ class HotNewsManageView(PermissionRequiredMixin, View):
     permission_required = ('news.view_hotnews')
     raise_exception = True
     def get(self, request):
-        hot_news = models.HotNews.objects.select_related('news__tag').only('news__title', 'news__tag__name', 'priority', 'news_id').filter(is_delete=False).order_by('priority', '-news__clicks')[0:constants.SHOW_HOTNEWS_COUNT]
+        hot_news = models.HotNews.objects.select_related('news__tag').only('news__title', 'news__tag__name', 'news__clicks', 'priority', 'news_id').filter(is_delete=False)
+        hot_news = clicks.sort_hot_news(hot_news)[0:constants.SHOW_HOTNEWS_COUNT]
         return render(request, 'admin/news/news_hot.html', locals())
 
 # 热门文章修改和删除
@@ -251,9 +256,6 @@ class NewsManageView(PermissionRequiredMixin, View):
         # 一开始访问到的页面的时候，是直接拿到全部的数据（还没输入条件）
         # 拿到标签的id和name
         tags = models.Tag.objects.only('id', 'name').filter(is_delete=False)
-        # 拿到新闻的title和update_time,以及关联上author和tag,拿到author__username,tag__name
-        newses = models.News.objects.select_related('author', 'tag').only('title', 'author__username', 'tag__name', 'update_time').filter(is_delete=False)
-
         # 通过时间进行过滤
         try:
             # 查询到的起始时间
@@ -267,26 +269,9 @@ class NewsManageView(PermissionRequiredMixin, View):
         except Exception as e:
             logger.info("用户输入的时间有误：\n{}".format(e))
             start_time = end_time = ''
-        # 多种时间查询情况下
-        # 1.有起始时间，没有结束时间
-        if start_time and not end_time:
-            newses = newses.filter(update_time__gte=start_time) # 这里的newses是前面的查询集，这里使用了链式查询的方式
-        # 2.有结束时间，没有起始时间
-        if end_time and not start_time:
-            newses = newses.filter(update_time__lte=end_time)
-        # 3.起始和结束时间都有
-        if start_time and end_time:
-            newses = newses.filter(update_time__range=(start_time, end_time))
-
-        # 通过title进行过滤
+        # 通过title、作者名进行过滤
         title = request.GET.get('title', '')
-        if title:
-            newses = newses.filter(title__icontains=title)  # icontains忽略大小写
-
-        # 通过作者名进行过滤
         author_name = request.GET.get('author_name', '')
-        if author_name:
-            newses = newses.filter(author__username__icontains=author_name)
 
         # 通过标签id进行过滤
         try:
@@ -294,12 +279,6 @@ class NewsManageView(PermissionRequiredMixin, View):
         except Exception as e:
             logger.info("标签错误：\n{}".format(e))
             tag_id = 0
-        if tag_id:
-            # 方法1：有标签id条件的时候会返回内容，没有的话会空
-            newses = newses.filter(tag_id=tag_id)
-            # 方法2：有标签id条件的时候会返回内容，没有的话会返回全部内容
-            # newses = newses.filter(is_delete=False, tag_id=tag_id) or \
-            #          newses.filter(is_delete=False)
 
         # 获取第几页内容
         try:
@@ -308,13 +287,20 @@ class NewsManageView(PermissionRequiredMixin, View):
         except Exception as e:
             logger.info("当前页数错误：\n{}".format(e))
             page = 1
-        paginator = Paginator(newses, constants.PER_PAGE_NEWS_COUNT)
+        filters = {
+            'start_time': start_time,
+            'end_time': end_time,
+            'title': title,
+            'author_name': author_name,
+            'tag_id': tag_id,
+        }
         try:
-            news_info = paginator.page(page)
-        except EmptyPage:
-            # 若用户访问的页数大于实际页数，则返回最后一页数据
-            logging.info("用户访问的页数大于总页数。")
-            news_info = paginator.page(paginator.num_pages)
+            # 过滤和总数都在搜索索引里算，数据库只查当前页
+            paginator, news_info = self._paginate(news_search.search_news(**filters), page)
+            news_search.load_page(news_info)
+        except Exception as e:
+            logger.error('后台文章列表查询索引异常，改为查数据库：{}'.format(e))
+            paginator, news_info = self._paginate(news_search.search_news_db(**filters), page)
         # 分页的算法
         paginator_data = paginator_script.get_paginator_data(paginator, news_info)
 
@@ -341,6 +327,17 @@ class NewsManageView(PermissionRequiredMixin, View):
         context.update(paginator_data) # 更新每页内容
         return render(request, 'admin/news/news_manage.html', context=context)
 
+    @staticmethod
+    def _paginate(newses, page):
+        paginator = Paginator(newses, constants.PER_PAGE_NEWS_COUNT)
+        try:
+            news_info = paginator.page(page)
+        except EmptyPage:
+            # 若用户访问的页数大于实际页数，则返回最后一页数据
+            logging.info("用户访问的页数大于总页数。")
+            news_info = paginator.page(paginator.num_pages)
+        return paginator, news_info
+
 # 文章发布功能
 class NewsPubView(PermissionRequiredMixin, View):
     '''
@@ -431,7 +428,7 @@ class NewsEditView(PermissionRequiredMixin, View):
         # 将json格式的数据转化为dict
         dict_data = json.loads(json_data.decode('utf8'))
         # 使用forms表单继承重写模型来验证和输入内容
-        form = forms.DocsPubForm(data=dict_data)
+        form = forms.NewsPubForm(data=dict_data)
         # 如果验证通过了
         if form.is_valid():
             # 就更新清晰过后的数据
@@ -439,6 +436,8 @@ class NewsEditView(PermissionRequiredMixin, View):
             news.digest = form.cleaned_data.get('digest')
             news.content = form.cleaned_data.get('content')
             news.image_url = form.cleaned_data.get('image_url')
+            news.thumbnail_url = form.cleaned_data.get('thumbnail_url')
+            news.banner_url = form.cleaned_data.get('banner_url')
             news.tag = form.cleaned_data.get('tag')
             # 且保存
             news.save()
@@ -480,24 +479,20 @@ class NewsUploadImage(PermissionRequiredMixin, View):
         except Exception as e:
             logger.info('图片拓展名异常：{}'.format(e))
             image_ext_name = 'jpg'
-        # 使用FDFS_Client自带的upload_by_buffer方法读取到用户的图片对象，上传到服务器中
+        # 解码后生成缩略图、轮播图、原图三个尺寸，并行上传到服务器中（见image_pipeline.py）
         try:
-            upload_res = FDFS_Client.upload_by_buffer(image_file.read(), file_ext_name=image_ext_name)
+            urls = image_pipeline.process_and_upload(image_file, image_ext_name)
+        except image_pipeline.ImageError as e:
+            logger.info('图片处理失败：{}'.format(e))
+            return to_json_data(errno=Code.PARAMERR, errmsg='图片上传到服务器失败了')
         except Exception as e:
             logger.info('文件上传出现异常：{}'.format(e))
             return to_json_data(errno=Code.UNKOWNERR, errmsg='图片上传异常')
-# 通过前面的upload_res = FDFS_Client。。。。。可以得到返回来的upload_res是下面的格式
-# {'Group name': 'group1', 'Remote file_id': 'group1/M00/00/00/CgACD1zWZtSAARmbAAfh_rrm7jw681.png', 'Status': 'Upload successed.', 'Local file name': 'media/2018.png', 'Uploaded size': '504.00KB', 'Storage IP': '10.0.2.15'}
-        # 判断是否能拿到upload_res里面返回的成功信息，如果没
-        else:
-            if upload_res.get('Status') != 'Upload successed.':
-                logger.info('图片上传到服务器失败！')
-                return to_json_data(Code.UNKOWNERR, errmsg='图片上传到服务器失败了')
-            # 如果有
-            else:
-                image_name = upload_res.get('Remote file_id')
-                image_url = settings.FASTDFS_SERVER_DOMAIN + image_name
-                return to_json_data(data={'image_url': image_url}, errmsg='图片上传成功！')
+        return to_json_data(data={
+            'image_url': urls['full'],
+            'thumbnail_url': urls['thumbnail'],
+            'banner_url': urls['banner'],
+        }, errmsg='图片上传成功！')
 
 # 富文本编辑器中的图片上传
 class MarkDownUploadImage(View):
@@ -518,19 +513,16 @@ class MarkDownUploadImage(View):
             logger.info('图片拓展名异常：{}'.format(e))
             image_ext_name = 'jpg'
 
+        # 富文本里的图片只需要原图尺寸，同样会去掉元数据并重新压缩
         try:
-            upload_res = FDFS_Client.upload_by_buffer(image_file.read(), file_ext_name=image_ext_name)
+            urls = image_pipeline.process_and_upload(image_file, image_ext_name, image_pipeline.CONTENT_VARIANTS)
+        except image_pipeline.ImageError as e:
+            logger.info('图片处理失败：{}'.format(e))
+            return JsonResponse({'success': 0, 'message': '图片上传到服务器失败'})
         except Exception as e:
             logger.error('图片上传出现异常：{}'.format(e))
             return JsonResponse({'success': 0, 'message': '图片上传异常'})
-        else:
-            if upload_res.get('Status') != 'Upload successed.':
-                logger.info('图片上传到FastDFS服务器失败')
-                return JsonResponse({'success': 0, 'message': '图片上传到服务器失败'})
-            else:
-                image_name = upload_res.get('Remote file_id')
-                image_url = settings.FASTDFS_SERVER_DOMAIN + image_name
-                return JsonResponse({'success': 1, 'message': '图片上传成功', 'url': image_url})
+        return JsonResponse({'success': 1, 'message': '图片上传成功', 'url': urls['full']})
 
 # 文档管理功能
 class DocsManageView(PermissionRequiredMixin, View):
@@ -623,19 +615,100 @@ class DocsUploadFile(PermissionRequiredMixin, View):
             logger.info('文件拓展名异常：{}'.format(e))
             text_ext_name = 'pdf'
 
+        # 同样内容的文件上传过的话，直接返回之前的地址
+        digest = upload_dedupe.file_digest(text_file)
+        file_id = upload_dedupe.get_file(digest)
+        storage = get_storage()
+        if file_id:
+            return to_json_data(data={'text_file': storage.url(file_id)}, errmsg='文件上传成功')
+
         try:
-            upload_res = FDFS_Client.upload_by_buffer(text_file.read(), file_ext_name=text_ext_name)
-        except Exception as e:
-            logger.error('文件上传出现异常：{}'.format(e))
-            return to_json_data(errno=Code.UNKOWNERR, errmsg='文件上传异常')
-        else:
-            if upload_res.get('Status') != 'Upload successed.':
-                logger.info('文件上传到FastDFS服务器失败')
-                return to_json_data(Code.UNKOWNERR, errmsg='文件上传到服务器失败')
+            # 超过FILE_UPLOAD_MAX_MEMORY_SIZE的文件django已经写到了临时文件里，直接按文件名上传，不再读进内存
+            if hasattr(text_file, 'temporary_file_path'):
+                file_id = storage.save_file(text_file.temporary_file_path())
             else:
-                text_name = upload_res.get('Remote file_id')
-                text_url = settings.FASTDFS_SERVER_DOMAIN + text_name
-                return to_json_data(data={'text_file': text_url}, errmsg='文件上传成功')
+                file_id = storage.save(text_file.read(), text_ext_name)
+        except StorageError as e:
+            logger.error('文件上传出现异常：{}'.format(e))
+            return to_json_data(errno=Code.UNKOWNERR, errmsg='文件上传到服务器失败')
+        upload_dedupe.set_file(digest, file_id)
+        return to_json_data(data={'text_file': storage.url(file_id)}, errmsg='文件上传成功')
+
+# 文档分片上传：新建一次上传
+class DocsUploadsView(PermissionRequiredMixin, View):
+    """
+    /admin/docs/uploads/
+    # 请求方式：post，json传参：filename, size
+    # 返回upload_id、分片大小和分片数，之后按序号上传每个分片（见chunked_upload.py）
+    """
+    permission_required = ('doc.add_doc', 'doc.change_doc')
+    raise_exception = True
+
+    def handle_no_permission(self):
+        return to_json_data(errno=Code.ROLEERR, errmsg='没有操作权限')
+    def post(self, request):
+        try:
+            dict_data = json.loads(request.body.decode('utf8'))
+            filename = str(dict_data['filename'])
+            size = int(dict_data['size'])
+        except (ValueError, KeyError, TypeError):
+            return to_json_data(errno=Code.PARAMERR, errmsg=error_map[Code.PARAMERR])
+        try:
+            upload = chunked_upload.create_upload(filename, size)
+        except chunked_upload.UploadError as e:
+            return to_json_data(errno=Code.DATAERR, errmsg=str(e))
+        return to_json_data(data=upload)
+
+# 文档分片上传：查询进度、重新推送
+class DocsUploadDetailView(PermissionRequiredMixin, View):
+    """
+    /admin/docs/uploads/<upload_id>/
+    # get：查询进度，received为已经收到的分片序号，status为done时url就是文件地址
+    # post：分片都已经收到但推送到FastDFS失败或中断时，重新推送
+    """
+    permission_required = ('doc.add_doc', 'doc.change_doc')
+    raise_exception = True
+
+    def handle_no_permission(self):
+        return to_json_data(errno=Code.ROLEERR, errmsg='没有操作权限')
+    def get(self, request, upload_id):
+        upload = chunked_upload.get_upload(upload_id)
+        if not upload:
+            return to_json_data(errno=Code.NODATA, errmsg='上传记录不存在或已过期，请重新上传')
+        return to_json_data(data=upload)
+    def post(self, request, upload_id):
+        upload = chunked_upload.get_upload(upload_id)
+        if not upload:
+            return to_json_data(errno=Code.NODATA, errmsg='上传记录不存在或已过期，请重新上传')
+        if upload['status'] == chunked_upload.STATUS_FAILED and len(upload['received']) == upload['total_chunks']:
+            chunked_upload.start_push(upload_id)
+        return to_json_data(data=chunked_upload.get_upload(upload_id))
+
+# 文档分片上传：上传一个分片
+class DocsUploadChunkView(PermissionRequiredMixin, View):
+    """
+    /admin/docs/uploads/<upload_id>/chunks/<int:index>/
+    # 请求方式：put，请求体就是分片的二进制内容
+    """
+    permission_required = ('doc.add_doc', 'doc.change_doc')
+    raise_exception = True
+
+    def handle_no_permission(self):
+        return to_json_data(errno=Code.ROLEERR, errmsg='没有操作权限')
+    def put(self, request, upload_id, index):
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return to_json_data(errno=Code.PARAMERR, errmsg=error_map[Code.PARAMERR])
+        try:
+            # 直接从请求流里分块读取写到磁盘
+            upload = chunked_upload.save_chunk(upload_id, index, request, length)
+        except chunked_upload.UploadError as e:
+            return to_json_data(errno=Code.DATAERR, errmsg=str(e))
+        except Exception as e:
+            logger.error('保存文档分片异常：{}'.format(e))
+            return to_json_data(errno=Code.UNKOWNERR, errmsg='分片上传异常')
+        return to_json_data(data=upload)
 
 # 文档的发布功能
 class DocsPubView(PermissionRequiredMixin, View):
@@ -1070,11 +1143,13 @@ class BannerAddView(PermissionRequiredMixin, View):
         except Exception as e:
             logger.info('前端传过来的文章id参数异常：{}'.format(e))
             return to_json_data(errno=Code.PARAMERR, errmsg='参数错误！')
-        if not models.News.objects.filter(id=news_id, is_delete=False).exists():
+        news = models.News.objects.only('banner_url').filter(id=news_id, is_delete=False).first()
+        if not news:
             return to_json_data(errno=Code.PARAMERR, errmsg='文章不存在！')
-        image_url = dict_data.get('image_url')
+        # 没有另外上传轮播图的话，用文章图片上传时生成的轮播图尺寸的图片
+        image_url = dict_data.get('image_url') or news.banner_url
         if not image_url:
-            return to_json_data(errno=Code.PARAMERR, errmsg='轮播图url不能为空！')
+            return to_json_data(errno=Code.PARAMERR, errmsg='这篇文章没有轮播图尺寸的图片，请上传轮播图！')
         banners_tuple = models.Banner.objects.get_or_create(news_id=news_id)
         banner, is_created =banners_tuple
         banner.image_url = image_url
@@ -48,6 +48,10 @@ class Course(ModelBase):
         db_table = "tb_course"  # 指明数据库表名
         verbose_name = "课程"  # 在admin站点中显示的名称
         verbose_name_plural = verbose_name  # 显示的复数名称
+        # 联合索引，对应 is_delete=False 的课程列表
+        indexes = [
+            models.Index(fields=['is_delete', 'update_time'], name='course_del_time_idx'),
+        ]
 
     def __str__(self):
         return self.title
\ No newline at end of file
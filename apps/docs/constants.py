@@ -0,0 +1,28 @@
+# 下载文档时连接文件服务器的超时时间，单位秒
+DOC_DOWNLOAD_CONNECT_TIMEOUT = 3
+
+# 下载文档时等待文件服务器返回数据的超时时间，单位秒
+DOC_DOWNLOAD_READ_TIMEOUT = 30
+
+# 连接文件服务器的连接池大小
+DOC_DOWNLOAD_POOL_SIZE = 10
+
+# 读写文件的块大小
+DOC_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 缓存超过上限时，删到上限的这个比例以下，避免每次写入都要清理
+DOC_CACHE_EVICT_RATIO = 0.9
+
+# 文档缓存：下载中断（进程被杀）留下的临时文件超过这个时间(秒)后在淘汰时删除
+DOC_CACHE_STALE_TMP_SECONDS = 24 * 60 * 60
+
+# 允许下载的文档类型
+DOC_CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'zip': 'application/zip',
+    'doc': 'application/msword',
+    'xls': 'application/vnd.ms-excel',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'ppt': 'application/vnd.ms-powerpoint',
+    'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+}
\ No newline at end of file
@@ -0,0 +1,286 @@
+# 文档下载
+# 文档保存在文件服务器上，第一次下载时拉到本地的磁盘缓存里，之后直接从本地文件返回：
+# 配置了X-Accel-Redirect时交给nginx发送文件，否则用FileResponse（gunicorn/uwsgi会用sendfile发送）
+# 缓存按最近访问时间淘汰，总大小不超过settings.DOC_CACHE['MAX_SIZE']
+# 缓存文件打开之后再用fd生成响应，之后被别的进程淘汰删除也不影响这次发送
+# 支持断点续传(Range/If-Range)和协商缓存(ETag/If-None-Match)
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from requests.adapters import HTTPAdapter
+
+from . import constants
+
+logger = logging.getLogger('django')
+
+_session = None
+_cache = None
+_lock = threading.Lock()
+
+
+def get_session():
+    '''
+    连接文件服务器用的长连接池，所有线程共用
+    '''
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=constants.DOC_DOWNLOAD_POOL_SIZE, max_retries=1)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+class DocCache(object):
+    '''
+    本地磁盘上的文档缓存，文件路径为 <目录>/<url的sha1前两位>/<url的sha1>.<后缀>
+    文件服务器上的文件内容不会变（换文件时url也会变），所以缓存不需要重新校验
+    文件的atime记录最近一次访问的时间，用于淘汰
+    '''
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    def path_for(self, url):
+        key = hashlib.sha1(url.encode('utf8')).hexdigest()
+        ext = url.rsplit('.', 1)[-1].lower()
+        return os.path.join(self.directory, key[:2], '{}.{}'.format(key, ext))
+
+    def get(self, url):
+        '''
+        :return: 缓存文件的路径，没有缓存时返回None
+        '''
+        path = self.path_for(url)
+        try:
+            st = os.stat(path)
+            # 只改atime，mtime不变，ETag也就不会变
+            os.utime(path, (time.time(), st.st_mtime))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def fetch(self, url):
+        '''
+        从文件服务器下载到缓存里，同一个文件同时只有一个进程在下载
+        :return: 缓存文件的路径
+        '''
+        path = self.path_for(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # 等锁的时候别的进程可能已经下载好了
+                if os.path.exists(path):
+                    return path
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        with get_session().get(url, stream=True, timeout=(
+                                constants.DOC_DOWNLOAD_CONNECT_TIMEOUT, constants.DOC_DOWNLOAD_READ_TIMEOUT)) as res:
+                            res.raise_for_status()
+                            for chunk in res.iter_content(constants.DOC_DOWNLOAD_CHUNK_SIZE):
+                                f.write(chunk)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        # 刚下载的文件还没有发送，不能淘汰（文件比上限还大时也一样）
+        self.evict(keep=path)
+        return path
+
+    @staticmethod
+    def _remove_lock(path):
+        '''
+        删除没有进程在用的锁文件，正在下载的进程还拿着锁，这里拿不到就跳过
+        '''
+        try:
+            with open(path, 'r') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep=None):
+        '''
+        总大小超过上限时，按最近访问时间从旧到新删除；顺便清理用完的锁文件和下载中断留下的临时文件
+        :param keep: 不删除的文件
+        '''
+        files = []
+        total = 0
+        tmp_deadline = time.time() - constants.DOC_CACHE_STALE_TMP_SECONDS
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.lock'):
+                    self._remove_lock(entry.path)
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith('.tmp'):
+                    if st.st_mtime < tmp_deadline:
+                        self._remove(entry.path)
+                    continue
+                if entry.path == keep:
+                    total += st.st_size
+                    continue
+                files.append((st.st_atime, st.st_size, entry.path))
+                total += st.st_size
+        if total <= self.max_size:
+            return
+
+        target = self.max_size * constants.DOC_CACHE_EVICT_RATIO
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            # 正在发送的文件已经打开了，删除不影响发送
+            self._remove(path)
+            total -= size
+            logger.info('文档缓存淘汰：{}'.format(path))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = DocCache(settings.DOC_CACHE['DIR'], settings.DOC_CACHE['MAX_SIZE'])
+    return _cache
+
+
+def get_file(url):
+    '''
+    :return: 打开的缓存文件(二进制)，没有缓存时从文件服务器下载；调用方负责关闭
+    '''
+    cache = get_cache()
+    path = cache.get(url)
+    for _ in range(2):
+        if path:
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:
+                # 在get和open之间被别的进程淘汰了，重新下载
+                pass
+        path = cache.fetch(url)
+    return open(path, 'rb')
+
+
+def make_etag(st):
+    # 和nginx生成ETag的方式一致，交给nginx发送文件时ETag也不会变
+    return '"{:x}-{:x}"'.format(int(st.st_mtime), st.st_size)
+
+
+def parse_range(header, size):
+    '''
+    只支持单个范围，多个范围或者格式不对时返回None（返回整个文件）
+    :return: (开始位置, 结束位置)，包含结束位置
+    :raise ValueError: 范围超出了文件大小
+    '''
+    if not header or not header.startswith('bytes='):
+        return None
+    spec = header[len('bytes='):].strip()
+    if ',' in spec or '-' not in spec:
+        return None
+    start, end = (s.strip() for s in spec.split('-', 1))
+    if not start:
+        # bytes=-500 表示最后500个字节
+        if not end.isdigit():
+            return None
+        if int(end) == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - int(end), 0), size - 1
+    if not start.isdigit() or (end and not end.isdigit()):
+        return None
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    end = int(end) if end else size - 1
+    return start, min(end, size - 1)
+
+
+def _iter_range(f, start, length):
+    with f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(constants.DOC_DOWNLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def build_response(request, f, content_type, content_disposition):
+    '''
+    根据请求头返回 304、416、206 或者整个文件
+    :param f: get_file打开的文件，发送完后关闭
+    '''
+    st = os.fstat(f.fileno())
+    etag = make_etag(st)
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = [e[2:] if e.startswith('W/') else e for e in parse_etags(if_none_match)]
+        if '*' in etags or etag in etags:
+            f.close()
+            res = HttpResponseNotModified()
+            res['ETag'] = etag
+            return res
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    # If-Range和当前的ETag不一致说明文件变了，要返回整个文件
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), st.st_size)
+        except ValueError:
+            f.close()
+            res = HttpResponse(status=416)
+            res['Content-Range'] = 'bytes */{}'.format(st.st_size)
+            return res
+
+    accel_prefix = settings.DOC_CACHE.get('ACCEL_REDIRECT')
+    if accel_prefix:
+        # nginx会自己处理Range请求；nginx按路径重新打开文件，这里的fd用不上
+        # 刚访问过的文件atime最新，淘汰时排在最后，交给nginx的这一小段时间里基本不会被删掉
+        f.close()
+        res = HttpResponse(content_type=content_type)
+        res['X-Accel-Redirect'] = accel_prefix + os.path.relpath(f.name, get_cache().directory)
+    elif byte_range:
+        start, end = byte_range
+        res = StreamingHttpResponse(_iter_range(f, start, end - start + 1), status=206, content_type=content_type)
+        res['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, st.st_size)
+        res['Content-Length'] = end - start + 1
+    else:
+        res = FileResponse(f, content_type=content_type)
+        res['Content-Length'] = st.st_size
+
+    res['Accept-Ranges'] = 'bytes'
+    res['ETag'] = etag
+    res['Content-Disposition'] = content_disposition
+    return res
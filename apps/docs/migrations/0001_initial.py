@@ -0,0 +1,37 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:12
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Doc',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('update_time', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('is_delete', models.BooleanField(default=False, verbose_name='逻辑删除')),
+                ('file_url', models.URLField(help_text='文件url', verbose_name='文件url')),
+                ('title', models.CharField(help_text='文档标题', max_length=150, validators=[django.core.validators.MinLengthValidator(1)], verbose_name='文档标题')),
+                ('desc', models.TextField(help_text='文档描述', verbose_name='文档描述')),
+                ('image_url', models.URLField(default='', help_text='图片url', verbose_name='图片url')),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '文档',
+                'verbose_name_plural': '文档',
+                'db_table': 'tb_docs',
+            },
+        ),
+    ]
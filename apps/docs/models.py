@@ -16,6 +16,10 @@ class Doc(ModelBase):
         db_table = "tb_docs"   # 指明数据库表名
         verbose_name = "文档"    # 在admin站点中显示的名称
         verbose_name_plural = verbose_name  # 显示的复数名称
+        # 联合索引，对应 is_delete=False 的文档列表
+        indexes = [
+            models.Index(fields=['is_delete', 'update_time'], name='docs_del_time_idx'),
+        ]
 
     def __str__(self):
         return self.title
\ No newline at end of file
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class NewsConfig(AppConfig):
     name = 'news'
+
+    def ready(self):
+        # 注册信号
+        from . import signals  # noqa
@@ -0,0 +1,249 @@
+# 新闻模块的缓存
+# 使用settings中默认的redis缓存(default)，缓存的是已经序列化好的数据
+# 新闻列表的失效方式：每个标签有一个版本号，文章或标签被修改时版本号加1，旧的缓存自然不会再被读到
+# 主页快照：标签、热门新闻、轮播图和第一页新闻列表打包成一份，后台修改数据后重新生成
+# 搜索页的热门新闻列表和主页快照一起生成
+import logging
+import time
+
+from django.core.cache import cache
+from django.core.paginator import Paginator, EmptyPage
+from django.db import transaction
+
+from utils import cursor_paginator
+from . import models
+from . import constants
+from . import clicks
+
+logger = logging.getLogger('django')
+
+
+# 版本号的key，tag_id为0代表“全部”的列表
+def _generation_key(tag_id):
+    return 'news_list_gen_{}'.format(tag_id)
+
+
+# 列表缓存的key，name区分页码模式(p页码)和游标模式(c游标)
+def _news_list_key(tag_id, name, generation):
+    return 'news_list_{}_{}_{}'.format(tag_id, name, generation)
+
+
+def get_generations(tag_id):
+    '''
+    一次性拿到当前标签和“全部”列表的版本号
+    :return: (标签的版本号, 全部列表的版本号)
+    '''
+    keys = [_generation_key(tag_id), _generation_key(0)]
+    generations = cache.get_many(keys)
+    return generations.get(keys[0], 0), generations.get(keys[1], 0)
+
+
+def bump_generations(*tag_ids):
+    '''
+    把传入的标签的版本号加1，“全部”列表(0)总是一起失效
+    '''
+    for tag_id in set(tag_ids) | {0}:
+        if tag_id is None:
+            continue
+        key = _generation_key(tag_id)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                # key不存在时用当前的毫秒时间作为起始值，避免和被淘汰前的版本号重复
+                cache.set(key, int(time.time() * 1000), timeout=None)
+        except Exception as e:
+            # redis出问题时只记日志，不影响后台保存文章
+            logger.error('更新新闻列表版本号异常[ tag_id: {} error: {} ]'.format(tag_id, e))
+
+
+def schedule_bump_generations(*tag_ids):
+    '''
+    等事务提交后再更新版本号，避免别的请求在提交前用旧数据重新填充新版本的缓存
+    '''
+    transaction.on_commit(lambda: bump_generations(*tag_ids))
+
+
+def _news_queryset(tag_id):
+    '''
+    :return: (查询集, 是否因为标签下没有文章而退回到全部列表)
+    '''
+    # 用select_related方法去关联tag和author表，only方法只拿需要用的内容
+    news_queryset = models.News.objects.select_related('tag', 'author').only('title', 'digest', 'image_url', 'thumbnail_url', 'update_time', 'tag__name', 'author__username').filter(is_delete=False)
+    # 标签下有文章就只查这个标签的，没有的话查全部（用exists，不会把整个查询集取出来）
+    if tag_id and news_queryset.filter(tag_id=tag_id).exists():
+        return news_queryset.filter(tag_id=tag_id), False
+    return news_queryset, bool(tag_id)
+
+
+# 列表里的图片用缩略图，之前上传的文章没有缩略图，用原图
+def _list_image_url(n):
+    return n.thumbnail_url or n.image_url
+
+
+def _serialize_news(n):
+    return {
+        'id': n.id,
+        'title': n.title,
+        'digest': n.digest,
+        'image_url': _list_image_url(n),
+        'update_time': n.update_time.strftime('%Y年%m月%d日 %H:%M'),
+        # 标签、作者删除后外键为NULL
+        'tag_name': n.tag.name if n.tag else '',
+        'author': n.author.username if n.author else '',
+    }
+
+
+def build_news_list(tag_id, page):
+    '''
+    从数据库查询并序列化一页新闻列表（页码模式）
+    :return: (序列化后的数据, 是否退回到了全部列表)
+    '''
+    news, fallback = _news_queryset(tag_id)
+
+    # 分页内容（把部分需要的内容给前端，不要一次性给全部）
+    paginator = Paginator(news, constants.PER_PAGE_NEWS_COUNT)
+    try:
+        news_info = paginator.page(page)
+    except EmptyPage:
+        logger.error('用户访问的页数大于总页数')
+        news_info = paginator.page(paginator.num_pages)
+
+    data = {
+        'news': [_serialize_news(n) for n in news_info],
+        'total_pages': paginator.num_pages,
+    }
+    return data, fallback
+
+
+def build_news_cursor_page(tag_id, cursor):
+    '''
+    从数据库查询并序列化一页新闻列表（游标模式），游标不合法时抛出ValueError
+    :return: (序列化后的数据, 是否退回到了全部列表)
+    '''
+    news, fallback = _news_queryset(tag_id)
+    news_info, next_cursor = cursor_paginator.get_cursor_page(news, cursor, constants.PER_PAGE_NEWS_COUNT)
+    data = {
+        'news': [_serialize_news(n) for n in news_info],
+        'next_cursor': next_cursor,
+    }
+    return data, fallback
+
+
+def _read_through(tag_id, name, build):
+    '''
+    先查缓存，没有的话调用build查数据库并写入缓存
+    '''
+    try:
+        tag_generation, all_generation = get_generations(tag_id)
+        key = _news_list_key(tag_id, name, tag_generation)
+        entry = cache.get(key)
+    except Exception as e:
+        # redis出问题时直接查数据库，不影响页面
+        logger.error('读取新闻列表缓存异常：{}'.format(e))
+        return build()[0]
+
+    # 退回到全部列表的缓存还要对比全部列表的版本号
+    if entry and (not entry['fallback'] or entry['all_generation'] == all_generation):
+        return entry['data']
+
+    data, fallback = build()
+    try:
+        cache.set(key, {
+            'data': data,
+            'fallback': fallback,
+            'all_generation': all_generation,
+        }, constants.NEWS_LIST_CACHE_EXPIRES)
+    except Exception as e:
+        logger.error('写入新闻列表缓存异常：{}'.format(e))
+    return data
+
+
+def get_news_list(tag_id, page):
+    '''
+    读取一页新闻列表（页码模式）
+    '''
+    return _read_through(tag_id, 'p{}'.format(page), lambda: build_news_list(tag_id, page))
+
+
+def get_news_cursor_page(tag_id, cursor):
+    '''
+    读取一页新闻列表（游标模式），游标不合法时抛出ValueError
+    '''
+    # 先解析一遍，不合法的游标不进缓存
+    if cursor:
+        cursor_paginator.decode_cursor(cursor)
+    return _read_through(tag_id, 'c{}'.format(cursor), lambda: build_news_cursor_page(tag_id, cursor))
+
+
+def build_homepage_snapshot():
+    '''
+    查询数据库生成主页快照和搜索页的热门新闻列表并写入缓存
+    :return: (主页快照, 搜索页的热门新闻列表)
+    '''
+    tags = models.Tag.objects.only('id', 'name').filter(is_delete=False)
+    hot_news = models.HotNews.objects.select_related('news', 'news__tag', 'news__author').only(
+        'priority', 'update_time', 'news__title', 'news__digest', 'news__image_url', 'news__thumbnail_url', 'news__id', 'news__clicks',
+        'news__tag__name', 'news__author__username').filter(is_delete=False)
+    hot_news = clicks.sort_hot_news(hot_news)
+    banners = models.Banner.objects.select_related('news').only('image_url', 'news_id', 'news__title').filter(is_delete=False).order_by('priority')[0:constants.SHOW_BANNER_COUNT]
+    snapshot = {
+        'tags': [{'id': t.id, 'name': t.name} for t in tags],
+        # 和模板里的 n.news.title 这种写法保持一致
+        'hot_news': [{'news': {'id': h.news.id, 'title': h.news.title, 'image_url': _list_image_url(h.news)}}
+                     for h in hot_news[0:constants.SHOW_HOTNEWS_COUNT]],
+        'banners': [{'image_url': b.image_url, 'news_id': b.news_id, 'news_title': b.news.title} for b in banners],
+        # 第一页新闻列表（游标模式，和主页的滚动加载一致）
+        'news': build_news_cursor_page(0, None)[0],
+    }
+    # 搜索页的热门新闻（全部），字段和模板里的 one_hotnews.news.tag.name 这种写法保持一致
+    search_hot_news = [{
+        'update_time': h.update_time,
+        'news': {
+            'id': h.news.id,
+            'title': h.news.title,
+            'digest': h.news.digest,
+            'image_url': _list_image_url(h.news),
+            'tag': {'name': h.news.tag.name if h.news.tag else ''},
+            'author': {'username': h.news.author.username if h.news.author else ''},
+        },
+    } for h in hot_news]
+    try:
+        cache.set_many({
+            constants.HOMEPAGE_SNAPSHOT_KEY: snapshot,
+            constants.SEARCH_HOT_NEWS_KEY: search_hot_news,
+        }, timeout=None)
+    except Exception as e:
+        logger.error('写入主页快照异常：{}'.format(e))
+    return snapshot, search_hot_news
+
+
+def get_homepage_snapshot():
+    '''
+    读取主页快照，只有一次redis的GET，缓存里没有的话重新生成
+    '''
+    try:
+        snapshot = cache.get(constants.HOMEPAGE_SNAPSHOT_KEY)
+    except Exception as e:
+        logger.error('读取主页快照异常：{}'.format(e))
+        snapshot = None
+    return snapshot or build_homepage_snapshot()[0]
+
+
+def get_search_hot_news():
+    '''
+    读取搜索页的热门新闻列表，缓存里没有的话重新生成
+    '''
+    try:
+        hot_news = cache.get(constants.SEARCH_HOT_NEWS_KEY)
+    except Exception as e:
+        logger.error('读取搜索页热门新闻异常：{}'.format(e))
+        hot_news = None
+    return hot_news if hot_news is not None else build_homepage_snapshot()[1]
+
+
+def rebuild_homepage_snapshot():
+    '''
+    数据修改后调用，等事务提交后再重新生成，避免读到还没提交的数据
+    '''
+    transaction.on_commit(build_homepage_snapshot)
@@ -0,0 +1,101 @@
+# 文章点击量的缓冲计数
+# 详情页每次访问只在redis的哈希里加1（HINCRBY），不直接UPDATE数据库，
+# 再由定时任务(python manage.py flush_news_clicks)把攒下的增量用一条UPDATE批量写回tb_news
+import logging
+
+from django.db.models import Case, When, F, IntegerField
+from django_redis import get_redis_connection
+
+from utils import redis_lock
+from . import models
+from . import constants
+
+logger = logging.getLogger('django')
+
+# 正在写回数据库的增量，写回期间先挪到这个key，新的点击继续记到原来的key
+FLUSHING_KEY = constants.NEWS_CLICKS_REDIS_KEY + '_flushing'
+# 写回时加的锁，crontab和常驻进程同时跑时只有一个在写回
+FLUSH_LOCK_KEY = constants.NEWS_CLICKS_REDIS_KEY + '_flush_lock'
+
+
+def incr_click(news_id):
+    '''
+    记录一次点击，redis出问题时只记日志，不影响文章详情页
+    '''
+    try:
+        con_redis = get_redis_connection(alias='default')
+        con_redis.hincrby(constants.NEWS_CLICKS_REDIS_KEY, news_id, 1)
+    except Exception as e:
+        logger.error('记录点击量异常：{}'.format(e))
+
+
+def get_pending_clicks(news_ids):
+    '''
+    :param news_ids: 文章id列表
+    :return: {文章id: 还没写回数据库的点击量}
+    '''
+    news_ids = list(news_ids)
+    if not news_ids:
+        return {}
+    try:
+        con_redis = get_redis_connection(alias='default')
+        pl = con_redis.pipeline()
+        pl.hmget(constants.NEWS_CLICKS_REDIS_KEY, news_ids)
+        pl.hmget(FLUSHING_KEY, news_ids)
+        pending, flushing = pl.execute()
+    except Exception as e:
+        logger.error('读取点击量异常：{}'.format(e))
+        return {}
+    return {news_id: int(a or 0) + int(b or 0) for news_id, a, b in zip(news_ids, pending, flushing)}
+
+
+def sort_hot_news(hot_news):
+    '''
+    热门新闻按 优先级、点击量(数据库里的+redis里还没写回的) 排序
+    :param hot_news: HotNews查询集，需要带上priority和news__clicks字段
+    :return: 排好序的列表
+    '''
+    hot_news = list(hot_news)
+    pending = get_pending_clicks(h.news_id for h in hot_news)
+    hot_news.sort(key=lambda h: (h.priority, -(h.news.clicks + pending.get(h.news_id, 0))))
+    return hot_news
+
+
+def flush_clicks(batch_size=500):
+    '''
+    把redis里攒下的点击量写回数据库
+    :return: 写回的文章数
+    '''
+    con_redis = get_redis_connection(alias='default')
+    # 进程挂掉的话，锁过期后别的进程可以接着写回
+    token = redis_lock.acquire(con_redis, FLUSH_LOCK_KEY, constants.NEWS_CLICKS_FLUSH_LOCK_EXPIRES)
+    if not token:
+        return 0
+    try:
+        # 上一次写回中途失败的话，先把剩下的写完，否则把当前的哈希整个改名挪走（原子操作）
+        if not con_redis.exists(FLUSHING_KEY):
+            if not con_redis.exists(constants.NEWS_CLICKS_REDIS_KEY):
+                return 0
+            con_redis.rename(constants.NEWS_CLICKS_REDIS_KEY, FLUSHING_KEY)
+        deltas = [(int(k), int(v)) for k, v in con_redis.hgetall(FLUSHING_KEY).items() if int(v)]
+
+        count = 0
+        for i in range(0, len(deltas), batch_size):
+            # 每一批之前续期；锁已经过期被别的进程拿走的话，剩下的由它写回，这里马上停下，避免重复加
+            if not redis_lock.renew(con_redis, FLUSH_LOCK_KEY, token, constants.NEWS_CLICKS_FLUSH_LOCK_EXPIRES):
+                logger.error('点击量写回超时，锁已经被其他进程拿走，停止写回')
+                return count
+            batch = deltas[i:i + batch_size]
+            # 一个批次只发一条UPDATE：UPDATE tb_news SET clicks = CASE WHEN id=.. THEN clicks+.. END WHERE id IN (..)
+            # update()不会触发save信号，也不会改动update_time
+            models.News.objects.filter(id__in=[news_id for news_id, _ in batch]).update(
+                clicks=Case(*[When(id=news_id, then=F('clicks') + delta) for news_id, delta in batch],
+                            default=F('clicks'), output_field=IntegerField()))
+            # 这一批已经提交了，马上从哈希里删掉，后面的批次失败时下次只写剩下的，不会重复加
+            con_redis.hdel(FLUSHING_KEY, *[news_id for news_id, _ in batch])
+            count += len(batch)
+        con_redis.delete(FLUSHING_KEY)
+        return count
+    finally:
+        # 只删自己的锁
+        redis_lock.release(con_redis, FLUSH_LOCK_KEY, token)
@@ -5,4 +5,43 @@ PER_PAGE_NEWS_COUNT = 5
 SHOW_HOTNEWS_COUNT = 3
 
 # 显示轮播图条数
-SHOW_BANNER_COUNT = 6
\ No newline at end of file
+SHOW_BANNER_COUNT = 6
+
+# 新闻列表缓存的有效期，单位秒（靠版本号失效，这里只是为了回收内存）
+NEWS_LIST_CACHE_EXPIRES = 24 * 60 * 60
+
+# 每页评论数
+PER_PAGE_COMMENTS_COUNT = 20
+
+# 点击量缓冲在redis中的哈希key
+NEWS_CLICKS_REDIS_KEY = 'news_clicks'
+# 点击量写回数据库时加的锁的过期时间(秒)
+NEWS_CLICKS_FLUSH_LOCK_EXPIRES = 300
+
+# 主页快照的缓存key
+HOMEPAGE_SNAPSHOT_KEY = 'homepage_snapshot'
+
+# 需要重新建立搜索索引的文章id在redis中的key（集合）
+SEARCH_DIRTY_NEWS_REDIS_KEY = 'search_dirty_news'
+
+# 上一次增量更新索引(update_index --since)的时间在redis中的key
+SEARCH_LAST_UPDATE_REDIS_KEY = 'search_last_update'
+
+# 搜索结果缓存的有效期，单位秒（索引更新时也会失效）
+SEARCH_CACHE_EXPIRES = 60
+
+# 搜索结果缓存的命中/未命中次数在redis中的key（哈希）
+SEARCH_CACHE_STATS_REDIS_KEY = 'search_cache_stats'
+
+# 搜索页没有关键字时展示的热门新闻列表的缓存key
+SEARCH_HOT_NEWS_KEY = 'search_hot_news'
+
+# 搜索框联想：默认返回的条数和最多返回的条数
+SEARCH_SUGGEST_COUNT = 8
+SEARCH_SUGGEST_MAX_COUNT = 20
+
+# 搜索框联想：每个进程隔多少秒检查一次数据有没有变化，单位秒
+SEARCH_SUGGEST_CHECK_INTERVAL = 5
+
+# 搜索框联想：数据没有变化也定期重建，让排序用上新的点击量，单位秒
+SEARCH_SUGGEST_MAX_AGE = 10 * 60
\ No newline at end of file
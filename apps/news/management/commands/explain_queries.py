@@ -0,0 +1,78 @@
+# 对各个视图里的热点查询执行EXPLAIN，报告还在全表扫描的查询
+# 使用：python manage.py explain_queries [--strict]
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from news import models
+from docs.models import Doc
+from course.models import Course
+
+
+def get_querysets():
+    '''
+    返回 (名称, 查询集) 的列表，查询条件和各个视图里的保持一致
+    '''
+    tag_id = models.Tag.objects.filter(is_delete=False).values_list('id', flat=True).first() or 0
+    news_id = models.News.objects.filter(is_delete=False).values_list('id', flat=True).first() or 0
+    news = models.News.objects.select_related('tag', 'author').only('title', 'digest', 'image_url', 'update_time', 'tag__name', 'author__username')
+    return [
+        ('IndexView.tags', models.Tag.objects.only('id', 'name').filter(is_delete=False)),
+        ('IndexView.hot_news', models.HotNews.objects.select_related('news').only('news__title', 'news__image_url', 'news__id').filter(is_delete=False).order_by('priority', '-news__clicks')),
+        ('NewsListView.tag', news.filter(is_delete=False, tag_id=tag_id).order_by('-update_time', '-id')[:5]),
+        ('NewsListView.all', news.filter(is_delete=False).order_by('-update_time', '-id')[:5]),
+        ('NewsBanner.banners', models.Banner.objects.select_related('news').only('image_url', 'news_id', 'news__title').filter(is_delete=False).order_by('priority')[:6]),
+        ('NewsDetailView.comments', models.Comments.objects.select_related('author', 'parent__author').filter(is_delete=False, news_id=news_id).order_by('-update_time', '-id')[:20]),
+        ('NewsManageView.news', models.News.objects.select_related('author', 'tag').only('title', 'author__username', 'tag__name', 'update_time').filter(is_delete=False)[:8]),
+        ('DocsManageView.docs', Doc.objects.only('title', 'update_time').filter(is_delete=False)),
+        ('CoursesManageView.courses', Course.objects.select_related('category', 'teacher').only('title', 'category__name', 'teacher__name').filter(is_delete=False)),
+    ]
+
+
+def _walk(node):
+    # 递归遍历json格式的执行计划
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def find_full_scans(queryset):
+    '''
+    :return: 执行计划中全表扫描的表名列表
+    '''
+    vendor = connection.vendor
+    if vendor == 'mysql':
+        plan = json.loads(queryset.explain(format='json'))
+        return [n.get('table_name') for n in _walk(plan) if n.get('access_type') == 'ALL']
+    if vendor == 'postgresql':
+        plan = json.loads(queryset.explain(format='json'))
+        return [n.get('Relation Name') for n in _walk(plan) if n.get('Node Type') == 'Seq Scan']
+    if vendor == 'sqlite':
+        plan = queryset.explain()
+        return [line.split('SCAN TABLE', 1)[1].split()[0] for line in plan.splitlines()
+                if 'SCAN TABLE' in line and 'USING' not in line]
+    raise CommandError('不支持的数据库：{}'.format(vendor))
+
+
+class Command(BaseCommand):
+    help = '对视图中的热点查询执行EXPLAIN，报告全表扫描'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strict', action='store_true', help='有全表扫描时返回错误（用于上线前检查）')
+
+    def handle(self, *args, **options):
+        bad = []
+        for name, queryset in get_querysets():
+            tables = find_full_scans(queryset)
+            if tables:
+                bad.append(name)
+                self.stdout.write(self.style.WARNING('{:<28} 全表扫描：{}'.format(name, ', '.join(tables))))
+            else:
+                self.stdout.write(self.style.SUCCESS('{:<28} OK'.format(name)))
+        if bad and options['strict']:
+            raise CommandError('{}个查询存在全表扫描'.format(len(bad)))
@@ -0,0 +1,27 @@
+# 把redis中缓冲的文章点击量批量写回数据库
+# 使用：python manage.py flush_news_clicks，建议用crontab每分钟执行一次
+# 加上 --interval 秒数 可以作为常驻进程循环执行
+import time
+
+from django.core.management.base import BaseCommand
+
+from news import clicks, caches
+
+
+class Command(BaseCommand):
+    help = '把redis中缓冲的文章点击量批量写回数据库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每条UPDATE语句包含的文章数')
+        parser.add_argument('--interval', type=int, default=0, help='大于0时常驻运行，每隔多少秒写回一次')
+
+    def handle(self, *args, **options):
+        while True:
+            count = clicks.flush_clicks(batch_size=options['batch_size'])
+            self.stdout.write('写回了{}篇文章的点击量'.format(count))
+            # update()不会触发信号，热门新闻的排名变了要手动重新生成主页快照
+            if count:
+                caches.build_homepage_snapshot()
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
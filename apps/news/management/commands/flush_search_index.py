@@ -0,0 +1,31 @@
+# 把保存、删除过的文章批量写入搜索索引
+# 使用：python manage.py flush_search_index --interval 5，作为常驻进程运行
+import time
+
+from django.core.management.base import BaseCommand
+
+from news import search_indexing
+
+
+class Command(BaseCommand):
+    help = '把需要更新的文章批量写入搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每次bulk写入的文章数')
+        parser.add_argument('--interval', type=int, default=0, help='大于0时常驻运行，每隔多少秒写入一次')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                count = search_indexing.flush_dirty(batch_size=options['batch_size'])
+            except Exception as e:
+                # elasticsearch连不上时文章id已经放回集合，常驻运行时等下一轮再试
+                if options['interval'] <= 0:
+                    raise
+                self.stderr.write('更新索引异常：{}'.format(e))
+                count = 0
+            if count:
+                self.stdout.write('更新了{}篇文章的索引'.format(count))
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,63 @@
+# 覆盖haystack自带的update_index命令（news在INSTALLED_APPS中排在haystack前面），增加增量更新
+# 使用：python manage.py update_index --since 6h       只更新6小时内修改过的文章（也可以用30m、2d）
+#       python manage.py update_index --since 2019-05-01T00:00:00
+#       python manage.py update_index --since last     从上一次更新索引的时间开始
+# 按update_time筛选，elasticsearch停机恢复后只需要重建这段时间里改动过的数据
+import re
+from datetime import timedelta
+
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+from haystack.management.commands.update_index import Command as HaystackUpdateIndexCommand
+
+from news import models, constants, search_indexing, search_cache
+
+UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+
+
+class Command(HaystackUpdateIndexCommand):
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--since', default=None,
+                            help='只更新这个时间之后修改过的数据：30m、6h、2d、具体时间或last（上一次更新索引的时间）')
+
+    def parse_since(self, since):
+        if since == 'last':
+            value = get_redis_connection(alias='default').get(constants.SEARCH_LAST_UPDATE_REDIS_KEY)
+            if value is None:
+                raise CommandError('还没有记录过更新索引的时间，请先做一次全量更新')
+            return parse_datetime(value.decode('utf8'))
+        match = re.match(r'^(\d+)([mhd])$', since)
+        if match:
+            return timezone.now() - timedelta(**{UNITS[match.group(2)]: int(match.group(1))})
+        start = parse_datetime(since)
+        if start is None:
+            raise CommandError('--since 的格式不正确：{}'.format(since))
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        return start
+
+    def handle(self, **options):
+        since = options.pop('since', None)
+        started = timezone.now()
+        start = None
+        if since:
+            start = self.parse_since(since)
+            # 交给haystack的--start处理，它会按NewsIndex.get_updated_field()的字段筛选
+            options['start_date'] = start.isoformat()
+
+        super().handle(**options)
+
+        if start is not None:
+            # 逻辑删除的文章不在index_queryset里，haystack不会处理，这里从索引中移除
+            deleted_ids = list(models.News.objects.filter(is_delete=True, update_time__gte=start).values_list('id', flat=True))
+            batch_size = options.get('batchsize') or 1000
+            for using in options.get('using') or [None]:
+                for i in range(0, len(deleted_ids), batch_size):
+                    search_indexing.update_news(deleted_ids[i:i + batch_size], using=using)
+
+        search_cache.bump_generation()
+        # 记下这次开始的时间，下次可以用 --since last
+        get_redis_connection(alias='default').set(constants.SEARCH_LAST_UPDATE_REDIS_KEY, started.isoformat())
@@ -0,0 +1,110 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:12
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('update_time', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('is_delete', models.BooleanField(default=False, verbose_name='逻辑删除')),
+                ('name', models.CharField(help_text='标签名', max_length=64, verbose_name='标签名')),
+            ],
+            options={
+                'verbose_name': '新闻标签',
+                'verbose_name_plural': '新闻标签',
+                'db_table': 'tb_tag',
+                'ordering': ['-update_time', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='News',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('update_time', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('is_delete', models.BooleanField(default=False, verbose_name='逻辑删除')),
+                ('title', models.CharField(help_text='标题', max_length=150, validators=[django.core.validators.MinLengthValidator(1)], verbose_name='标题')),
+                ('digest', models.CharField(help_text='摘要', max_length=200, validators=[django.core.validators.MinLengthValidator(1)], verbose_name='摘要')),
+                ('content', models.TextField(help_text='内容', verbose_name='内容')),
+                ('clicks', models.IntegerField(default=0, help_text='点击量', verbose_name='点击量')),
+                ('image_url', models.URLField(default='', help_text='图片url', verbose_name='图片url')),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('tag', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='news.Tag')),
+            ],
+            options={
+                'verbose_name': '新闻',
+                'verbose_name_plural': '新闻',
+                'db_table': 'tb_news',
+                'ordering': ['-update_time', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Comments',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('update_time', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('is_delete', models.BooleanField(default=False, verbose_name='逻辑删除')),
+                ('content', models.TextField(help_text='内容', verbose_name='内容')),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('news', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='news.News')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='news.Comments')),
+            ],
+            options={
+                'verbose_name': '评论',
+                'verbose_name_plural': '评论',
+                'db_table': 'tb_comments',
+                'ordering': ['-update_time', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HotNews',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('update_time', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('is_delete', models.BooleanField(default=False, verbose_name='逻辑删除')),
+                ('priority', models.IntegerField(choices=[(1, '第一级'), (2, '第二级'), (3, '第三级')], default=3, help_text='优先级', verbose_name='优先级')),
+                ('news', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='news.News')),
+            ],
+            options={
+                'verbose_name': '热门新闻',
+                'verbose_name_plural': '热门新闻',
+                'db_table': 'tb_hotnews',
+                'ordering': ['-update_time', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Banner',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_time', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('update_time', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('is_delete', models.BooleanField(default=False, verbose_name='逻辑删除')),
+                ('image_url', models.URLField(help_text='轮播图url', verbose_name='轮播图url')),
+                ('priority', models.IntegerField(choices=[(1, '第一级'), (2, '第二级'), (3, '第三级'), (4, '第四级'), (5, '第五级'), (6, '第六级')], default=6, help_text='优先级', verbose_name='优先级')),
+                ('news', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='news.News')),
+            ],
+            options={
+                'verbose_name': '轮播图',
+                'verbose_name_plural': '轮播图',
+                'db_table': 'tb_banner',
+                'ordering': ['priority', '-update_time', '-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.1.7 on 2026-10-18 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['is_delete', 'update_time', 'id'], name='tag_del_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['is_delete', 'tag', 'update_time', 'id'], name='news_del_tag_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['is_delete', 'update_time', 'id'], name='news_del_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comments',
+            index=models.Index(fields=['news', 'is_delete', 'update_time', 'id'], name='comments_news_del_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotnews',
+            index=models.Index(fields=['is_delete', 'priority'], name='hotnews_del_pri_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banner',
+            index=models.Index(fields=['is_delete', 'priority', 'update_time', 'id'], name='banner_del_pri_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.1.7 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_add_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='thumbnail_url',
+            field=models.URLField(blank=True, default='', help_text='缩略图url', verbose_name='缩略图url'),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='banner_url',
+            field=models.URLField(blank=True, default='', help_text='轮播图尺寸的图片url', verbose_name='轮播图尺寸的图片url'),
+        ),
+    ]
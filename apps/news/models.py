@@ -18,6 +18,10 @@ class Tag(ModelBase):
         db_table = "tb_tag"  # 指明数据库表名
         verbose_name = "新闻标签"  # 在admin站点中显示的名称
         verbose_name_plural = verbose_name  # 显示的复数名称
+        # 联合索引，对应 is_delete=False 加按更新时间排序的查询
+        indexes = [
+            models.Index(fields=['is_delete', 'update_time', 'id'], name='tag_del_time_idx'),
+        ]
     # 返回名称给我们看
     def __str__(self):
         return self.name
@@ -30,6 +34,9 @@ class News(ModelBase):
     content = models.TextField(verbose_name="内容", help_text="内容")
     clicks = models.IntegerField(default=0, verbose_name="点击量", help_text="点击量")
     image_url = models.URLField(default="", verbose_name="图片url", help_text="图片url")
+    # 上传图片时生成的小尺寸图片，列表和热门新闻用这两个，没有的话用image_url
+    thumbnail_url = models.URLField(default="", blank=True, verbose_name="缩略图url", help_text="缩略图url")
+    banner_url = models.URLField(default="", blank=True, verbose_name="轮播图尺寸的图片url", help_text="轮播图尺寸的图片url")
     # 外键关联，建在多的那头
     tag = models.ForeignKey('Tag', on_delete=models.SET_NULL, null=True)
     author = models.ForeignKey('users.Users', on_delete=models.SET_NULL, null=True)
@@ -39,6 +46,11 @@ class News(ModelBase):
         db_table = "tb_news"  # 指明数据库表名
         verbose_name = "新闻"  # 在admin站点中显示的名称
         verbose_name_plural = verbose_name  # 显示的复数名称
+        # 联合索引，对应新闻列表按标签过滤和不按标签过滤的两种查询
+        indexes = [
+            models.Index(fields=['is_delete', 'tag', 'update_time', 'id'], name='news_del_tag_time_idx'),
+            models.Index(fields=['is_delete', 'update_time', 'id'], name='news_del_time_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -54,7 +66,8 @@ class Comments(ModelBase):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True)
 
     # 序列化输出（也可以用写在views中的）
-    def to_dict_data(self):
+    # 父评论只序列化一层，不再递归到父评论的父评论，避免每条评论多查数据库
+    def to_dict_data(self, with_parent=True):
         shanhai_tz = pytz.timezone('Asia/Shanghai')
         update_time_local = shanhai_tz.normalize(self.update_time)
         comment_dict = {
@@ -64,7 +77,7 @@ class Comments(ModelBase):
             'author': self.author.username,
             'update_time': update_time_local.strftime('%Y年%m月%d日 %H:%M'),
             # 'update_time': self.update_time.strftime('%Y年%m月%d日 %H:%M'),
-            'parent': self.parent.to_dict_data() if self.parent else None
+            'parent': self.parent.to_dict_data(with_parent=False) if with_parent and self.parent_id else None
         }
         return comment_dict
 
@@ -73,6 +86,10 @@ class Comments(ModelBase):
         db_table = "tb_comments"  # 指明数据库表名
         verbose_name = "评论"  # 在admin站点中显示的名称
         verbose_name_plural = verbose_name  # 显示的复数名称
+        # 联合索引，对应文章详情页按文章查评论
+        indexes = [
+            models.Index(fields=['news', 'is_delete', 'update_time', 'id'], name='comments_news_del_time_idx'),
+        ]
 
     def __str__(self):
         return '<评论{}>'.format(self.id)
@@ -93,6 +110,10 @@ class HotNews(ModelBase):
         db_table = "tb_hotnews"  # 指明数据库表名
         verbose_name = "热门新闻"  # 在admin站点中显示的名称
         verbose_name_plural = verbose_name  # 显示的复数名称
+        # 联合索引，对应按优先级取热门新闻
+        indexes = [
+            models.Index(fields=['is_delete', 'priority'], name='hotnews_del_pri_idx'),
+        ]
 
     def __str__(self):
         return '<热门新闻{}>'.format(self.id)
@@ -117,6 +138,10 @@ class Banner(ModelBase):
         db_table = "tb_banner"  # 指明数据库表名
         verbose_name = "轮播图"  # 在admin站点中显示的名称
         verbose_name_plural = verbose_name  # 显示的复数名称
+        # 联合索引，对应按优先级取轮播图
+        indexes = [
+            models.Index(fields=['is_delete', 'priority', 'update_time', 'id'], name='banner_del_pri_idx'),
+        ]
 
     def __str__(self):
         return '<轮播图{}>'.format(self.id)
\ No newline at end of file
@@ -0,0 +1,125 @@
+# 搜索结果的缓存
+# 关键字先做规范化（全角转半角、大小写折叠、合并空白），同一个关键字的不同写法共用一份缓存；
+# 缓存的是序列化好的一页结果，key里带有版本号，索引更新时版本号加1，旧的缓存就不会再被读到
+import hashlib
+import logging
+import time
+import unicodedata
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django_redis import get_redis_connection
+
+from . import models
+from . import constants
+
+logger = logging.getLogger('django')
+
+_GENERATION_KEY = 'search_gen'
+
+
+def normalize_query(query):
+    '''
+    NFKC把全角字母、数字、标点和空格转成半角，casefold做大小写折叠，再把连续的空白合并成一个空格
+    '''
+    return ' '.join(unicodedata.normalize('NFKC', query).casefold().split())
+
+
+def bump_generation():
+    '''
+    索引更新后调用，让所有搜索结果的缓存失效
+    '''
+    try:
+        cache.incr(_GENERATION_KEY)
+    except ValueError:
+        # key不存在时用当前的毫秒时间作为起始值，避免和被淘汰前的版本号重复
+        cache.set(_GENERATION_KEY, int(time.time() * 1000), timeout=None)
+    except Exception as e:
+        logger.error('更新搜索缓存版本号异常：{}'.format(e))
+
+
+def _incr_stat(field):
+    try:
+        get_redis_connection(alias='default').hincrby(constants.SEARCH_CACHE_STATS_REDIS_KEY, field, 1)
+    except Exception as e:
+        logger.error('记录搜索缓存统计异常：{}'.format(e))
+
+
+def get_stats():
+    '''
+    :return: {'hits': 命中次数, 'misses': 未命中次数}
+    '''
+    stats = get_redis_connection(alias='default').hgetall(constants.SEARCH_CACHE_STATS_REDIS_KEY)
+    return {k.decode('utf8'): int(v) for k, v in stats.items()}
+
+
+class _CachedResults(object):
+    '''
+    只有一页数据的结果集，给Paginator用：长度是结果的总数，切片直接返回缓存的这一页
+    '''
+    def __init__(self, entry):
+        self.entry = entry
+
+    def __len__(self):
+        return self.entry['count']
+
+    def __getitem__(self, item):
+        return self.entry['items']
+
+
+def _build_entry(results, page_no, per_page):
+    paginator = Paginator(results, per_page)
+    # 页码不合法时抛出InvalidPage，由视图返回404
+    page = paginator.page(page_no)
+    hits = list(page.object_list)
+    # 模板里用到的文章字段一次查出来，不在模板里逐条查询
+    news = models.News.objects.select_related('tag', 'author').only(
+        'image_url', 'thumbnail_url', 'update_time', 'tag__name', 'author__username').in_bulk([int(r.pk) for r in hits])
+    items = []
+    for r in hits:
+        n = news.get(int(r.pk))
+        if n is None:
+            continue
+        items.append({
+            'id': n.id,
+            'title': r.title,
+            'digest': r.digest,
+            'object': {
+                # 结果列表里用缩略图
+                'image_url': n.thumbnail_url or n.image_url,
+                'update_time': n.update_time,
+                # 标签、作者删除后外键为NULL，和原来的模板一样显示为空
+                'tag': {'name': n.tag.name if n.tag else ''},
+                'author': {'username': n.author.username if n.author else ''},
+            },
+        })
+    return {'count': paginator.count, 'number': page.number, 'items': items}
+
+
+def get_page(query, page_no, per_page, search):
+    '''
+    :param query: 规范化之后的关键字
+    :param search: 缓存没有命中时调用，返回haystack的SearchQuerySet
+    :return: (paginator, page)，和haystack的SearchView.build_page一致
+    '''
+    try:
+        generation = cache.get(_GENERATION_KEY, 0)
+        key = 'search_{}_{}_{}_{}'.format(generation, hashlib.md5(query.encode('utf8')).hexdigest(), per_page, page_no)
+        entry = cache.get(key)
+    except Exception as e:
+        logger.error('读取搜索缓存异常：{}'.format(e))
+        key, entry = None, None
+
+    if entry is None:
+        _incr_stat('misses')
+        entry = _build_entry(search(), page_no, per_page)
+        if key:
+            try:
+                cache.set(key, entry, constants.SEARCH_CACHE_EXPIRES)
+            except Exception as e:
+                logger.error('写入搜索缓存异常：{}'.format(e))
+    else:
+        _incr_stat('hits')
+
+    paginator = Paginator(_CachedResults(entry), per_page)
+    return paginator, paginator.page(entry['number'])
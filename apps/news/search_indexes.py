@@ -17,6 +17,12 @@ class NewsIndex(indexes.SearchIndex, indexes.Indexable):
     digest = indexes.CharField(model_attr='digest')
     content = indexes.CharField(model_attr='content')
     image_url = indexes.CharField(model_attr='image_url')
+    update_time = indexes.DateTimeField(model_attr='update_time')
+    # 后台文章管理列表按标题、作者名、标签过滤(admin/news_search.py)
+    # 标题和作者名按1~2个字切成n-gram(见settings.ELASTICSEARCH_INDEX_SETTINGS)，查询时不用前后通配符
+    title_ngram = indexes.NgramField(model_attr='title')
+    author_ngram = indexes.NgramField(model_attr='author__username', null=True)
+    tag_id = indexes.IntegerField(model_attr='tag_id', null=True)
     # comments = indexes.IntegerField(model_attr='comments')
 
     def get_model(self):
@@ -24,9 +30,14 @@ class NewsIndex(indexes.SearchIndex, indexes.Indexable):
         """
         return News
 
+    def get_updated_field(self):
+        """update_index --since 按这个字段筛选修改过的数据
+        """
+        return 'update_time'
+
     def index_queryset(self, using=None):
         """返回要建立索引的数据查询集
         """
 
         # return self.get_model().objects.filter(is_delete=False, tag_id=1)
-        return self.get_model().objects.filter(is_delete=False, tag_id__in=[1, 2, 3, 4, 5, 6])
\ No newline at end of file
+        return self.get_model().objects.select_related('author').filter(is_delete=False)
\ No newline at end of file
@@ -0,0 +1,70 @@
+# 搜索索引的异步更新
+# 文章保存、删除时只把id记到redis的集合里(QueuedSignalProcessor)，
+# 由后台任务(python manage.py flush_search_index)批量取出，用elasticsearch的bulk接口一次写入一批
+import logging
+
+from django.db import transaction
+from django_redis import get_redis_connection
+from haystack import connections, connection_router
+
+from . import models
+from . import constants
+from . import search_cache
+
+logger = logging.getLogger('django')
+
+
+def mark_dirty(news_id):
+    '''
+    记下需要重新索引的文章，等事务提交后再记，避免后台任务读到还没提交的数据
+    '''
+    def _add():
+        try:
+            get_redis_connection(alias='default').sadd(constants.SEARCH_DIRTY_NEWS_REDIS_KEY, news_id)
+        except Exception as e:
+            logger.error('记录需要更新索引的文章异常：{}'.format(e))
+    transaction.on_commit(_add)
+
+
+def _get_index(using):
+    return connections[using].get_unified_index().get_index(models.News)
+
+
+def update_news(news_ids, using=None):
+    '''
+    把这些文章的最新数据写入索引，已经删除(包括逻辑删除)的从索引中移除
+    '''
+    using = using or connection_router.for_write()[0]
+    index = _get_index(using)
+    backend = connections[using].get_backend()
+    news_list = list(index.index_queryset(using=using).filter(id__in=news_ids))
+    if news_list:
+        # backend.update 对elasticsearch使用的是bulk接口
+        backend.update(index, news_list)
+    for news_id in set(news_ids) - {n.id for n in news_list}:
+        # haystack的文档id格式为 app名.模型名.主键
+        backend.remove('{}.{}'.format(models.News._meta.label_lower, news_id))
+    # 索引变了，搜索结果的缓存要失效
+    search_cache.bump_generation()
+    return len(news_list)
+
+
+def flush_dirty(batch_size=500, using=None):
+    '''
+    把集合里的文章分批更新到索引
+    :return: 处理的文章数
+    '''
+    con_redis = get_redis_connection(alias='default')
+    count = 0
+    while True:
+        # SPOP取出的同时从集合删除，多个后台任务同时跑也不会重复处理
+        news_ids = [int(i) for i in con_redis.spop(constants.SEARCH_DIRTY_NEWS_REDIS_KEY, batch_size)]
+        if not news_ids:
+            return count
+        try:
+            update_news(news_ids, using=using)
+        except Exception:
+            # 写索引失败的放回集合，下次再试
+            con_redis.sadd(constants.SEARCH_DIRTY_NEWS_REDIS_KEY, *news_ids)
+            raise
+        count += len(news_ids)
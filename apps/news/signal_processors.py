@@ -0,0 +1,21 @@
+# haystack的信号处理器
+# 代替RealtimeSignalProcessor：保存文章时不在请求里同步写elasticsearch，只把文章id记到redis，
+# 由后台任务(python manage.py flush_search_index)批量写入索引
+from django.db.models import signals
+from haystack.signals import BaseSignalProcessor
+
+from . import models
+from . import search_indexing
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    def setup(self):
+        signals.post_save.connect(self.enqueue, sender=models.News)
+        signals.post_delete.connect(self.enqueue, sender=models.News)
+
+    def teardown(self):
+        signals.post_save.disconnect(self.enqueue, sender=models.News)
+        signals.post_delete.disconnect(self.enqueue, sender=models.News)
+
+    def enqueue(self, sender, instance, **kwargs):
+        search_indexing.mark_dirty(instance.pk)
@@ -0,0 +1,44 @@
+# 新闻模块的信号，数据变化后让缓存失效
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import models
+from . import caches
+from . import suggest
+
+
+# 文章保存前记下原来的标签，换了标签的话旧标签的列表也要失效
+@receiver(pre_save, sender=models.News)
+def remember_news_tag(sender, instance, **kwargs):
+    if instance.pk:
+        instance._old_tag_id = sender.objects.filter(pk=instance.pk).values_list('tag_id', flat=True).first()
+
+
+# 文章新增、修改、删除
+@receiver(post_save, sender=models.News)
+@receiver(post_delete, sender=models.News)
+def news_changed(sender, instance, **kwargs):
+    # 用__dict__取tag_id，避免only()查询出来的实例再去查一次数据库
+    caches.schedule_bump_generations(instance.__dict__.get('tag_id'), getattr(instance, '_old_tag_id', None))
+    # 主页快照里有第一页新闻、热门新闻和轮播图的标题
+    caches.rebuild_homepage_snapshot()
+    # 搜索框的联想词里有文章标题
+    suggest.schedule_bump_version()
+
+
+# 标签新增、修改、删除（列表里带有标签名）
+@receiver(post_save, sender=models.Tag)
+@receiver(post_delete, sender=models.Tag)
+def tag_changed(sender, instance, **kwargs):
+    caches.schedule_bump_generations(instance.pk)
+    caches.rebuild_homepage_snapshot()
+    suggest.schedule_bump_version()
+
+
+# 热门新闻、轮播图新增、修改、删除
+@receiver(post_save, sender=models.HotNews)
+@receiver(post_delete, sender=models.HotNews)
+@receiver(post_save, sender=models.Banner)
+@receiver(post_delete, sender=models.Banner)
+def homepage_changed(sender, instance, **kwargs):
+    caches.rebuild_homepage_snapshot()
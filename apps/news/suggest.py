@@ -0,0 +1,184 @@
+# 搜索框的联想词
+# 每个进程在内存里保存一份按规范化后的文字排好序的数组（文章标题和标签名），前缀查询用二分查找，
+# 请求时不查数据库也不查elasticsearch；1~2个字的短前缀命中的条目太多，提前算好每个前缀的前N条
+# 文章或标签修改后版本号加1，各进程隔一小段时间读一次版本号，变了就在后台线程里重建
+import bisect
+import heapq
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from . import models
+from . import constants
+from . import clicks
+from .search_cache import normalize_query
+
+logger = logging.getLogger('django')
+
+_VERSION_KEY = 'search_suggest_version'
+
+# 这个长度以内的前缀提前算好结果
+PRECOMPUTED_PREFIX_LENGTH = 2
+
+# 字符串前缀范围的上界
+_MAX_CHAR = chr(0x10ffff)
+
+
+def bump_version():
+    '''
+    文章或标签修改后调用，让各进程重建联想词
+    '''
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, int(time.time() * 1000), timeout=None)
+    except Exception as e:
+        logger.error('更新联想词版本号异常：{}'.format(e))
+
+
+def schedule_bump_version():
+    '''
+    等事务提交后再更新版本号，避免其他进程重建时读到还没提交的数据
+    '''
+    transaction.on_commit(bump_version)
+
+
+def _get_version():
+    try:
+        return cache.get(_VERSION_KEY)
+    except Exception as e:
+        logger.error('读取联想词版本号异常：{}'.format(e))
+        return None
+
+
+class SuggestIndex(object):
+    '''
+    条目为 (规范化后的文字, 点击量, 类型, id, 原文)，类型为news或tag
+    '''
+    def __init__(self, entries):
+        # 同一类型下文字相同的只保留点击量最高的
+        best = {}
+        for entry in entries:
+            key = (entry[0], entry[2])
+            if key not in best or entry[1] > best[key][1]:
+                best[key] = entry
+        self.entries = sorted(best.values())
+        self.keys = [entry[0] for entry in self.entries]
+
+        grouped = {}
+        for entry in self.entries:
+            for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+                if len(entry[0]) >= length:
+                    grouped.setdefault(entry[0][:length], []).append(entry)
+        self.top = {prefix: self._rank(items, constants.SEARCH_SUGGEST_MAX_COUNT) for prefix, items in grouped.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _rank(items, count):
+        # 点击量高的在前，点击量相同的短的在前
+        return heapq.nsmallest(count, items, key=lambda entry: (-entry[1], len(entry[0]), entry[0]))
+
+    def complete(self, prefix, count):
+        '''
+        :param prefix: 规范化后的前缀
+        :return: 以prefix开头的前count个条目
+        '''
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            return self.top.get(prefix, [])[:count]
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_right(self.keys, prefix + _MAX_CHAR, lo)
+        return self._rank(self.entries[lo:hi], count)
+
+
+def build_index():
+    '''
+    查询数据库生成联想词，文章的点击量加上redis里还没写回的，标签的点击量是标签下所有文章的和
+    '''
+    news = list(models.News.objects.filter(is_delete=False).values_list('id', 'title', 'clicks', 'tag_id'))
+    pending = clicks.get_pending_clicks(news_id for news_id, _, _, _ in news)
+    entries = []
+    tag_clicks = {}
+    for news_id, title, news_clicks, tag_id in news:
+        news_clicks += pending.get(news_id, 0)
+        tag_clicks[tag_id] = tag_clicks.get(tag_id, 0) + news_clicks
+        if normalize_query(title):
+            entries.append((normalize_query(title), news_clicks, 'news', news_id, title))
+    for tag_id, name in models.Tag.objects.filter(is_delete=False).values_list('id', 'name'):
+        if normalize_query(name):
+            entries.append((normalize_query(name), tag_clicks.get(tag_id, 0), 'tag', tag_id, name))
+    return SuggestIndex(entries)
+
+
+class _Holder(object):
+    '''
+    本进程的联想词，所有线程共用
+    '''
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.built_at = 0
+        self.checked_at = 0
+        self.building = False
+        self.lock = threading.Lock()
+
+    def _rebuild(self, version):
+        try:
+            index = build_index()
+        except Exception as e:
+            logger.error('生成联想词异常：{}'.format(e))
+            return
+        finally:
+            self.building = False
+        self.index, self.version, self.built_at = index, version, time.monotonic()
+
+    def _rebuild_in_background(self, version):
+        try:
+            self._rebuild(version)
+        finally:
+            # 后台线程用的是自己的数据库连接，用完关掉
+            connections.close_all()
+
+    def get(self):
+        now = time.monotonic()
+        if self.index is None:
+            # 进程里第一次用到时同步生成
+            with self.lock:
+                if self.index is None:
+                    self.checked_at = now
+                    self._rebuild(_get_version())
+                    if self.index is None:
+                        # 生成失败时先返回空的，等下一次检查时再重建
+                        self.index = SuggestIndex([])
+            return self.index
+
+        if now - self.checked_at >= constants.SEARCH_SUGGEST_CHECK_INTERVAL:
+            with self.lock:
+                if now - self.checked_at < constants.SEARCH_SUGGEST_CHECK_INTERVAL or self.building:
+                    return self.index
+                self.checked_at = now
+                version = _get_version()
+                if version != self.version or now - self.built_at >= constants.SEARCH_SUGGEST_MAX_AGE:
+                    # 重建期间继续用旧的数据
+                    self.building = True
+                    threading.Thread(target=self._rebuild_in_background, args=(version,), daemon=True).start()
+        return self.index
+
+
+_holder = _Holder()
+
+
+def complete(query, count=constants.SEARCH_SUGGEST_COUNT):
+    '''
+    :param query: 用户输入的内容
+    :return: [{'type': 'news'或'tag', 'id': .., 'text': ..}, ...]
+    '''
+    prefix = normalize_query(query)
+    if not prefix:
+        return []
+    return [{'type': kind, 'id': item_id, 'text': text}
+            for _, _, kind, item_id, text in _holder.get().complete(prefix, count)]
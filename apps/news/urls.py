@@ -8,7 +8,9 @@ urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     path('news/', views.NewsListView.as_view(), name='news_list'),
     path('news/banners/', views.NewsBanner.as_view(), name='news_banner'),
+    path('news/home/', views.NewsHomeView.as_view(), name='news_home'),
     path('news/<int:news_id>/', views.NewsDetailView.as_view(), name='news_detail'),
     path('news/<int:news_id>/comments/', views.NewsCommentView.as_view(), name='news_comments'),
     path('search/', views.SearchView(), name='search'),
+    path('search/suggest/', views.SearchSuggestView.as_view(), name='search_suggest'),
 ]
\ No newline at end of file
@@ -7,7 +7,7 @@ from django.shortcuts import render, HttpResponse
 # 导入类视图模块
 from django.views import View
 # 导入分页模块
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger, InvalidPage
 # 导入404模块
 from django.http import Http404
 
@@ -16,11 +16,20 @@ from django.http import Http404
 from . import models
 # 导入常量
 from . import constants
+# 导入缓存
+from . import caches
+# 导入点击量计数
+from . import clicks
+# 导入搜索结果缓存
+from . import search_cache
+# 导入搜索框联想词
+from . import suggest
 # 导入settings
 from myproject1 import settings
 
 # 其他的模块
 from utils.json_fun import to_json_data
+from utils import cursor_paginator
 from utils.res_code import Code, error_map
 from haystack.views import SearchView as _SearchView
 
@@ -35,10 +44,10 @@ def index(request):
 class IndexView(View):
     ''''''
     def get(self,request):
-        # 查数据库里的标签的数据
-        tags = models.Tag.objects.only('id', 'name').filter(is_delete=False) # 只查到没有被逻辑删除的数据的id和name
-        # 查询数据库里的热门新闻的数据(通过链接的方式查询news下的title、imgage_url、id且排除掉被逻辑删除掉了的和根据priority排序或者-news__clicks排序，最后用切片的方式只取前3)
-        hot_news = models.HotNews.objects.select_related('news').only('news__title', 'news__image_url', 'news__id').filter(is_delete=False).order_by('priority', '-news__clicks')[0:constants.SHOW_HOTNEWS_COUNT]
+        # 标签和热门新闻从主页快照中拿（后台修改数据后会重新生成快照，见caches.py）
+        snapshot = caches.get_homepage_snapshot()
+        tags = snapshot['tags']
+        hot_news = snapshot['hot_news']
         # # 上下文管理器
         # context = {
         #     'tags': tags
@@ -57,6 +66,8 @@ class NewsListView(View):
     # 后台返回前端：拿到7个字段（文章名、标签、简介、作者名、时间、图片、文章id）
     # 请求方式：GET
     # 传参方式：查询字符串    ?tag_id1%page=2
+    # 游标模式：?tag_id=1&cursor=   第一页cursor为空，之后传上一页返回的next_cursor，
+    #          返回next_cursor代替total_pages，没有更多数据时next_cursor为null
     '''
     def get(self, request):
         # 获取前端参数（因为是用查询字符串的方法获取参数的，所以用下面的方法）
@@ -67,47 +78,25 @@ class NewsListView(View):
         except Exception as e: # 如果用户报错，那我们就友好的给他正确的参数
             logger.error('标签的错误：\n{}'.format(e))
             tag_id = 0
+
+        # 游标模式（不需要COUNT和OFFSET，翻多深都一样快）
+        if 'cursor' in request.GET:
+            try:
+                data = caches.get_news_cursor_page(tag_id, request.GET.get('cursor'))
+            except ValueError as e:
+                logger.info('游标错误：\n{}'.format(e))
+                return to_json_data(errno=Code.PARAMERR, errmsg=error_map[Code.PARAMERR])
+            return to_json_data(data=data)
+
+        # 页码模式（保留给旧的客户端）
         try:
             page = int(request.GET.get('page', 1))
         except Exception as e:
             logger.error('页码错误：\n{}'.format(e))
             page = 1
 
-        # 从数据库获取数据
-        '''
-        # 在news中查title、digest、image_url、update_time
-        # 用select_related方法去关联其他的表
-        '''
-        # 用select_related方法去关联tag和author表，only方法只拿需要用的内容，返回的是查询集的格式
-        news_queryset = models.News.objects.select_related('tag', 'author').only('title', 'digest', 'image_url', 'update_time', 'tag__name', 'author__username') # id字段是默认会查的，不用主动写入
-        # 如果传的tag_id参数存在的话就直接赋值给news，或者tag_id不存在的话就赋值第二个给news
-        news = news_queryset.filter(is_delete=False, tag_id=tag_id) or news_queryset.filter(is_delete=False)
-
-        # 分页内容（把部分需要的内容给前端，不要一次性给全部）
-        paginator = Paginator(news, constants.PER_PAGE_NEWS_COUNT) # 第一个参数是拿到数据，第二个参数是每页要显示的数据条数
-        try: # 判断用户传的页数如否正确
-            news_info = paginator.page(page)
-        except EmptyPage: # 如果用户传的页数不对
-            logger.error('用户访问的页数大于总页数')
-            news_info = paginator.page(paginator.num_pages) # 我们就给他一个最后一页num_pages是最后一页的意思
-
-        # 序列化输出(因为我们返回给前端的是json格式的，所以要把格式给先安排一下)
-        news_info_list = []
-        for n in news_info:
-            news_info_list.append({
-                'id': n.id,
-                'title': n.title,
-                'digest': n.digest,
-                'image_url': n.image_url,
-                # 时间的格式化
-                'update_time': n.update_time.strftime('%Y年%m月%d日 %H:%M'),
-                'tag_name': n.tag.name,
-                'author': n.author.username,
-            })
-        data = {
-            'news': news_info_list,
-            'total_pages': paginator.num_pages,
-        }
+        # 从缓存获取数据，缓存里没有的话会去查数据库并写入缓存
+        data = caches.get_news_list(tag_id, page)
 
         # 返回前端
         return to_json_data(data=data)
@@ -119,23 +108,33 @@ class NewsBanner(View):
     # 要拿到轮播图表的image_url、news_id和新闻表的title
     '''
     def get(self, request):
-        # 从数据库中拿去数据（直接查询Banner中的image_url和news_id，用关联news查询news__title，且排除掉被逻辑删除掉了的和根据priority排序，最后用切片的方式只取前6）
-        banners = models.Banner.objects.select_related('news').only('image_url', 'news_id', 'news__title').filter(is_delete=False).order_by('priority')[0:constants.SHOW_BANNER_COUNT]
-        # 序列化输出
-        banners_info_list = []
-        for b in banners:
-            banners_info_list.append(
-                {
-                    'image_url':b.image_url,
-                    'news_id':b.news_id,
-                    'news_title':b.news.title
-                }
-            )
+        # 轮播图从主页快照中拿（快照里已经是按priority排序、只取前6的序列化数据）
         data = {
-            'banners':banners_info_list
+            'banners': caches.get_homepage_snapshot()['banners']
         }
         return to_json_data(data=data)
 
+# 主页数据合并接口
+class NewsHomeView(View):
+    '''
+    /news/home/
+    # 一次请求拿到主页需要的全部数据：标签、热门新闻、轮播图、第一页新闻列表
+    # 第一页新闻列表是游标模式的，下一页用news.next_cursor去请求/news/
+    '''
+    def get(self, request):
+        return to_json_data(data=caches.get_homepage_snapshot())
+
+# 一页评论（游标分页），一页只查一次数据库
+def get_comments_page(news_id, cursor):
+    '''
+    :return: (序列化后的评论列表, 下一页的游标)，游标不合法时抛出ValueError
+    '''
+    # 需要从数据库拿到content, update_time, author.username, parent.content, parent.author.username, parent.update_time
+    comments = models.Comments.objects.select_related('author', 'parent__author').only('content', 'update_time', 'news_id', 'author__username', 'parent__content', 'parent__update_time', 'parent__news_id', 'parent__author__username').filter(is_delete=False, news_id=news_id)
+    comments, next_cursor = cursor_paginator.get_cursor_page(comments, cursor, constants.PER_PAGE_COMMENTS_COUNT)
+    # 序列化输出(写在了models中)
+    return [comm.to_dict_data() for comm in comments], next_cursor
+
 # 文章详情
 class NewsDetailView(View):
     '''
@@ -149,23 +148,34 @@ class NewsDetailView(View):
         news = models.News.objects.select_related('tag', 'author').only('title', 'content', 'update_time', 'tag__name', 'author__username').filter(is_delete=False, id=news_id).first()
         # 如果从数据库中拿到了数据就返回
         if news:
-            # 评论功能写在这里
-            # 需要从数据库拿到content, update_time, parent.username, parent.content, parent.update_time
-            comments = models.Comments.objects.select_related('author', 'parent').only('content', 'update_time', 'author__username', 'parent__content', 'parent__author__username', 'parent__update_time').filter(is_delete=False, news_id=news_id)
-            # 序列化输出(写在了models中)
-            comments_info_list = []
-            for comm in comments:
-                comments_info_list.append(comm.to_dict_data())
+            # 记录点击量（先记到redis，定时批量写回数据库）
+            clicks.incr_click(news_id)
+            # 评论功能写在这里，只渲染第一页，后面的页通过ajax加载
+            comments_info_list, comments_next_cursor = get_comments_page(news_id, None)
             return render(request, 'news/news_detail.html', locals())
         # 否则报错
         else:
             raise Http404('新闻{}不存在'.format(news_id))
 
-# 回复评论
+# 评论列表和回复评论
 class NewsCommentView(View):
     '''
     /news/<int:news_id>/comments/
+    # GET：分页获取评论   ?cursor=   第一页cursor为空，之后传上一页返回的next_cursor
+    # POST：发表评论
     '''
+    def get(self, request, news_id):
+        try:
+            comments_info_list, next_cursor = get_comments_page(news_id, request.GET.get('cursor'))
+        except ValueError as e:
+            logger.info('评论游标错误：\n{}'.format(e))
+            return to_json_data(errno=Code.PARAMERR, errmsg=error_map[Code.PARAMERR])
+        data = {
+            'comments': comments_info_list,
+            'next_cursor': next_cursor,
+        }
+        return to_json_data(data=data)
+
     def post(self,request,news_id):
         # 判断用户是否有登录
         if not request.user.is_authenticated:
@@ -211,19 +221,52 @@ class NewsCommentView(View):
         # 返回前端，使用models.py中那个序列化
         return to_json_data(data=new_comment.to_dict_data())
 
+# 搜索框联想词
+class SearchSuggestView(View):
+    '''
+    /search/suggest/?q=&count=
+    # 返回以q开头的文章标题和标签名，按点击量排序
+    # 只查本进程内存里的联想词，不查数据库和elasticsearch
+    '''
+    def get(self, request):
+        try:
+            count = int(request.GET.get('count', constants.SEARCH_SUGGEST_COUNT))
+        except ValueError:
+            count = constants.SEARCH_SUGGEST_COUNT
+        count = min(max(count, 1), constants.SEARCH_SUGGEST_MAX_COUNT)
+        return to_json_data(data={'suggestions': suggest.complete(request.GET.get('q', ''), count)})
+
 # 搜索功能
 class SearchView(_SearchView):
     # 定义模版文件
     template = 'news/search.html'
 
+    # 关键字先规范化再交给haystack，大小写、全角半角、多余空格不同的关键字搜出来的是同一份结果
+    def __call__(self, request):
+        if request.GET.get('q'):
+            request.GET = request.GET.copy()
+            request.GET['q'] = search_cache.normalize_query(request.GET['q'])
+        return super(SearchView, self).__call__(request)
+
+    # 重写分页，一页搜索结果缓存一小段时间，索引更新时失效
+    def build_page(self):
+        try:
+            page_no = int(self.request.GET.get('page', 1))
+        except (TypeError, ValueError):
+            raise Http404('页码不正确')
+        try:
+            return search_cache.get_page(self.query, page_no, self.results_per_page, lambda: self.results)
+        except InvalidPage:
+            raise Http404('没有这一页')
+
     # 重写响应方式，如果请求参数q为空，返回模型News的热门新闻数据，否则根据参数q搜索相关数据
     def create_response(self):
         kw = self.request.GET.get('q', '') # 获取前端的url中有木有q
         # 判断有没有拿到搜索的关键字，如果没有就展示所有的
         if not kw:
             show_all = True # 展示所有数据（只是个标志而已）
-            # 从HotNews表中关联的news表中拿到news__title，news__image_url，news__id且要求是没被逻辑删除的，和按优先级排序或点击量排序
-            hot_news = models.HotNews.objects.select_related('news').only('news__title', 'news__image_url', 'news__id').filter(is_delete=False).order_by('priority', '-news__clicks')
+            # 按优先级和点击量排好序的热门新闻，和主页快照一起生成并缓存（见caches.py）
+            hot_news = caches.get_search_hot_news()
             # 分页
             paginator = Paginator(hot_news, settings.HAYSTACK_SEARCH_RESULTS_PER_PAGE)
             try:
@@ -0,0 +1,120 @@
+# 用户名、手机号是否已被注册的快速判断
+# redis里用两个集合保存所有已经注册的用户名和手机号，由 python manage.py warm_user_availability 初始化，
+# 之后用户新增、删除时由信号维护
+# 不在集合里的一定没有被注册，直接返回，不查数据库；在集合里的（可能用户已经改名或被删除）再查一次数据库确认
+import logging
+
+from django_redis import get_redis_connection
+
+from .models import Users
+from . import constants
+
+logger = logging.getLogger('django')
+
+_KEYS = {
+    'username': constants.TAKEN_USERNAMES_REDIS_KEY,
+    'mobile': constants.TAKEN_MOBILES_REDIS_KEY,
+}
+
+
+def _member(field, value):
+    '''
+    集合里保存的值：MySQL的用户名列是*_ci排序规则，不区分大小写，用户名统一转成小写
+    '''
+    return value.lower() if field == 'username' else value
+
+
+def _maybe_taken(field, value):
+    '''
+    :return: False表示一定没有被注册，True表示可能被注册了（需要查数据库）
+    '''
+    try:
+        con_redis = get_redis_connection(alias='default')
+        pl = con_redis.pipeline()
+        pl.exists(constants.TAKEN_INDEX_READY_REDIS_KEY)
+        pl.sismember(_KEYS[field], _member(field, value))
+        ready, is_member = pl.execute()
+    except Exception as e:
+        logger.error('读取用户名手机号集合异常：{}'.format(e))
+        return True
+    # 还没初始化过的话集合不完整，只能查数据库
+    return not ready or is_member
+
+
+def _is_taken(field, value):
+    if not value or not _maybe_taken(field, value):
+        return False
+    return Users.object.filter(**{field: value}).exists()
+
+
+def is_username_taken(username):
+    return _is_taken('username', username)
+
+
+def is_mobile_taken(mobile):
+    return _is_taken('mobile', mobile)
+
+
+def add_user(username, mobile):
+    '''
+    用户注册或修改后调用，把用户名和手机号加进集合
+    '''
+    con_redis = get_redis_connection(alias='default')
+    pl = con_redis.pipeline()
+    if username:
+        pl.sadd(constants.TAKEN_USERNAMES_REDIS_KEY, _member('username', username))
+    if mobile:
+        pl.sadd(constants.TAKEN_MOBILES_REDIS_KEY, mobile)
+    pl.execute()
+
+
+def remove_user(username, mobile):
+    '''
+    用户删除后调用，把用户名和手机号移出集合
+    '''
+    con_redis = get_redis_connection(alias='default')
+    pl = con_redis.pipeline()
+    if username:
+        pl.srem(constants.TAKEN_USERNAMES_REDIS_KEY, _member('username', username))
+    if mobile:
+        pl.srem(constants.TAKEN_MOBILES_REDIS_KEY, mobile)
+    pl.execute()
+
+
+def warm(batch_size=1000):
+    '''
+    用数据库里的全部用户重建两个集合
+    :return: 写入的用户数
+    '''
+    con_redis = get_redis_connection(alias='default')
+    tmp_keys = {field: key + '_tmp' for field, key in _KEYS.items()}
+    con_redis.delete(*tmp_keys.values())
+
+    count = 0
+    last_id = 0
+    while True:
+        # 按id分批取，不用OFFSET
+        rows = list(Users.object.filter(id__gt=last_id).order_by('id').values_list('id', 'username', 'mobile')[:batch_size])
+        if not rows:
+            break
+        pl = con_redis.pipeline()
+        pl.sadd(tmp_keys['username'], *[_member('username', r[1]) for r in rows])
+        pl.sadd(tmp_keys['mobile'], *[r[2] for r in rows if r[2]])
+        pl.execute()
+        count += len(rows)
+        last_id = rows[-1][0]
+
+    pl = con_redis.pipeline()
+    for field, key in _KEYS.items():
+        # 一个用户都没有时临时集合不存在，RENAME会报错，直接删掉旧的集合
+        if con_redis.exists(tmp_keys[field]):
+            pl.rename(tmp_keys[field], key)
+        else:
+            pl.delete(key)
+    pl.set(constants.TAKEN_INDEX_READY_REDIS_KEY, 1)
+    pl.execute()
+
+    # 重建期间新注册的用户可能被RENAME覆盖掉了，补上
+    for username, mobile in Users.object.filter(id__gt=last_id).values_list('username', 'mobile'):
+        add_user(username, mobile)
+    return count
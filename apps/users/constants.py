@@ -1,2 +1,9 @@
 # 用户session信息过期时间，单位秒，设置5天
-USER_SESSION_EXPIRES = 5*24*60*60
\ No newline at end of file
+USER_SESSION_EXPIRES = 5*24*60*60
+
+# 已被注册的用户名、手机号在redis中的key（集合）
+TAKEN_USERNAMES_REDIS_KEY = 'taken_usernames'
+TAKEN_MOBILES_REDIS_KEY = 'taken_mobiles'
+
+# 上面两个集合已经用数据库里的全部用户初始化过的标记，没有这个标记时查数据库
+TAKEN_INDEX_READY_REDIS_KEY = 'taken_index_ready'
\ No newline at end of file
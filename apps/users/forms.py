@@ -4,6 +4,7 @@ from django import forms
 from verifications.constants import SMS_CODE_NUMS
 from django_redis import get_redis_connection
 from .models import Users
+from . import availability
 # 导入django自带的Q方法(能把两个参数一起查询)
 from django.db.models import Q
 # 导入django自带的login方法
@@ -55,8 +56,8 @@ class RegisterForm(forms.Form):
         if not re.match(r"^1[3-9]\d{9}$", tel):
             # 如果不符合规则就报告信息
             raise forms.ValidationError("手机号码格式不正确")
-        # 使用自定义的models的方法判断手机号是否已经在数据库了
-        if Users.object.filter(mobile=tel).exists():
+        # 判断手机号是否已经注册了（先查redis的集合，可能注册了才查数据库）
+        if availability.is_mobile_taken(tel):
             # 如果已经存在就报告
             raise forms.ValidationError("手机号已注册，请重新输入！")
         # 最后返回用户输入的手机号
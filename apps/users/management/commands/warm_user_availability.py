@@ -0,0 +1,17 @@
+# 用数据库里的全部用户重建已注册用户名、手机号的redis集合
+# 使用：python manage.py warm_user_availability，部署后执行一次，之后由信号维护
+# 集合里只会多出已经改名或删除的旧数据（只会多查一次数据库），可以定期重建清理
+from django.core.management.base import BaseCommand
+
+from users import availability
+
+
+class Command(BaseCommand):
+    help = '重建已注册用户名、手机号的redis集合'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='每次从数据库取的用户数')
+
+    def handle(self, *args, **options):
+        count = availability.warm(batch_size=options['batch_size'])
+        self.stdout.write('写入了{}个用户'.format(count))
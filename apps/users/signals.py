@@ -0,0 +1,27 @@
+# 用户模块的信号，维护已注册用户名、手机号的集合
+import logging
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import models
+from . import availability
+
+logger = logging.getLogger('django')
+
+
+# 用__dict__取值，避免only()查询出来的实例再去查一次数据库
+@receiver(post_save, sender=models.Users)
+def user_saved(sender, instance, **kwargs):
+    try:
+        availability.add_user(instance.__dict__.get('username'), instance.__dict__.get('mobile'))
+    except Exception as e:
+        logger.error('更新用户名手机号集合异常：{}'.format(e))
+
+
+@receiver(post_delete, sender=models.Users)
+def user_deleted(sender, instance, **kwargs):
+    try:
+        availability.remove_user(instance.__dict__.get('username'), instance.__dict__.get('mobile'))
+    except Exception as e:
+        logger.error('更新用户名手机号集合异常：{}'.format(e))
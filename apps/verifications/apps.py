@@ -1,5 +1,17 @@
+import logging
+
 from django.apps import AppConfig
 
+logger = logging.getLogger('django')
+
 
 class VerificationsConfig(AppConfig):
     name = 'verifications'
+
+    def ready(self):
+        # 启动时加载lua脚本并缓存SHA，redis连不上时不影响启动，第一次调用时会再加载
+        from . import scripts
+        try:
+            scripts.load_scripts()
+        except Exception as e:
+            logger.error('加载redis脚本异常：{}'.format(e))
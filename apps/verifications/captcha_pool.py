@@ -0,0 +1,104 @@
+# 预先生成的图片验证码池
+# 生成验证码（加载字体、扭曲、旋转、JPEG编码）很耗CPU，放到后台进程里提前生成好存进redis的列表，
+# 请求进来时只需要LPOP一张；池子被取空时退回到同步生成，不影响用户
+# 后台生产者：python manage.py fill_captcha_pool --interval 1
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django_redis import get_redis_connection
+
+from utils.captcha.captcha import captcha
+from . import constants
+
+logger = logging.getLogger('django')
+
+# 文字和图片之间的分隔符，验证码文字只有字母和数字，不会出现这个字符
+SEPARATOR = b'|'
+
+
+def _pack(text, image):
+    return text.encode('utf8') + SEPARATOR + image
+
+
+def _unpack(value):
+    text, image = value.split(SEPARATOR, 1)
+    return text.decode('utf8'), image
+
+
+def _render(_=None):
+    '''
+    在子进程里生成一张验证码，必须是模块级函数才能被进程池调用
+    '''
+    return captcha.generate_captcha()
+
+
+def _incr_stat(con_redis, field, amount=1):
+    try:
+        con_redis.hincrby(constants.CAPTCHA_POOL_STATS_REDIS_KEY, field, amount)
+    except Exception as e:
+        logger.error('记录验证码池统计异常：{}'.format(e))
+
+
+def pop_captcha():
+    '''
+    从池子里取一张验证码，池子空了或者redis出问题时同步生成
+    :return: (text, image)
+    '''
+    try:
+        con_redis = get_redis_connection(alias='verify_codes')
+        value = con_redis.lpop(constants.CAPTCHA_POOL_REDIS_KEY)
+    except Exception as e:
+        logger.error('读取验证码池异常：{}'.format(e))
+        return _render()
+
+    if value is None:
+        _incr_stat(con_redis, 'fallback')
+        return _render()
+    _incr_stat(con_redis, 'popped')
+    return _unpack(value)
+
+
+def fill_pool(size=constants.CAPTCHA_POOL_SIZE, workers=None, executor=None):
+    '''
+    把池子补满到size张
+    :param workers: 进程数，默认为CPU核数
+    :param executor: 已经创建好的进程池，常驻运行时复用，不用每次重新启动子进程
+    :return: 这次补充的数量
+    '''
+    con_redis = get_redis_connection(alias='verify_codes')
+    missing = size - con_redis.llen(constants.CAPTCHA_POOL_REDIS_KEY)
+    if missing <= 0:
+        return 0
+
+    start = time.time()
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_render, range(missing)))
+    else:
+        results = list(executor.map(_render, range(missing)))
+    elapsed = time.time() - start
+
+    # 用RPUSH放到队尾，先生成的先被取走
+    pl = con_redis.pipeline()
+    pl.rpush(constants.CAPTCHA_POOL_REDIS_KEY, *[_pack(text, image) for text, image in results])
+    pl.hincrby(constants.CAPTCHA_POOL_STATS_REDIS_KEY, 'produced', len(results))
+    # 最近一次补充的速度（张/秒）
+    pl.hset(constants.CAPTCHA_POOL_STATS_REDIS_KEY, 'refill_rate', round(len(results) / elapsed, 2) if elapsed else 0)
+    pl.hset(constants.CAPTCHA_POOL_STATS_REDIS_KEY, 'last_fill_time', int(start))
+    pl.execute()
+    return len(results)
+
+
+def get_stats():
+    '''
+    :return: 池子当前的深度和累计的统计数据
+    '''
+    con_redis = get_redis_connection(alias='verify_codes')
+    pl = con_redis.pipeline()
+    pl.llen(constants.CAPTCHA_POOL_REDIS_KEY)
+    pl.hgetall(constants.CAPTCHA_POOL_STATS_REDIS_KEY)
+    depth, stats = pl.execute()
+    data = {k.decode('utf8'): v.decode('utf8') for k, v in stats.items()}
+    data['depth'] = depth
+    return data
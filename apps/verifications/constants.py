@@ -11,4 +11,28 @@ SMS_CODE_REDIS_EXPIRES = 5 * 60
 SMS_CODE_TEMP_ID = 1
 
 # 发送短信的间隔时间，单位秒
-SEND_SMS_CODE_INTERVAL = 60
\ No newline at end of file
+SEND_SMS_CODE_INTERVAL = 60
+
+# 预先生成的图片验证码池在redis中的key（列表）
+CAPTCHA_POOL_REDIS_KEY = 'captcha_pool'
+
+# 图片验证码池的统计数据在redis中的key（哈希）
+CAPTCHA_POOL_STATS_REDIS_KEY = 'captcha_pool_stats'
+
+# 图片验证码池保持的数量
+CAPTCHA_POOL_SIZE = 500
+
+# 待发送短信的队列在redis中的key（列表，存的是手机号）
+SMS_QUEUE_REDIS_KEY = 'sms_queue'
+
+# 每个手机号待发送的短信内容（哈希），同一个手机号在队列里只保留最新的一条
+SMS_PENDING_REDIS_KEY = 'sms_queue_pending'
+
+# 发送失败等待重试的短信（有序集合，分数为重试时间）
+SMS_RETRY_REDIS_KEY = 'sms_queue_retry'
+
+# 每条短信最多尝试发送的次数
+SMS_MAX_ATTEMPTS = 3
+
+# 第一次重试的等待时间，单位秒，之后每次翻倍
+SMS_RETRY_DELAY = 5
\ No newline at end of file
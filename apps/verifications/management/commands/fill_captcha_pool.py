@@ -0,0 +1,35 @@
+# 后台生成图片验证码，保持redis中的验证码池是满的
+# 使用：python manage.py fill_captcha_pool --interval 1，作为常驻进程运行
+# 加上 --stats 只打印池子的深度和统计数据
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from verifications import captcha_pool, constants
+
+
+class Command(BaseCommand):
+    help = '预先生成图片验证码放进redis的验证码池'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=constants.CAPTCHA_POOL_SIZE, help='池子保持的验证码数量')
+        parser.add_argument('--workers', type=int, default=None, help='生成验证码的进程数，默认为CPU核数')
+        parser.add_argument('--interval', type=float, default=0, help='大于0时常驻运行，每隔多少秒检查一次')
+        parser.add_argument('--stats', action='store_true', help='只打印池子的统计数据')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for k, v in sorted(captcha_pool.get_stats().items()):
+                self.stdout.write('{}: {}'.format(k, v))
+            return
+
+        # 常驻运行时进程池只创建一次
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                count = captcha_pool.fill_pool(size=options['size'], executor=executor)
+                if count:
+                    self.stdout.write('补充了{}张验证码'.format(count))
+                if options['interval'] <= 0:
+                    break
+                time.sleep(options['interval'])
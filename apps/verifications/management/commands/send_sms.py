@@ -0,0 +1,47 @@
+# 发送短信的后台worker，从redis的短信队列里取出验证码调用网关发送
+# 使用：python manage.py send_sms --workers 4，作为常驻进程运行
+# 加上 --gateway verifications.sms_gateways.FakeGateway 可以不真正发短信，用来本地压测
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from verifications import sms_queue
+from verifications.sms_gateways import get_gateway
+
+
+class Command(BaseCommand):
+    help = '从短信队列中取出验证码并发送'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='发送短信的线程数')
+        parser.add_argument('--gateway', default=None, help='网关类的路径，默认使用settings.SMS_GATEWAY')
+
+    def handle(self, *args, **options):
+        gateway = get_gateway(options['gateway'])
+        stop = threading.Event()
+
+        def work():
+            while not stop.is_set():
+                try:
+                    sms_queue.process_one(gateway)
+                except Exception as e:
+                    # redis断开之类的异常，稍等一下再继续
+                    self.stderr.write('发送短信异常：{}'.format(e))
+                    time.sleep(1)
+
+        # 发短信主要是等网关的响应，用线程就够了
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(options['workers'])]
+        for t in threads:
+            t.start()
+        self.stdout.write('启动了{}个发送短信的线程，网关：{}'.format(len(threads), type(gateway).__name__))
+
+        # 主线程负责把到时间的重试放回队列
+        try:
+            while True:
+                sms_queue.requeue_due_retries()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stop.set()
+            for t in threads:
+                t.join()
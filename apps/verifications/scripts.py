@@ -0,0 +1,75 @@
+# 验证码相关的redis lua脚本
+# 脚本在启动时(VerificationsConfig.ready)用SCRIPT LOAD加载并缓存SHA，之后每次调用只发一条EVALSHA
+# redis重启等原因丢了脚本时(NOSCRIPT)，重新加载一次再执行
+import logging
+
+from django_redis import get_redis_connection
+from redis.exceptions import NoScriptError
+
+from . import constants
+
+logger = logging.getLogger('django')
+
+# 发送短信验证码前的检查，返回值见下面的常量
+# KEYS：img_<uuid>、sms_flag_<手机号>、sms_<手机号>
+# ARGV：用户输入的图片验证码、短信验证码、发送间隔、短信验证码有效期、发送标记的值
+SEND_SMS_CODE_SCRIPT = """
+local real = redis.call('GET', KEYS[1])
+if not real then
+    return 1
+end
+redis.call('DEL', KEYS[1])
+if real ~= ARGV[1] then
+    return 1
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 2
+end
+redis.call('SETEX', KEYS[2], ARGV[3], ARGV[5])
+redis.call('SETEX', KEYS[3], ARGV[4], ARGV[2])
+return 0
+"""
+
+SEND_OK = 0
+# 图片验证码不存在、已过期或者不正确
+SEND_IMAGE_CODE_ERR = 1
+# 距离上一次发送还不到SEND_SMS_CODE_INTERVAL秒
+SEND_TOO_FREQUENT = 2
+
+_SCRIPTS = {
+    'send_sms_code': SEND_SMS_CODE_SCRIPT,
+}
+
+# 脚本名 -> SHA
+_shas = {}
+
+
+def load_scripts():
+    '''
+    把所有脚本加载到redis并缓存SHA
+    '''
+    con_redis = get_redis_connection(alias='verify_codes')
+    for name, script in _SCRIPTS.items():
+        _shas[name] = con_redis.script_load(script)
+
+
+def _call(name, keys, args):
+    con_redis = get_redis_connection(alias='verify_codes')
+    if name not in _shas:
+        _shas[name] = con_redis.script_load(_SCRIPTS[name])
+    try:
+        return con_redis.evalsha(_shas[name], len(keys), *(keys + args))
+    except NoScriptError:
+        _shas[name] = con_redis.script_load(_SCRIPTS[name])
+        return con_redis.evalsha(_shas[name], len(keys), *(keys + args))
+
+
+def send_sms_code(image_code_id, image_text, mobile, sms_code):
+    '''
+    一次原子操作完成：校验并删除图片验证码、检查发送间隔、保存短信验证码和发送标记
+    :return: SEND_OK、SEND_IMAGE_CODE_ERR或SEND_TOO_FREQUENT
+    '''
+    keys = ['img_{}'.format(image_code_id), 'sms_flag_{}'.format(mobile), 'sms_{}'.format(mobile)]
+    args = [image_text, sms_code, constants.SEND_SMS_CODE_INTERVAL, constants.SMS_CODE_REDIS_EXPIRES,
+            constants.SMS_CODE_TEMP_ID]
+    return _call('send_sms_code', keys, args)
@@ -0,0 +1,70 @@
+# 发送短信的网关
+# 在settings的SMS_GATEWAY中配置使用哪一个，发送失败时抛出SmsGatewayError，
+# 请求已经发到网关但不知道结果时抛出SmsGatewayUncertain，这种不能重发，否则用户可能收到两条短信
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('django')
+
+
+class SmsGatewayError(Exception):
+    pass
+
+
+class SmsGatewayUncertain(SmsGatewayError):
+    pass
+
+
+class BaseGateway(object):
+    def send(self, mobile, datas, temp_id):
+        '''
+        发送一条模板短信，失败时抛出SmsGatewayError
+        :param mobile: 手机号
+        :param datas: 模板里的参数，例如 ['666666', 5]
+        :param temp_id: 模板id
+        '''
+        raise NotImplementedError
+
+
+class CCPGateway(BaseGateway):
+    '''
+    云通讯
+    '''
+    def send(self, mobile, datas, temp_id):
+        from utils.yuntongxun.sms import CCP
+        try:
+            result = CCP().send_template_sms(mobile, datas, temp_id)
+        except Exception as e:
+            raise SmsGatewayError('云通讯请求异常：{}'.format(e))
+        if result == -2:
+            raise SmsGatewayUncertain('请求已发到云通讯，没有拿到发送结果')
+        if result != 0:
+            raise SmsGatewayError('云通讯返回发送失败')
+
+
+class FakeGateway(BaseGateway):
+    '''
+    假的网关，不真正发送，只模拟延迟和失败，用来在本地跑通整个流程和压测
+    '''
+    def __init__(self, latency=None, failure_rate=None):
+        options = getattr(settings, 'SMS_FAKE_GATEWAY', {})
+        self.latency = options.get('LATENCY', 0) if latency is None else latency
+        self.failure_rate = options.get('FAILURE_RATE', 0) if failure_rate is None else failure_rate
+
+    def send(self, mobile, datas, temp_id):
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise SmsGatewayError('模拟发送失败')
+        logger.info('[假网关]发送短信[ mobile: {} datas: {} temp_id: {} ]'.format(mobile, datas, temp_id))
+
+
+def get_gateway(path=None):
+    '''
+    :param path: 网关类的路径，默认使用settings.SMS_GATEWAY
+    '''
+    return import_string(path or settings.SMS_GATEWAY)()
@@ -0,0 +1,147 @@
+# 短信发送队列
+# 视图只把(手机号, 验证码, 模板id)放进redis的队列就返回，由后台的worker(python manage.py send_sms)调用网关真正发送
+# 同一个手机号在队列里只保留最新的一条；发送失败的放进重试的有序集合，到时间后重新入队，
+# 请求已经发到网关但不知道结果的(SmsGatewayUncertain)不重试，记为unknown
+# 每条验证码的发送状态记录在 sms_status_<手机号>_<验证码> 这个哈希里
+import json
+import logging
+import time
+
+from django_redis import get_redis_connection
+
+from . import constants
+from .sms_gateways import SmsGatewayError, SmsGatewayUncertain
+
+logger = logging.getLogger('django')
+
+# 发送状态
+STATUS_QUEUED = 'queued'
+STATUS_SENT = 'sent'
+STATUS_RETRYING = 'retrying'
+STATUS_FAILED = 'failed'
+# 请求已经发到网关，但没有拿到结果（读取超时等），可能已经发出去了
+STATUS_UNKNOWN = 'unknown'
+# 还没发出去验证码就已经过期或者被新的验证码替换了
+STATUS_EXPIRED = 'expired'
+
+
+def _status_key(mobile, code):
+    return 'sms_status_{}_{}'.format(mobile, code)
+
+
+def _set_status(con_redis, message, status, error=''):
+    key = _status_key(message['mobile'], message['code'])
+    pl = con_redis.pipeline()
+    pl.hmset(key, {
+        'status': status,
+        'attempts': message['attempts'],
+        'error': error,
+        'update_time': int(time.time()),
+    })
+    pl.expire(key, constants.SMS_CODE_REDIS_EXPIRES)
+    pl.execute()
+
+
+def _push(con_redis, message, overwrite=True):
+    '''
+    放进队列，同一个手机号已经在排队的话只替换内容，不重复入队
+    :param overwrite: False时如果已经有新的短信在排队，就丢掉这一条（用于重试）
+    '''
+    payload = json.dumps(message)
+    if overwrite:
+        is_new = con_redis.hset(constants.SMS_PENDING_REDIS_KEY, message['mobile'], payload)
+    else:
+        is_new = con_redis.hsetnx(constants.SMS_PENDING_REDIS_KEY, message['mobile'], payload)
+    if is_new:
+        con_redis.lpush(constants.SMS_QUEUE_REDIS_KEY, message['mobile'])
+    return bool(is_new)
+
+
+def enqueue(mobile, code, temp_id=constants.SMS_CODE_TEMP_ID):
+    '''
+    把一条验证码短信放进发送队列
+    '''
+    con_redis = get_redis_connection(alias='verify_codes')
+    message = {
+        'mobile': mobile,
+        'code': code,
+        'temp_id': temp_id,
+        'attempts': 0,
+    }
+    _push(con_redis, message)
+    _set_status(con_redis, message, STATUS_QUEUED)
+
+
+def get_status(mobile, code):
+    '''
+    :return: {'status': .., 'attempts': .., 'error': .., 'update_time': ..}，没有记录时返回空字典
+    '''
+    con_redis = get_redis_connection(alias='verify_codes')
+    return {k.decode('utf8'): v.decode('utf8') for k, v in con_redis.hgetall(_status_key(mobile, code)).items()}
+
+
+def _send(con_redis, gateway, message):
+    mobile = message['mobile']
+    # 验证码已经过期或者被新的替换了，就不用再发了
+    current_code = con_redis.get('sms_{}'.format(mobile))
+    if current_code is None or current_code.decode('utf8') != message['code']:
+        _set_status(con_redis, message, STATUS_EXPIRED)
+        return
+
+    message['attempts'] += 1
+    try:
+        gateway.send(mobile, [message['code'], constants.SMS_CODE_REDIS_EXPIRES // 60], message['temp_id'])
+    except SmsGatewayUncertain as e:
+        # 重发的话用户可能收到两条，收不到的话用户可以自己重新获取
+        _set_status(con_redis, message, STATUS_UNKNOWN, str(e))
+        logger.error('发送验证码短信[结果未知，不重试][ mobile: {} error: {} ]'.format(mobile, e))
+        return
+    except SmsGatewayError as e:
+        if message['attempts'] < constants.SMS_MAX_ATTEMPTS:
+            delay = constants.SMS_RETRY_DELAY * 2 ** (message['attempts'] - 1)
+            con_redis.zadd(constants.SMS_RETRY_REDIS_KEY, {json.dumps(message): time.time() + delay})
+            _set_status(con_redis, message, STATUS_RETRYING, str(e))
+            logger.warning('发送验证码短信[失败，{}秒后重试][ mobile: {} error: {} ]'.format(delay, mobile, e))
+        else:
+            _set_status(con_redis, message, STATUS_FAILED, str(e))
+            logger.error('发送验证码短信[失败][ mobile: {} error: {} ]'.format(mobile, e))
+        return
+    _set_status(con_redis, message, STATUS_SENT)
+    logger.info('发送验证码短信[成功][ mobile: {} ]'.format(mobile))
+
+
+def process_one(gateway, timeout=1):
+    '''
+    从队列里取一条短信并发送
+    :param timeout: 队列为空时最多阻塞等待的秒数
+    :return: 是否取到了短信
+    '''
+    con_redis = get_redis_connection(alias='verify_codes')
+    result = con_redis.brpop(constants.SMS_QUEUE_REDIS_KEY, timeout)
+    if not result:
+        return False
+    mobile = result[1].decode('utf8')
+    # 取出内容的同时删掉，之后同一个手机号的新短信会重新入队
+    pl = con_redis.pipeline()
+    pl.hget(constants.SMS_PENDING_REDIS_KEY, mobile)
+    pl.hdel(constants.SMS_PENDING_REDIS_KEY, mobile)
+    payload = pl.execute()[0]
+    if payload is None:
+        return True
+    _send(con_redis, gateway, json.loads(payload.decode('utf8')))
+    return True
+
+
+def requeue_due_retries():
+    '''
+    把到了重试时间的短信重新放进队列
+    :return: 重新入队的数量
+    '''
+    con_redis = get_redis_connection(alias='verify_codes')
+    count = 0
+    for payload in con_redis.zrangebyscore(constants.SMS_RETRY_REDIS_KEY, 0, time.time()):
+        # ZREM成功的那个worker才负责重新入队，避免多个worker重复处理
+        if con_redis.zrem(constants.SMS_RETRY_REDIS_KEY, payload):
+            if _push(con_redis, json.loads(payload.decode('utf8')), overwrite=False):
+                count += 1
+    return count
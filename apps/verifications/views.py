@@ -2,15 +2,15 @@
 from django.shortcuts import render # 基本的渲染模块
 from django.http import HttpResponse, JsonResponse    # 同上
 from django.views import View   # 继承模板类视图
-from utils.captcha.captcha import captcha   # 生成图片验证码的模块
+from verifications import captcha_pool   # 预先生成好的图片验证码池
 # 导入redis数据库的模块
 from django_redis import get_redis_connection
 # 把常量单独保存，导入使用
 from verifications import constants
 # 导入日志器
 import logging
-# 导入用户在数据库的信息模块，users里的models
-from users import models
+# 导入判断用户名、手机号是否已被注册的模块
+from users import availability
 # 导入自定义的返回json的方法
 from utils.json_fun import to_json_data
 # 导入json模块
@@ -21,8 +21,10 @@ from utils.res_code import Code, error_map
 from verifications.forms import CheckImgCodeForm
 # 导入随机模块，和字符串模块
 import random, string
-# 导入云通讯模块
-from utils.yuntongxun.sms import CCP
+# 导入短信发送队列
+from verifications import sms_queue
+# 导入验证码相关的redis脚本
+from verifications import scripts
 
 # 指定使用的django日志器
 logger = logging.getLogger('django')
@@ -34,8 +36,8 @@ class ImageCode(View):
     '''
     # 前端返回内容给后端，如果与数据库有关联就用post，没有就用get
     def get(self, request, image_code_id):
-        # 把调用验证码返回的两个数据赋值给text和image
-        text, image = captcha.generate_captcha()
+        # 从验证码池里取一张，池子空了会同步生成
+        text, image = captcha_pool.pop_captcha()
         # 链接我们的redis数据库verify_codes
         con_redis = get_redis_connection(alias='verify_codes')
         # 因为redis存数据是用键值对的形式，我们先自定义一个键
@@ -55,8 +57,8 @@ class CheckUsernameView(View):
     '''
     # 1.请求方式
     def get(self, request, username):
-        # 查询数据库里是否有符合条件的内容，有就返回数量count
-        count = models.Users.object.filter(username=username).count()
+        # 先查redis里已注册用户名的集合，不在集合里的不用查数据库，有就返回数量count
+        count = int(availability.is_username_taken(username))
         # 构造一个返回的json对象
         data = {
             'count': count,
@@ -71,7 +73,7 @@ class CheckMobileView(View):
     /mobiles/(?P<mobile>1[3-9]\d{9})/
     '''
     def get(self, request, mobile):
-        count = models.Users.object.filter(mobile=mobile).count()
+        count = int(availability.is_mobile_taken(mobile))
         data = {
             'count': count,
             'mobile': mobile,
@@ -116,39 +118,26 @@ class SmsCodesView(View):
             更好的方法：
             sms_num = ''.join([random.choice(string.digits) for _ in range(contants.SMS_CODE_NUMS)])
             '''
-            # 保存短信验证码
-            # 连接redis数据库
-            con_redis = get_redis_connection(alias='verify_codes')
-            # redis的管道服务，能把两个key同时存入
-            pl = con_redis.pipeline()
-            # 构建手机短信验证码的key
-            sms_text_fmt = 'sms_{}'.format(mobile)
-            # 构建验证码发送的标记的key
-            sms_flg_fmt = 'sms_flag_{}'.format(mobile)
+            # 校验并删除图片验证码、检查60秒的发送间隔、保存短信验证码和发送标记，在一个lua脚本里原子地完成
             try:
-                pl.setex(sms_flg_fmt, constants.SEND_SMS_CODE_INTERVAL, constants.SMS_CODE_TEMP_ID)    # 参数为：构建的key，有效期，标记
-                pl.setex(sms_text_fmt, constants.SMS_CODE_REDIS_EXPIRES, sms_num)    # 参数为：构建key，有效期，随机验证码
-                pl.execute()    # 发送数据到redis
+                result = scripts.send_sms_code(form.cleaned_data.get('image_code_id'),
+                                               form.cleaned_data.get('text'), mobile, sms_num)
             except Exception as e:
                 logger.debug('redis,执行异常了：{}'.format(e))
                 return to_json_data(errno=Code.UNKOWNERR, errmsg=error_map[Code.UNKOWNERR])
-            # 发送短信验证码
-            logger.info('发送短信验证码[成功~][ mobile: %s sms_code: %s]' % (mobile, sms_num))
+            if result == scripts.SEND_IMAGE_CODE_ERR:
+                return to_json_data(errno=Code.PARAMERR, errmsg='图形验证失败！')
+            if result == scripts.SEND_TOO_FREQUENT:
+                # 60秒内已经发送过一次了
+                return to_json_data(errno=Code.PARAMERR, errmsg='获取短信验证码过于频繁~')
+            # 发送短信验证码：放进发送队列，由后台的worker(python manage.py send_sms)调用网关发送
+            try:
+                sms_queue.enqueue(mobile, sms_num, constants.SMS_CODE_TEMP_ID)
+            except Exception as e:
+                logger.error('发送验证码短信[入队异常][ mobile: %s, message: %s ]' % (mobile, e))
+                return to_json_data(errno=Code.SMSERROR, errmsg=error_map[Code.SMSERROR])
+            logger.info('发送短信验证码[已入队][ mobile: %s sms_code: %s]' % (mobile, sms_num))
             return to_json_data(errno=Code.OK, errmsg='短信验证码发送成功~')
-            # try:
-            #     result = CCP().send_template_sms(mobile,
-            #                                      [sms_num,constants.SMS_CODE_REDIS_EXPIRES],
-            #                                      constants.SMS_CODE_TEMP_ID)
-            # except Exception as e:
-            #     logger.error("发送验证码短信[异常][ mobile: %s, message: %s ]" % (mobile, e))
-            #     return to_json_data(errno=Code.SMSERROR, errmsg=error_map[Code.SMSERROR])
-            # else:
-            #     if result == 0:
-            #         logger.info("发送验证码短信[正常][ mobile: %s sms_code: %s]" % (mobile, sms_num))
-            #         return to_json_data(errno=Code.OK, errmsg="短信验证码发送成功")
-            #     else:
-            #         logger.warning("发送验证码短信[失败][ mobile: %s ]" % mobile)
-            #         return to_json_data(errno=Code.SMSFAIL, errmsg=error_map[Code.SMSFAIL])
         # 返回前端
         else:
             # 定义一个错误信息列表
@@ -54,7 +54,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'utils.MyMiddleware.MyMiddleware'
+    'utils.MyMiddleware.MyMiddleware',
+    # 接口限流，规则在下面的RATELIMIT_RULES
+    'utils.RateLimitMiddleware.RateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'myproject1.urls'
@@ -249,8 +251,42 @@ HAYSTACK_CONNECTIONS = {
 }
 # 设置每页显示的数据量
 HAYSTACK_SEARCH_RESULTS_PER_PAGE = 5
-# 当数据库改变时，会自动更新索引
-HAYSTACK_SIGNAL_PROCESSOR = 'haystack.signals.RealtimeSignalProcessor'
+# 当数据库改变时，把文章id记到redis，由 python manage.py flush_search_index 批量更新索引
+HAYSTACK_SIGNAL_PROCESSOR = 'news.signal_processors.QueuedSignalProcessor'
+# elasticsearch的索引设置，替换haystack的默认设置：n-gram字段(NgramField)直接用n-gram分词器按1~2个字切分，
+# 中文标题、作者名的任意子串都能不带通配符查到；修改后需要 python manage.py rebuild_index
+ELASTICSEARCH_INDEX_SETTINGS = {
+    'settings': {
+        'analysis': {
+            'analyzer': {
+                'ngram_analyzer': {
+                    'type': 'custom',
+                    'tokenizer': 'haystack_ngram_tokenizer',
+                    'filter': ['lowercase'],
+                },
+                'edgengram_analyzer': {
+                    'type': 'custom',
+                    'tokenizer': 'standard',
+                    'filter': ['haystack_edgengram', 'lowercase'],
+                },
+            },
+            'tokenizer': {
+                'haystack_ngram_tokenizer': {
+                    'type': 'nGram',
+                    'min_gram': 1,
+                    'max_gram': 2,
+                },
+            },
+            'filter': {
+                'haystack_edgengram': {
+                    'type': 'edgeNGram',
+                    'min_gram': 2,
+                    'max_gram': 15,
+                },
+            },
+        },
+    },
+}
 
 # 站点域名和端口配置
 SITE_DOMAIN_PORT = "http://127.0.0.1:8989/"
@@ -258,5 +294,43 @@ SITE_DOMAIN_PORT = "http://127.0.0.1:8989/"
 # fastdfs服务的站点
 FASTDFS_SERVER_DOMAIN = "http://127.0.0.1:8888/"
 
+# 上传文件的存储，可以换成 utils.storage.LocalStorage 保存到MEDIA_ROOT，不需要FastDFS集群就能跑通上传和压测
+FILE_STORAGE = 'utils.storage.FastDFSStorage'
+# FastDFS客户端：每个进程的连接池大小，空闲超过多少秒的连接借出前先检查一次
+FASTDFS_CLIENT = {
+    'CONF_PATH': os.path.join(BASE_DIR, 'utils', 'fastdfs', 'client.conf'),
+    'POOL_SIZE': 10,
+    'HEALTH_CHECK_INTERVAL': 60,
+}
+
+# 文档下载的本地缓存
+# 生产环境由nginx发送文件，需要配置对应的internal location：
+#     location /protected/doc_cache/ { internal; alias <DIR>/; }
+DOC_CACHE = {
+    'DIR': os.path.join(BASE_DIR, 'doc_cache'),  # 缓存目录
+    'MAX_SIZE': 2 * 1024 * 1024 * 1024,  # 缓存的总大小上限，单位字节
+    # 配置后通过X-Accel-Redirect交给nginx发送文件，值为nginx里对应的location前缀
+    'ACCEL_REDIRECT': '/protected/doc_cache/',
+}
+
 # 登录页URL
-LOGIN_URL = 'users:login'
\ No newline at end of file
+LOGIN_URL = 'users:login'
+
+# 发送短信的网关，可以换成 verifications.sms_gateways.FakeGateway 做离线压测
+# 生产环境走云通讯
+SMS_GATEWAY = 'verifications.sms_gateways.CCPGateway'
+# 假网关的模拟延迟(秒)和失败率
+SMS_FAKE_GATEWAY = {
+    'LATENCY': 0.2,
+    'FAILURE_RATE': 0,
+}
+
+# 接口限流：url的name -> [(维度, 次数, 秒数), ...]，维度可以是 ip、session、mobile
+RATELIMIT_RULES = {
+    'verifications:image_code': [('ip', 30, 60)],
+    'verifications:check_username': [('ip', 60, 60)],
+    'verifications:check_mobile': [('ip', 60, 60)],
+    'verifications:sms_codes': [('ip', 10, 60), ('session', 5, 60), ('mobile', 5, 60 * 60)],
+}
+# 部署在nginx后面时用X-Forwarded-For里的第一个地址作为客户端ip
+RATELIMIT_USE_X_FORWARDED_FOR = False
\ No newline at end of file
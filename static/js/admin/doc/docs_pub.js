@@ -34,37 +34,127 @@ $(function () {
       });
 
   });
-  // ================== 上传文件至服务器 ================
+  // ================== 上传文件至服务器（分片上传，断开后可以续传） ================
   let $upload_file_server = $("#upload-file-server");
   $upload_file_server.change(function () {
-    // let _this = this;
     let file = this.files[0];   // 获取文件
-    let oFormData = new FormData();  // 创建一个 FormData
-    oFormData.append("text_file", file); // 把文件添加进去
-    // 发送请求
-    $.ajax({
-      url: "/admin/docs/files/",
-      method: "POST",
-      data: oFormData,
-      processData: false,   // 定义文件的传输
-      contentType: false,
-    })
+    if (!file) {
+      return
+    }
+    // 同一个文件上次没传完的话，接着上次的上传继续
+    let sResumeKey = "doc_upload_" + [file.name, file.size, file.lastModified].join("_");
+    let sUploadId = localStorage.getItem(sResumeKey);
+
+    let oRequest = sUploadId ? $.ajax({url: "/admin/docs/uploads/" + sUploadId + "/", type: "GET", dataType: "json"}) : null;
+    $.when(oRequest)
+      .then(function (res) {
+        if (res && res.errno === "0") {
+          return res
+        }
+        // 没有可以续传的记录，新建一次上传
+        return $.ajax({
+          url: "/admin/docs/uploads/",
+          type: "POST",
+          data: JSON.stringify({"filename": file.name, "size": file.size}),
+          contentType: "application/json; charset=utf-8",
+          dataType: "json",
+        })
+      })
       .done(function (res) {
-        if (res.errno === "0") {
-          message.showSuccess("文件上传成功");
-          let sTextFileUrl = res.data.text_file;
-          $docFileUrl.val('');
-          $docFileUrl.val(sTextFileUrl);
+        if (res.errno !== "0") {
+          message.showError(res.errmsg);
+          return
+        }
+        localStorage.setItem(sResumeKey, res.data.upload_id);
+        fn_upload_chunks(file, res.data, sResumeKey);
+      })
+      .fail(function () {
+        message.showError('服务器超时，请重试！');
+      });
+  });
 
+  // 依次上传还没收到的分片
+  function fn_upload_chunks(file, upload, sResumeKey) {
+    let aMissing = [];
+    for (let i = 0; i < upload.total_chunks; i++) {
+      if (upload.received.indexOf(i) === -1) {
+        aMissing.push(i);
+      }
+    }
+    let iDone = upload.total_chunks - aMissing.length;
+
+    function fn_next() {
+      if (!aMissing.length) {
+        if (upload.status === "failed") {
+          // 分片都在服务器上，上次保存失败的话让服务器重新推送即可
+          $.ajax({url: "/admin/docs/uploads/" + upload.upload_id + "/", type: "POST", dataType: "json"})
+            .always(function () {
+              fn_wait_push(upload.upload_id, sResumeKey);
+            });
+          return
+        }
+        fn_wait_push(upload.upload_id, sResumeKey);
+        return
+      }
+      let index = aMissing.shift();
+      let start = index * upload.chunk_size;
+      $.ajax({
+        url: "/admin/docs/uploads/" + upload.upload_id + "/chunks/" + index + "/",
+        type: "PUT",
+        data: file.slice(start, Math.min(start + upload.chunk_size, file.size)),
+        processData: false,
+        contentType: "application/octet-stream",
+        dataType: "json",
+      })
+        .done(function (res) {
+          if (res.errno !== "0") {
+            message.showError(res.errmsg);
+            return
+          }
+          iDone += 1;
+          $docFileUrl.val("正在上传 " + Math.floor(iDone * 100 / upload.total_chunks) + "%");
+          fn_next();
+        })
+        .fail(function () {
+          message.showError('上传中断，重新选择文件可以继续上传');
+        });
+    }
+
+    fn_next();
+  }
+
+  // 分片都传完后，等服务器推送到文件服务器，每秒查一次，最多等iMaxWaitPush秒
+  const iMaxWaitPush = 30 * 60;
+
+  function fn_wait_push(sUploadId, sResumeKey, iWaited) {
+    iWaited = iWaited || 0;
+    if (iWaited >= iMaxWaitPush) {
+      message.showError("保存文件超时，请稍后重新选择文件查看进度");
+      return
+    }
+    $docFileUrl.val("正在保存文件...");
+    $.ajax({url: "/admin/docs/uploads/" + sUploadId + "/", type: "GET", dataType: "json"})
+      .done(function (res) {
+        if (res.errno !== "0") {
+          message.showError(res.errmsg);
+          return
+        }
+        if (res.data.status === "done") {
+          localStorage.removeItem(sResumeKey);
+          message.showSuccess("文件上传成功");
+          $docFileUrl.val(res.data.url);
+        } else if (res.data.status === "failed") {
+          message.showError("文件保存失败，请重新选择文件重试");
         } else {
-          message.showError(res.errmsg)
+          setTimeout(function () {
+            fn_wait_push(sUploadId, sResumeKey, iWaited + 1);
+          }, 1000);
         }
       })
       .fail(function () {
         message.showError('服务器超时，请重试！');
       });
-
-  });
+  }
 
 
   // ================== 上传图片至七牛（云存储平台） ================
@@ -120,7 +120,8 @@ $(function () {
     })
       .done(function (res) {
         if (res.errno === "0") {
-          let sImageUrl = res["data"]["image_url"];
+          // 轮播图用轮播图尺寸的图片
+          let sImageUrl = res["data"]["banner_url"] || res["data"]["image_url"];
           $(_this).next().attr('src', sImageUrl);
         } else {
           message.showError(res.errmsg)
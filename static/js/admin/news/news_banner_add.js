@@ -25,7 +25,8 @@ $(function () {
     })
       .done(function (res) {
         if (res.errno === "0") {
-          let sImageUrl = res["data"]["image_url"];
+          // 轮播图用轮播图尺寸的图片
+          let sImageUrl = res["data"]["banner_url"] || res["data"]["image_url"];
           $(_this).next().attr('src', sImageUrl);
         } else {
           message.showError(res.errmsg)
@@ -91,13 +92,13 @@ $(function () {
           sImageUrl(轮播图url): ${sImageUrl}
     `);
 
+    // 没有上传轮播图时不传图片，由后台使用文章自带的轮播图尺寸的图片
     if (sImageUrl === '/static/images/banner_default.png') {
-      message.showError('轮播图不能为默认图片');
-      return
+      sImageUrl = '';
     }
 
     // 判断是否为 0, 表示在第一个 未选择
-    if (sTagId !== '0' && sNewsId !== '0' && priority !== '0' && sImageUrl) {
+    if (sTagId !== '0' && sNewsId !== '0' && priority !== '0') {
 
       let sDataParams = {
         "priority": priority,
@@ -28,6 +28,12 @@ $(function () {
           // console.log(thumbnailUrl);
           $thumbnailUrl.val('');
           $thumbnailUrl.val(sImageUrl);
+          // 记下同一张图片的其他尺寸，保存文章时一起提交
+          $thumbnailUrl.data({
+            "image-url": sImageUrl,
+            "thumbnail-url": res["data"]["thumbnail_url"],
+            "banner-url": res["data"]["banner_url"],
+          });
         } else {
           message.showError(res.errmsg)
         }
@@ -113,11 +119,15 @@ $(function () {
     // 获取news_id 存在表示更新 不存在表示发表
     let newsId = $(this).data("news-id");
     let url = newsId ? '/admin/news/' + newsId + '/' : '/admin/news/pub/';
+    // 手动改过图片地址的话，之前上传的其他尺寸就不对了，不提交
+    let bSameImage = $thumbnailUrl.data("image-url") === sThumbnailUrl;
     let data = {
       "title": sTitle,
       "digest": sDesc,
       "tag": sTagId,
       "image_url": sThumbnailUrl,
+      "thumbnail_url": bSameImage ? ($thumbnailUrl.data("thumbnail-url") || "") : "",
+      "banner_url": bSameImage ? ($thumbnailUrl.data("banner-url") || "") : "",
       "content": sContentHtml,
     };
 
@@ -1,14 +1,11 @@
 $(function () {
   // 新闻列表功能
   let $newsLi = $(".news-nav ul li");
-  let iPage = 1;  //默认第1页
-  let iTotalPage = 1; //默认总页数为1
+  let sNextCursor = "";  //下一页的游标，为空表示第1页
+  let bHasMore = true; //是否还有下一页
   let sCurrentTagId = 0; //默认分类标签为0
   let bIsLoadData = true;   // 是否正在向后台加载数据
 
-  // 加载新闻列表信息
-  fn_load_content();
-
   $newsLi.click(function () {
     // 点击分类标签，则为点击的标签加上一个class属性为active
     // 并移除其它兄弟元素上的，值为active的class属性
@@ -19,8 +16,8 @@ $(function () {
     if (sClickTagId !== sCurrentTagId) {
             sCurrentTagId = sClickTagId;  // 记录当前分类id
             // 重置分页参数
-            iPage = 1;
-            iTotalPage = 1;
+            sNextCursor = "";
+            bHasMore = true;
             fn_load_content()
         }
   });
@@ -43,9 +40,8 @@ $(function () {
       // 判断页数，去更新新闻数据
       if (!bIsLoadData) {
         bIsLoadData = true;
-        // 如果当前页数据如果小于总页数，那么才去加载数据
-        if (iPage < iTotalPage) {
-          iPage += 1;
+        // 如果还有下一页，那么才去加载数据
+        if (bHasMore) {
           $(".btn-more").remove();  // 删除标签
           // 去加载数据
           fn_load_content()
@@ -59,8 +55,8 @@ $(function () {
     }
   });
 
-  // 新闻轮播图功能
-  fn_load_banner();
+  // 轮播图和第一页新闻列表（一次请求拿到主页数据）
+  fn_load_home();
   /*=== bannerStart ===*/
   let $banner = $('.banner');
   let $picLi = $(".banner .pic li");
@@ -118,7 +114,7 @@ $(function () {
     // 创建请求参数
     let sDataParams = {
       "tag_id": sCurrentTagId,
-      "page": iPage
+      "cursor": sNextCursor
     };
 
     // 创建ajax请求
@@ -133,34 +129,7 @@ $(function () {
     })
       .done(function (res) {
         if (res.errno === "0") {
-          iTotalPage = res.data.total_pages;  // 后端传过来的总页数
-          if (iPage === 1) {
-            $(".news-list").html("")
-          }
-
-          res.data.news.forEach(function (one_news) {
-            let content = `
-              <li class="news-item">
-                 <a href="/news/${one_news.id}/" class="news-thumbnail" target="_blank">
-                    <img src="${one_news.image_url}" alt="${one_news.title}" title="${one_news.title}">
-                 </a>
-                 <div class="news-content">
-                    <h4 class="news-title"><a href="/news/${one_news.id}/" target="_blank">${one_news.title}</a></h4>
-                    <p class="news-details">${one_news.digest}</p>
-                    <div class="news-other">
-                      <span class="news-type">${one_news.tag_name}</span>
-                      <span class="news-time">${one_news.update_time}</span>
-                      <span class="news-author">${one_news.author}</span>
-                    </div>
-                 </div>
-              </li>`;
-            $(".news-list").append(content)
-          });
-
-          $(".news-list").append($('<a href="javascript:void(0);" class="btn-more">滚动加载更多</a>'));
-          // 数据加载完毕，设置正在加载数据的变量为false，表示当前没有在加载数据
-          bIsLoadData = false;
-
+          fn_render_news(res.data, !sDataParams.cursor);
         } else {
           // 登录失败，打印错误信息
           message.showError(res.errmsg);
@@ -171,10 +140,42 @@ $(function () {
       });
   }
 
-  function fn_load_banner() {
+  // 渲染新闻列表，bReset为true时先清空列表
+  function fn_render_news(data, bReset) {
+    sNextCursor = data.next_cursor;  // 后端传过来的下一页游标
+    bHasMore = !!sNextCursor;
+    if (bReset) {
+      $(".news-list").html("")
+    }
+
+    data.news.forEach(function (one_news) {
+      let content = `
+        <li class="news-item">
+           <a href="/news/${one_news.id}/" class="news-thumbnail" target="_blank">
+              <img src="${one_news.image_url}" alt="${one_news.title}" title="${one_news.title}">
+           </a>
+           <div class="news-content">
+              <h4 class="news-title"><a href="/news/${one_news.id}/" target="_blank">${one_news.title}</a></h4>
+              <p class="news-details">${one_news.digest}</p>
+              <div class="news-other">
+                <span class="news-type">${one_news.tag_name}</span>
+                <span class="news-time">${one_news.update_time}</span>
+                <span class="news-author">${one_news.author}</span>
+              </div>
+           </div>
+        </li>`;
+      $(".news-list").append(content)
+    });
+
+    $(".news-list").append($('<a href="javascript:void(0);" class="btn-more">滚动加载更多</a>'));
+    // 数据加载完毕，设置正在加载数据的变量为false，表示当前没有在加载数据
+    bIsLoadData = false;
+  }
+
+  function fn_load_home() {
     $.ajax({
       // 请求地址
-      url: "/news/banners/",  // url尾部需要添加/
+      url: "/news/home/",  // url尾部需要添加/
       // 请求方式
       type: "GET",
       async: false
@@ -200,6 +201,8 @@ $(function () {
             $(".pic").append(content);
             $(".tab").append(tab_content)
           });
+          // 第一页新闻列表
+          fn_render_news(res.data.news, true);
 
         } else {
           // 登录失败，打印错误信息
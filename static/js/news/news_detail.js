@@ -5,6 +5,11 @@ $(function () {
   let $loginComment = $('.please-login-comment input');
   let $send_comment = $('.logged-comment .comment-btn');
 
+  // 评论的作者和内容是用户输入的，拼进html之前先转义
+  function fn_escape(value) {
+    return $("<div>").text(value).html();
+  }
+
   $('.comment-list').delegate('a,input', 'click', function () {
 
     let sClassValue = $(this).prop('class');
@@ -48,21 +53,21 @@ $(function () {
           <li class="comment-item">
             <div class="comment-info clearfix">
               <img src="/static/images/avatar.jpeg" alt="avatar" class="comment-avatar">
-              <span class="comment-user">${one_comment.author}</span>
+              <span class="comment-user">${fn_escape(one_comment.author)}</span>
             </div>
-            <div class="comment-content">${one_comment.content}</div>
+            <div class="comment-content">${fn_escape(one_comment.content)}</div>
 
                 <div class="parent_comment_text">
-                  <div class="parent_username">${one_comment.parent.author}</div>
+                  <div class="parent_username">${fn_escape(one_comment.parent.author)}</div>
                   <br/>
                   <div class="parent_content_text">
-                    ${one_comment.parent.content}
+                    ${fn_escape(one_comment.parent.content)}
                   </div>
                 </div>
 
-              <div class="comment_time left_float">${one_comment.update_time}</div>
+              <div class="comment_time left_float">${fn_escape(one_comment.update_time)}</div>
               <a href="javascript:;" class="reply_a_tag right_float">回复</a>
-              <form class="reply_form left_float" comment-id="${one_comment.content_id}" news-id="${one_comment.news_id}">
+              <form class="reply_form left_float" comment-id="${fn_escape(one_comment.content_id)}" news-id="${fn_escape(one_comment.news_id)}">
                 <textarea class="reply_input"></textarea>
                 <input type="button" value="回复" class="reply_btn right_float">
                 <input type="reset" name="" value="取消" class="reply_cancel right_float">
@@ -153,13 +158,13 @@ $(function () {
           <li class="comment-item">
             <div class="comment-info clearfix">
               <img src="/static/images/avatar.jpeg" alt="avatar" class="comment-avatar">
-              <span class="comment-user">${one_comment.author}</span>
+              <span class="comment-user">${fn_escape(one_comment.author)}</span>
             </div>
-            <div class="comment-content">${one_comment.content}</div>
+            <div class="comment-content">${fn_escape(one_comment.content)}</div>
 
-              <div class="comment_time left_float">${one_comment.update_time}</div>
+              <div class="comment_time left_float">${fn_escape(one_comment.update_time)}</div>
               <a href="javascript:;" class="reply_a_tag right_float">回复</a>
-              <form class="reply_form left_float" comment-id="${one_comment.content_id}" news-id="${one_comment.news_id}">
+              <form class="reply_form left_float" comment-id="${fn_escape(one_comment.content_id)}" news-id="${fn_escape(one_comment.news_id)}">
                 <textarea class="reply_input"></textarea>
                 <input type="button" value="回复" class="reply_btn right_float">
                 <input type="reset" name="" value="取消" class="reply_cancel right_float">
@@ -189,6 +194,63 @@ $(function () {
       });
   });
 
+  // 加载更多评论
+  $('.comment-contain').delegate('.btn-more-comments', 'click', function () {
+    let $this = $(this);
+    let news_id = $this.attr('news-id');
+    $.ajax({
+      url: "/news/" + news_id + "/comments/",
+      type: "GET",
+      data: {"cursor": $this.attr('data-cursor')},
+      dataType: "json",
+    })
+      .done(function (res) {
+        if (res.errno === "0") {
+          res.data.comments.forEach(function (one_comment) {
+            let html_parent = ``;
+            if (one_comment.parent) {
+              html_parent = `
+              <div class="parent_comment_text">
+                <div class="parent_username">${fn_escape(one_comment.parent.author)}</div>
+                <br/>
+                <div class="parent_content_text">
+                  ${fn_escape(one_comment.parent.content)}
+                </div>
+              </div>`;
+            }
+            let html_comment = `
+          <li class="comment-item">
+            <div class="comment-info clearfix">
+              <img src="/static/images/avatar.jpeg" alt="avatar" class="comment-avatar">
+              <span class="comment-user">${fn_escape(one_comment.author)}</span>
+            </div>
+            <div class="comment-content">${fn_escape(one_comment.content)}</div>
+            ${html_parent}
+            <div class="comment_time left_float">${fn_escape(one_comment.update_time)}</div>
+            <a href="javascript:;" class="reply_a_tag right_float">回复</a>
+            <form class="reply_form left_float" comment-id="${fn_escape(one_comment.content_id)}" news-id="${fn_escape(one_comment.news_id)}">
+              <textarea class="reply_input"></textarea>
+              <input type="button" value="回复" class="reply_btn right_float">
+              <input type="reset" name="" value="取消" class="reply_cancel right_float">
+            </form>
+          </li>`;
+            $(".comment-list").append(html_comment);
+          });
+          // 还有下一页就更新游标，没有就删除按钮
+          if (res.data.next_cursor) {
+            $this.attr('data-cursor', res.data.next_cursor);
+          } else {
+            $this.remove();
+          }
+        } else {
+          message.showError(res.errmsg);
+        }
+      })
+      .fail(function () {
+        message.showError('服务器超时，请重试！');
+      });
+  });
+
   // get cookie using jQuery
   function getCookie(name) {
     let cookieValue = null;
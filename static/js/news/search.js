@@ -0,0 +1,45 @@
+$(function () {
+  // 搜索框联想词
+  let $searchInput = $(".search-box .search-control");
+  let $suggestList = $("#search-suggest");
+  let iTimer = null;     // 输入停顿后再请求，避免每输入一个字就请求一次
+  let sLastQuery = "";   // 上一次请求的关键字
+
+  $searchInput.on("input", function () {
+    clearTimeout(iTimer);
+    iTimer = setTimeout(fn_load_suggest, 150);
+  });
+
+  function fn_load_suggest() {
+    let sQuery = $.trim($searchInput.val());
+    if (sQuery === sLastQuery) {
+      return
+    }
+    sLastQuery = sQuery;
+    if (!sQuery) {
+      $suggestList.html("");
+      return
+    }
+
+    $.ajax({
+      url: "/search/suggest/",
+      type: "GET",
+      data: {"q": sQuery},
+      dataType: "json",
+    })
+      .done(function (res) {
+        // 返回的是之前输入的关键字的结果就不用了
+        if (res.errno !== "0" || sQuery !== sLastQuery) {
+          return
+        }
+        let content = ``;
+        res.data.suggestions.forEach(function (one_suggest) {
+          content += `<option value="${$("<div>").text(one_suggest.text).html()}"></option>`;
+        });
+        $suggestList.html(content);
+      })
+      .fail(function () {
+        $suggestList.html("");
+      });
+  }
+});
@@ -103,8 +103,8 @@ $(function () {
           message.showError(res.errmsg);
         }
       })
-      .fail(function(){
-        message.showError('服务器超时，请重试！');
+      .fail(function (xhr) {
+        message.showError(xhr.status === 429 ? xhr.responseJSON.errmsg : '服务器超时，请重试！');
       });
 
   });
@@ -256,8 +256,8 @@ $(function () {
           sReturnValue = "success"
         }
       })
-      .fail(function () {
-        message.showError('服务器超时，请重试！');
+      .fail(function (xhr) {
+        message.showError(xhr.status === 429 ? xhr.responseJSON.errmsg : '服务器超时，请重试！');
         sReturnValue = ""
       });
     return sReturnValue
@@ -291,8 +291,8 @@ $(function () {
           sReturnValue = "success"
         }
       })
-      .fail(function () {
-        message.showError('服务器超时，请重试！');
+      .fail(function (xhr) {
+        message.showError(xhr.status === 429 ? xhr.responseJSON.errmsg : '服务器超时，请重试！');
         sReturnValue = ""
       });
     return sReturnValue
@@ -0,0 +1,123 @@
+# 接口限流中间件
+# 在settings的RATELIMIT_RULES里按url的name配置规则，每条规则是(维度, 次数, 秒数)的令牌桶：
+# 桶的容量是“次数”，每“秒数”补满一次；维度可以是 ip、session、mobile（url参数或json包体里的手机号）
+# 一个请求涉及的所有桶在一段lua脚本里一起检查和扣减，只有一次redis往返；
+# 被拒绝的请求在本进程里记下解封时间，解封前再来的请求直接拒绝，不再访问redis
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+from django_redis import get_redis_connection
+
+from utils.json_fun import to_json_data
+from utils.res_code import Code, error_map
+
+logger = logging.getLogger('django')
+
+# KEYS：每个桶的key；ARGV[1]：当前毫秒时间，之后每个桶两个参数：容量、每毫秒补充的令牌数
+# 所有桶都有令牌时每个桶扣1并返回{0, 0}，否则不扣减，返回{令牌不够的桶的序号(从1开始), 需要等待的毫秒数}
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local t = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    t = math.min(capacity, t + math.max(0, now - ts) * rate)
+    if t < 1 then
+        return {i, math.ceil((1 - t) / rate)}
+    end
+    tokens[i] = t
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    redis.call('HMSET', KEYS[i], 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate))
+end
+return {0, 0}
+"""
+
+# 本进程里被拒绝的桶的解封时间，超过这个数量就清空，避免占用太多内存
+MAX_BLOCKED_KEYS = 10000
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.rules = getattr(settings, 'RATELIMIT_RULES', {})
+        self.script = None
+        self.blocked = {}
+
+    def get_ident(self, request, scope, view_kwargs):
+        '''
+        :return: 请求在这个维度上的标识，拿不到时返回None（这条规则不生效）
+        '''
+        if scope == 'ip':
+            if getattr(settings, 'RATELIMIT_USE_X_FORWARDED_FOR', False):
+                forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+                if forwarded:
+                    return forwarded.split(',')[0].strip()
+            return request.META.get('REMOTE_ADDR')
+        if scope == 'session':
+            return request.session.session_key
+        if scope == 'mobile':
+            if 'mobile' in view_kwargs:
+                return view_kwargs['mobile']
+            try:
+                return str(json.loads(request.body.decode('utf8')).get('mobile') or '') or None
+            except (ValueError, AttributeError):
+                return None
+        raise ValueError('不支持的限流维度：{}'.format(scope))
+
+    def reject(self, retry_after):
+        response = to_json_data(errno=Code.REQERR, errmsg=error_map[Code.REQERR])
+        response.status_code = 429
+        response['Retry-After'] = max(1, int(retry_after + 0.999))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        rules = self.rules.get(view_name)
+        if not rules:
+            return None
+
+        keys, args = [], []
+        for scope, limit, period in rules:
+            ident = self.get_ident(request, scope, view_kwargs)
+            if ident is None:
+                continue
+            keys.append('ratelimit_{}_{}_{}'.format(view_name, scope, ident))
+            args.extend([limit, limit / (period * 1000.0)])
+        if not keys:
+            return None
+
+        now = time.time()
+        for key in keys:
+            until = self.blocked.get(key)
+            if until and until > now:
+                return self.reject(until - now)
+
+        try:
+            if self.script is None:
+                # register_script发送的是EVALSHA，redis里没有这段脚本时会自动改用EVAL
+                self.script = get_redis_connection(alias='default').register_script(TOKEN_BUCKET_SCRIPT)
+            index, wait_ms = self.script(keys=keys, args=[int(now * 1000)] + args)
+        except Exception as e:
+            # redis出问题时不限流，不影响正常访问
+            logger.error('限流检查异常：{}'.format(e))
+            return None
+
+        if not index:
+            return None
+        if len(self.blocked) >= MAX_BLOCKED_KEYS:
+            self.blocked.clear()
+        # 记下令牌不够的那个桶的解封时间，只影响本进程，解封后会重新问redis
+        key = keys[index - 1]
+        self.blocked[key] = now + wait_ms / 1000.0
+        logger.warning('请求过于频繁[ {} ]'.format(key))
+        return self.reject(wait_ms / 1000.0)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Measures captcha generation speed with and without the font/glyph cache.
+
+Usage (from the project root):
+    python -m utils.captcha.benchmark -n 500
+"""
+
+import argparse
+import time
+
+from utils.captcha.captcha import Captcha
+
+
+def run(captcha, number):
+    # warm up, the first captchas pay for loading fonts and filling the cache
+    for _ in range(20):
+        captcha.generate_captcha()
+    start = time.perf_counter()
+    for _ in range(number):
+        captcha.generate_captcha()
+    return number / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='captcha generation benchmark')
+    parser.add_argument('-n', '--number', type=int, default=300, help='captchas generated per run')
+    args = parser.parse_args()
+
+    before = run(Captcha(glyph_cache_size=0), args.number)
+    after = run(Captcha(), args.number)
+    print('without cache: {:.1f} captchas/sec'.format(before))
+    print('with cache:    {:.1f} captchas/sec'.format(after))
+    print('speedup:       {:.2f}x'.format(after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,13 @@
 import random
 import string
 import os.path
+import threading
+from collections import OrderedDict
 from io import BytesIO
 
 from PIL import Image
 from PIL import ImageFilter
+from PIL import ImageOps
 from PIL.ImageDraw import Draw
 from PIL.ImageFont import truetype
 
@@ -53,10 +56,17 @@ class Bezier:
 
 
 class Captcha(object):
-    def __init__(self):
+    # glyph cache size, 0 disables both the font and the glyph cache
+    GLYPH_CACHE_SIZE = 2048
+
+    def __init__(self, glyph_cache_size=GLYPH_CACHE_SIZE):
         self._bezier = Bezier()
         self._dir = os.path.dirname(__file__)
         # self._captcha_path = os.path.join(self._dir, '..', 'static', 'captcha')
+        self._glyph_cache_size = glyph_cache_size
+        self._fonts = {}
+        self._glyphs = OrderedDict()
+        self._lock = threading.Lock()
 
     @staticmethod
     def instance():
@@ -64,48 +74,88 @@ class Captcha(object):
             Captcha._instance = Captcha()
         return Captcha._instance
 
-    def initialize(self, width=200, height=75, color=None, text=None, fonts=None):
-        # self.image = Image.new('RGB', (width, height), (255, 255, 255))
-        self._text = text if text else random.sample(string.ascii_uppercase + string.ascii_uppercase + '3456789', 4)
-        self.fonts = fonts if fonts else \
-            [os.path.join(self._dir, 'fonts', font) for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf']]
-        self.width = width
-        self.height = height
-        self._color = color if color else self.random_color(0, 200, random.randint(220, 255))
+    # All per-captcha state (text, size, color, random generator) is passed
+    # explicitly, the instance only holds read-mostly caches, so one Captcha
+    # can be shared by every thread of a worker.
+
+    @staticmethod
+    def random_text(rng=random):
+        return ''.join(rng.sample(string.ascii_uppercase + string.ascii_uppercase + '3456789', 4))
+
+    def default_fonts(self):
+        return [os.path.join(self._dir, 'fonts', font) for font in ['Arial.ttf', 'Georgia.ttf', 'actionj.ttf']]
+
+    def get_font(self, name, size):
+        """ Loads a FreeType font once and keeps it for the lifetime of the process
+        """
+        if not self._glyph_cache_size:
+            return truetype(name, size)
+        font = self._fonts.get((name, size))
+        if font is None:
+            font = self._fonts.setdefault((name, size), truetype(name, size))
+        return font
+
+    def glyph(self, c, name, size):
+        """ Returns the cropped coverage mask ('L', white on black) of a single
+            character. It does not depend on the text color, so there are only
+            characters x fonts x sizes entries; the color is applied in text().
+            The returned image is shared and must not be modified in place.
+        """
+        key = (c, name, size)
+        if self._glyph_cache_size:
+            with self._lock:
+                char_image = self._glyphs.get(key)
+                if char_image is not None:
+                    self._glyphs.move_to_end(key)
+                    return char_image
+
+        font = self.get_font(name, size)
+        c_width, c_height = Draw(Image.new('RGB', (1, 1))).textsize(c, font=font)
+        char_image = Image.new('L', (c_width, c_height), 0)
+        char_draw = Draw(char_image)
+        char_draw.text((0, 0), c, font=font, fill=255)
+        char_image = char_image.crop(char_image.getbbox())
+
+        if self._glyph_cache_size:
+            with self._lock:
+                self._glyphs[key] = char_image
+                if len(self._glyphs) > self._glyph_cache_size:
+                    self._glyphs.popitem(last=False)
+        return char_image
 
     @staticmethod
-    def random_color(start, end, opacity=None):
-        red = random.randint(start, end)
-        green = random.randint(start, end)
-        blue = random.randint(start, end)
+    def random_color(start, end, opacity=None, rng=random):
+        red = rng.randint(start, end)
+        green = rng.randint(start, end)
+        blue = rng.randint(start, end)
         if opacity is None:
             return red, green, blue
         return red, green, blue, opacity
 
     # draw image
 
-    def background(self, image):
-        Draw(image).rectangle([(0, 0), image.size], fill=self.random_color(238, 255))
+    def background(self, image, rng=random):
+        Draw(image).rectangle([(0, 0), image.size], fill=self.random_color(238, 255, rng=rng))
         return image
 
     @staticmethod
     def smooth(image):
         return image.filter(ImageFilter.SMOOTH)
 
-    def curve(self, image, width=4, number=6, color=None):
+    def curve(self, image, color, width=4, number=6, rng=random):
         dx, height = image.size
         dx /= number
-        path = [(dx * i, random.randint(0, height))
+        path = [(dx * i, rng.randint(0, height))
                 for i in range(1, number)]
         bcoefs = self._bezier.make_bezier(number - 1)
         points = []
         for coefs in bcoefs:
             points.append(tuple(sum([coef * p for coef, p in zip(coefs, ps)])
                                 for ps in zip(*path)))
-        Draw(image).line(points, fill=color if color else self._color, width=width)
+        Draw(image).line(points, fill=color, width=width)
         return image
 
-    def noise(self, image, number=50, level=2, color=None):
+    def noise(self, image, color, number=50, level=2, rng=random):
         width, height = image.size
         dx = width / 10
         width -= dx
@@ -113,28 +163,23 @@ class Captcha(object):
         height -= dy
         draw = Draw(image)
         for i in range(number):
-            x = int(random.uniform(dx, width))
-            y = int(random.uniform(dy, height))
-            draw.line(((x, y), (x + level, y)), fill=color if color else self._color, width=level)
+            x = int(rng.uniform(dx, width))
+            y = int(rng.uniform(dy, height))
+            draw.line(((x, y), (x + level, y)), fill=color, width=level)
         return image
 
-    def text(self, image, fonts, font_sizes=None, drawings=None, squeeze_factor=0.75, color=None):
-        color = color if color else self._color
-        fonts = tuple([truetype(name, size)
+    def text(self, image, text, fonts, color, font_sizes=None, drawings=None, squeeze_factor=0.75, rng=random):
+        fonts = tuple([(name, size)
                        for name in fonts
                        for size in font_sizes or (65, 70, 75)])
-        draw = Draw(image)
         char_images = []
-        for c in self._text:
-            font = random.choice(fonts)
-            c_width, c_height = draw.textsize(c, font=font)
-            char_image = Image.new('RGB', (c_width, c_height), (0, 0, 0))
-            char_draw = Draw(char_image)
-            char_draw.text((0, 0), c, font=font, fill=color)
-            char_image = char_image.crop(char_image.getbbox())
-            for drawing in drawings:
+        for c in text:
+            name, size = rng.choice(fonts)
+            # the distortions below always return new images, the cached glyph is left untouched
+            char_image = self.glyph(c, name, size)
+            for drawing in drawings or ():
                 d = getattr(self, drawing)
-                char_image = d(char_image)
+                char_image = d(char_image, rng=rng)
             char_images.append(char_image)
         width, height = image.size
         offset = int((width - sum(int(i.size[0] * squeeze_factor)
@@ -142,6 +187,9 @@ class Captcha(object):
                       char_images[-1].size[0]) / 2)
         for char_image in char_images:
             c_width, c_height = char_image.size
+            # drawing the text in color on black gives color * coverage, which is
+            # what colorize() produces from the cached coverage mask
+            char_image = ImageOps.colorize(char_image, (0, 0, 0), color[:3])
             mask = char_image.convert('L').point(lambda i: i * 1.97)
             image.paste(char_image,
                         (offset, int((height - c_height) / 2)),
@@ -151,15 +199,15 @@ class Captcha(object):
 
     # draw text
     @staticmethod
-    def warp(image, dx_factor=0.27, dy_factor=0.21):
+    def warp(image, dx_factor=0.27, dy_factor=0.21, rng=random):
         width, height = image.size
         dx = width * dx_factor
         dy = height * dy_factor
-        x1 = int(random.uniform(-dx, dx))
-        y1 = int(random.uniform(-dy, dy))
-        x2 = int(random.uniform(-dx, dx))
-        y2 = int(random.uniform(-dy, dy))
-        image2 = Image.new('RGB',
+        x1 = int(rng.uniform(-dx, dx))
+        y1 = int(rng.uniform(-dy, dy))
+        x2 = int(rng.uniform(-dx, dx))
+        y2 = int(rng.uniform(-dy, dy))
+        image2 = Image.new(image.mode,
                            (width + abs(x1) + abs(x2),
                             height + abs(y1) + abs(y2)))
         image2.paste(image, (abs(x1), abs(y1)))
@@ -172,45 +220,66 @@ class Captcha(object):
              width2 - x2, -y1))
 
     @staticmethod
-    def offset(image, dx_factor=0.1, dy_factor=0.2):
+    def offset(image, dx_factor=0.1, dy_factor=0.2, rng=random):
         width, height = image.size
-        dx = int(random.random() * width * dx_factor)
-        dy = int(random.random() * height * dy_factor)
-        image2 = Image.new('RGB', (width + dx, height + dy))
+        dx = int(rng.random() * width * dx_factor)
+        dy = int(rng.random() * height * dy_factor)
+        image2 = Image.new(image.mode, (width + dx, height + dy))
         image2.paste(image, (dx, dy))
         return image2
 
     @staticmethod
-    def rotate(image, angle=25):
+    def rotate(image, angle=25, rng=random):
         return image.rotate(
-            random.uniform(-angle, angle), Image.BILINEAR, expand=1)
+            rng.uniform(-angle, angle), Image.BILINEAR, expand=1)
 
-    def captcha(self, path=None, fmt='JPEG'):
-        """Create a captcha.
+    def render(self, text, width=200, height=75, color=None, fonts=None, fmt='JPEG', rng=None):
+        """Render a captcha image for the given text.
 
         Args:
-            path: save path, default None.
+            text: the characters drawn on the image.
+            width, height: image size.
+            color: text/curve/noise color, random when None.
+            fonts: font file paths, the bundled fonts when None.
             fmt: image format, PNG / JPEG.
+            rng: a random.Random used for every random choice, the
+                module level generator when None. A seeded generator
+                makes the output reproducible.
         Returns:
-            A tuple, (text, StringIO.value).
-            For example:
-                ('JGW9', '\x89PNG\r\n\x1a\n\x00\x00\x00\r...')
+            The encoded image bytes.
 
         """
-        image = Image.new('RGB', (self.width, self.height), (255, 255, 255))
-        image = self.background(image)
-        image = self.text(image, self.fonts, drawings=['warp', 'rotate', 'offset'])
-        image = self.curve(image)
-        image = self.noise(image)
+        rng = rng or random
+        fonts = fonts or self.default_fonts()
+        color = color or self.random_color(0, 200, rng.randint(220, 255), rng=rng)
+        image = Image.new('RGB', (width, height), (255, 255, 255))
+        image = self.background(image, rng=rng)
+        image = self.text(image, text, fonts, color, drawings=['warp', 'rotate', 'offset'], rng=rng)
+        image = self.curve(image, color, rng=rng)
+        image = self.noise(image, color, rng=rng)
         image = self.smooth(image)
-        text = "".join(self._text)
         out = BytesIO()
         image.save(out, format=fmt)
-        return text, out.getvalue()
+        return out.getvalue()
+
+    def captcha(self, path=None, fmt='JPEG', rng=None):
+        """Create a captcha with random text.
+
+        Args:
+            path: unused, kept for compatibility.
+            fmt: image format, PNG / JPEG.
+            rng: see render().
+        Returns:
+            A tuple, (text, bytes).
+            For example:
+                ('JGW9', '\x89PNG\r\n\x1a\n\x00\x00\x00\r...')
+
+        """
+        text = self.random_text(rng or random)
+        return text, self.render(text, fmt=fmt, rng=rng)
 
-    def generate_captcha(self):
-        self.initialize()
-        return self.captcha("")
+    def generate_captcha(self, rng=None):
+        return self.captcha("", rng=rng)
 
 
 captcha = Captcha.instance()
@@ -0,0 +1,51 @@
+# 游标分页（keyset分页）
+# 按模型默认的排序(-update_time, -id)往后翻页，用上一页最后一条数据的(update_time, id)做条件，
+# 不需要COUNT(*)，也没有OFFSET，翻到多深的页数查询代价都一样
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(obj):
+    """
+    :param obj: 当前页的最后一条数据
+    :return: 前端拿到的不透明的游标字符串
+    """
+    raw = '{}|{}'.format(obj.update_time.isoformat(), obj.id)
+    return base64.urlsafe_b64encode(raw.encode('utf8')).decode('utf8').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    :param cursor: encode_cursor生成的字符串
+    :return: (update_time, id)，游标不合法时抛出ValueError
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode((cursor + padding).encode('utf8')).decode('utf8')
+        update_time, pk = raw.rsplit('|', 1)
+        update_time = parse_datetime(update_time)
+        pk = int(pk)
+    except Exception as e:
+        raise ValueError('游标不合法：{}'.format(e))
+    if update_time is None:
+        raise ValueError('游标不合法：{}'.format(cursor))
+    return update_time, pk
+
+
+def get_cursor_page(queryset, cursor, per_page):
+    """
+    :param queryset: 查询集（需要有update_time和id字段）
+    :param cursor: 上一次返回的游标，为空表示第一页
+    :param per_page: 每页数据条数
+    :return: (当前页的数据列表, 下一页的游标)，没有下一页时游标为None
+    """
+    if cursor:
+        update_time, pk = decode_cursor(cursor)
+        # 写成 update_time <= t AND (update_time < t OR id < pk)，让数据库能按update_time走索引范围扫描
+        queryset = queryset.filter(update_time__lte=update_time).filter(Q(update_time__lt=update_time) | Q(id__lt=pk))
+    # 多取一条，用来判断是否还有下一页
+    items = list(queryset.order_by('-update_time', '-id')[:per_page + 1])
+    next_cursor = encode_cursor(items[per_page - 1]) if len(items) > per_page else None
+    return items[:per_page], next_cursor
@@ -1,3 +1,11 @@
+# FastDFS客户端
+# 配置文件用绝对路径，不依赖启动时的工作目录；导入时不创建客户端，由utils.storage.FastDFSStorage按需创建
+import os
+
 from fdfs_client.client import Fdfs_client
 
-FDFS_Client = Fdfs_client('utils/fastdfs/client.conf')
\ No newline at end of file
+CONF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'client.conf')
+
+
+def new_client(conf_path=None):
+    return Fdfs_client(conf_path or CONF_PATH)
@@ -0,0 +1,11 @@
+# 不依赖elasticsearch的本地搜索引擎，作为haystack的后端使用
+# settings里配置：
+# HAYSTACK_CONNECTIONS = {
+#     'default': {
+#         'ENGINE': 'utils.local_search.backend.LocalSearchEngine',
+#         'PATH': os.path.join(BASE_DIR, 'search_index', 'news.idx'),
+#     },
+# }
+# 倒排索引保存在PATH指定的文件里，搜索时用mmap读取；其他进程发现文件变了会重新打开
+# 更新、删除文档只写旁边的增量文件，增量超过DELTA_MAX_DOCS(默认500)篇后才整体重写主索引，
+# 合并一次的耗时和文档总数成正比（每篇约四百个词时五千篇约十五秒），文章再多就应该换成elasticsearch
@@ -0,0 +1,296 @@
+# haystack的本地搜索后端
+# 只有文档字段(document=True，例如NewsIndex.text)做分词建倒排索引，用BM25打分；
+# 其他存储字段(标题、作者、标签、时间等)保存原值，用于字段过滤、排序和生成搜索结果
+import datetime
+import fcntl
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.utils.dateparse import parse_datetime
+from haystack.backends import BaseEngine, BaseSearchBackend, BaseSearchQuery, SearchNode, log_query
+from haystack.constants import ID, DJANGO_CT, DJANGO_ID
+from haystack.inputs import BaseInput
+from haystack.models import SearchResult
+from haystack.utils import get_identifier, get_model_ct
+
+from .index import DeltaReader, delta_path, read_delta, remove_delta, write_delta, write_index
+from .tokenizer import normalize, tokenize, tokenize_query
+
+# 每个索引文件在本进程里只打开一份，所有线程共用
+_readers = {}
+_readers_lock = threading.Lock()
+
+# 增量里的文档数超过这个数时和主索引合并，可以在HAYSTACK_CONNECTIONS里用DELTA_MAX_DOCS修改
+DELTA_MAX_DOCS = 500
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def get_reader(path):
+    '''
+    :return: 最新的DeltaReader，索引文件或增量文件被替换过就重新打开
+    '''
+    signature = (_signature(path), _signature(delta_path(path)))
+    with _readers_lock:
+        cached = _readers.get(path)
+        if cached is None or cached[0] != signature:
+            # 旧的reader可能还有线程在用，不主动关闭，没有引用后mmap会自动释放
+            cached = (signature, DeltaReader(path if signature[0] else None, read_delta(path)))
+            _readers[path] = cached
+        return cached[1]
+
+
+def _coerce(stored, value):
+    '''
+    把查询条件里的值转成和存储的值相同的类型再比较
+    '''
+    if isinstance(value, BaseInput):
+        value = value.query_string
+    if isinstance(stored, datetime.datetime) and isinstance(value, str):
+        return parse_datetime(value) or value
+    if isinstance(stored, int) and not isinstance(stored, bool) and isinstance(value, str) and value.lstrip('-').isdigit():
+        return int(value)
+    return value
+
+
+def _compare(stored, filter_type, value):
+    if stored is None:
+        return False
+    if isinstance(stored, (list, tuple)):
+        return any(_compare(s, filter_type, value) for s in stored)
+    if filter_type == 'in':
+        return any(_compare(stored, 'exact', v) for v in value)
+    if filter_type == 'range':
+        low, high = value
+        return _compare(stored, 'gte', low) and _compare(stored, 'lte', high)
+    value = _coerce(stored, value)
+    try:
+        if filter_type == 'exact':
+            return stored == value or str(stored) == str(value)
+        if filter_type in ('content', 'contains', 'fuzzy'):
+            return normalize(str(value)) in normalize(str(stored))
+        if filter_type == 'startswith':
+            return normalize(str(stored)).startswith(normalize(str(value)))
+        if filter_type == 'endswith':
+            return normalize(str(stored)).endswith(normalize(str(value)))
+        if filter_type == 'gt':
+            return stored > value
+        if filter_type == 'gte':
+            return stored >= value
+        if filter_type == 'lt':
+            return stored < value
+        if filter_type == 'lte':
+            return stored <= value
+    except TypeError:
+        return False
+    raise ValueError('不支持的过滤条件：{}'.format(filter_type))
+
+
+class LocalSearchBackend(BaseSearchBackend):
+    def __init__(self, connection_alias, **connection_options):
+        super(LocalSearchBackend, self).__init__(connection_alias, **connection_options)
+        if not connection_options.get('PATH'):
+            raise ValueError('本地搜索需要在HAYSTACK_CONNECTIONS里配置PATH（索引文件的路径）')
+        self.path = connection_options['PATH']
+        self.delta_max_docs = connection_options.get('DELTA_MAX_DOCS', DELTA_MAX_DOCS)
+
+    @contextmanager
+    def _write_lock(self):
+        # 更新索引的进程之间用文件锁互斥，读索引不需要加锁
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _save_delta(self, delta):
+        '''
+        增量不大时只重写增量文件；超过上限后合并：整体重写一次主索引(和文档总数成正比)，再删掉增量文件。
+        两步之间读到的是新的主索引加旧的增量，增量叠加上去结果不变
+        '''
+        if len(delta) <= self.delta_max_docs:
+            write_delta(self.path, delta)
+            return
+        write_index(self.path, DeltaReader(self.path, delta).to_mutable())
+        remove_delta(self.path)
+
+    def update(self, index, iterable, commit=True):
+        content_field = index.get_content_field()
+        with self._write_lock():
+            delta = read_delta(self.path)
+            for obj in iterable:
+                prepared = index.full_prepare(obj)
+                terms = Counter(tokenize(prepared.get(content_field) or ''))
+                fields = {}
+                for field in index.fields.values():
+                    name = field.index_fieldname
+                    if not field.stored or name in (content_field, ID, DJANGO_CT, DJANGO_ID) or name not in prepared:
+                        continue
+                    fields[name] = prepared[name]
+                delta[get_identifier(obj)] = {
+                    'django_ct': get_model_ct(obj),
+                    'django_id': str(obj.pk),
+                    'fields': fields,
+                    'terms': dict(terms),
+                    'length': sum(terms.values()),
+                }
+            self._save_delta(delta)
+
+    def remove(self, obj_or_string, commit=True):
+        with self._write_lock():
+            delta = read_delta(self.path)
+            # 记成null，合并时从主索引里删掉
+            delta[get_identifier(obj_or_string)] = None
+            self._save_delta(delta)
+
+    def clear(self, models=None, commit=True):
+        with self._write_lock():
+            if models:
+                cts = {get_model_ct(model) for model in models}
+                docs = DeltaReader(self.path, read_delta(self.path)).to_mutable()
+                docs = {k: v for k, v in docs.items() if v['django_ct'] not in cts}
+            else:
+                docs = {}
+            write_index(self.path, docs)
+            remove_delta(self.path)
+
+    def _match_text(self, reader, text, scores):
+        '''
+        全文搜索：包含所有词的文档，前面带“-”的词表示排除
+        '''
+        include, exclude = [], []
+        for word in text.replace('"', ' ').split():
+            if word.startswith('-') and len(word) > 1:
+                exclude.append(word[1:])
+            else:
+                include.append(word)
+
+        result = None
+        for term in tokenize_query(' '.join(include)):
+            matched = reader.bm25(term, scores)
+            result = matched if result is None else result & matched
+            if not result:
+                return set()
+        if result is None:
+            return set()
+        for term in tokenize_query(' '.join(exclude)):
+            result -= {docnum for docnum, _ in reader.postings(term)}
+        return result
+
+    def _match(self, reader, node, scores, universe):
+        if node[0] == 'all':
+            return set(universe)
+        if node[0] == 'leaf':
+            _, field, filter_type, value = node
+            if field is None:
+                text = value.query_string if isinstance(value, BaseInput) else str(value)
+                return self._match_text(reader, text, scores) & universe
+            return {docnum for docnum in universe if _compare(reader.field(docnum, field), filter_type, value)}
+
+        connector, negated, children = node
+        if connector == 'AND':
+            # 全文条件查倒排索引，先算；后面的字段条件只在前面匹配到的文档里逐个比较
+            result = universe
+            for child in sorted(children, key=lambda child: not (child[0] == 'leaf' and child[1] is None)):
+                result = self._match(reader, child, scores, result)
+                if not result:
+                    break
+        else:
+            result = set.union(*[self._match(reader, child, scores, universe) for child in children])
+        return universe - result if negated else result
+
+    @log_query
+    def search(self, query_string, start_offset=0, end_offset=None, sort_by=None, models=None,
+               result_class=None, **kwargs):
+        reader = get_reader(self.path)
+        if models:
+            cts = {get_model_ct(model) for model in models}
+            universe = {docnum for docnum in reader.docnums() if reader.docs[docnum][1] in cts}
+        else:
+            universe = set(reader.docnums())
+
+        scores = {}
+        matched = self._match(reader, query_string, scores, universe)
+
+        # 默认按得分从高到低，得分相同的按文档顺序
+        docnums = sorted(matched, key=lambda docnum: (-scores.get(docnum, 0.0), docnum))
+        for field in reversed(sort_by or []):
+            reverse = field.startswith('-')
+            name = field.lstrip('-')
+            if name == 'score':
+                docnums.sort(key=lambda docnum: scores.get(docnum, 0.0), reverse=reverse)
+                continue
+            # 没有这个字段的文档排在最后
+            present = [d for d in docnums if reader.field(d, name) is not None]
+            missing = [d for d in docnums if reader.field(d, name) is None]
+            present.sort(key=lambda docnum: reader.field(docnum, name), reverse=reverse)
+            docnums = present + missing
+
+        result_class = result_class or SearchResult
+        results = []
+        for docnum in docnums[start_offset:end_offset]:
+            django_ct, django_id = reader.docs[docnum][1:3]
+            app_label, model_name = django_ct.split('.')
+            results.append(result_class(app_label, model_name, django_id, scores.get(docnum, 0.0),
+                                        **reader.stored_fields(docnum)))
+        return {
+            'results': results,
+            'hits': len(docnums),
+            'facets': {},
+            'spelling_suggestion': None,
+        }
+
+
+class LocalSearchQuery(BaseSearchQuery):
+    '''
+    不拼成查询字符串，而是把SQ的条件树转成嵌套的元组交给后端：
+    ('AND'/'OR', 是否取反, [子节点...])，叶子节点为 ('leaf', 字段名, 过滤类型, 值)，字段名为None表示全文搜索
+    '''
+    def __str__(self):
+        return repr(self.build_query())
+
+    def matching_all_fragment(self):
+        return ('all',)
+
+    def build_query_fragment(self, field, filter_type, value):
+        # 只用于调试时显示查询条件
+        return '{}__{}={!r}'.format(field, filter_type, getattr(value, 'query_string', value))
+
+    def _index_fieldname(self, field):
+        if field == 'content':
+            return None
+        from haystack import connections
+        return connections[self._using].get_unified_index().get_index_fieldname(field)
+
+    def _build_node(self, node):
+        children = []
+        for child in node.children:
+            if isinstance(child, SearchNode):
+                sub = self._build_node(child)
+                if sub:
+                    children.append(sub)
+                continue
+            expression, value = child
+            field, filter_type = node.split_expression(expression)
+            children.append(('leaf', self._index_fieldname(field), filter_type, value))
+        if not children:
+            return None
+        return (node.connector, node.negated, children)
+
+    def build_query(self):
+        return self._build_node(self.query_filter) or self.matching_all_fragment()
+
+
+class LocalSearchEngine(BaseEngine):
+    backend = LocalSearchBackend
+    query = LocalSearchQuery
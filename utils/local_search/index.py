@@ -0,0 +1,312 @@
+# 倒排索引文件的读写
+#
+# 文件格式（小端）：
+#   文件头   MAGIC(4字节) 版本号(uint32) 文档表的偏移和长度 词典的偏移和长度(4个uint64)
+#   倒排表   每个词一段 (文档序号uint32, 词频uint32) 的数组，按文档序号升序
+#   长字段   每篇文档较长的存储字段(例如正文)的JSON，只在取结果时才解析
+#   文档表   JSON：[[文档id, django_ct, django_id, 词数, 短字段, 长字段偏移, 长字段长度], ...]
+#   词典     JSON：{词: [倒排表偏移, 文档数]}
+# 读取时文档表和词典加载到内存，倒排表和长字段通过mmap按需读取
+#
+# 新增、修改、删除的文档先记在旁边的增量文件(<索引文件>.delta)里：
+#   JSON：{文档id: 文档(和IndexReader.to_mutable的格式相同), 删除的文档为null}
+# 每次更新只重写增量文件，代价和增量的大小成正比；增量超过上限后才和主索引合并，整体重写一次主索引。
+# 读取时用DeltaReader把增量叠加在主索引上：主索引里被修改或删除的文档跳过，增量里的文档接在后面编号
+import datetime
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'LSI1'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQQQ')
+# 超过这个长度的字符串字段放到长字段里
+INLINE_MAX_LENGTH = 200
+
+# BM25的参数
+K1 = 1.2
+B = 0.75
+
+
+def _default(value):
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, set):
+        return list(value)
+    raise TypeError('不能序列化的类型：{}'.format(type(value)))
+
+
+def _object_hook(obj):
+    if '__datetime__' in obj:
+        return datetime.datetime.fromisoformat(obj['__datetime__'])
+    if '__date__' in obj:
+        return datetime.date.fromisoformat(obj['__date__'])
+    return obj
+
+
+def dumps(value):
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf8')
+
+
+def loads(data):
+    return json.loads(data.decode('utf8'), object_hook=_object_hook)
+
+
+class IndexReader(object):
+    '''
+    只读的索引，多个线程可以同时使用
+    '''
+    def __init__(self, path=None):
+        self.path = path
+        self._file = None
+        self._mm = None
+        self.docs = []
+        self.terms = {}
+        self.avgdl = 0.0
+        if path and os.path.exists(path):
+            self._open(path)
+
+    def _open(self, path):
+        self._file = open(path, 'rb')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            return
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, docs_offset, docs_length, terms_offset, terms_length = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('不是本地搜索的索引文件：{}'.format(path))
+        self.docs = loads(self._mm[docs_offset:docs_offset + docs_length])
+        self.terms = loads(self._mm[terms_offset:terms_offset + terms_length])
+        if self.docs:
+            self.avgdl = sum(d[3] for d in self.docs) / len(self.docs)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def docnums(self):
+        '''
+        :return: 所有有效文档的序号
+        '''
+        return range(len(self.docs))
+
+    def postings(self, term):
+        '''
+        :return: 出现这个词的 [(文档序号, 词频), ...]
+        '''
+        entry = self.terms.get(term)
+        if entry is None:
+            return []
+        offset, count = entry
+        values = array('I')
+        values.frombytes(self._mm[offset:offset + count * 8])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return list(zip(values[0::2], values[1::2]))
+
+    def bm25(self, term, scores):
+        '''
+        把这个词对每篇文档的BM25得分累加到scores里
+        :return: 包含这个词的文档序号集合
+        '''
+        postings = self.postings(term)
+        if not postings:
+            return set()
+        n = len(self)
+        idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+        avgdl = self.avgdl or 1.0
+        for docnum, tf in postings:
+            dl = self.docs[docnum][3]
+            scores[docnum] = scores.get(docnum, 0.0) + idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * dl / avgdl))
+        return {docnum for docnum, _ in postings}
+
+    def field(self, docnum, name):
+        '''
+        取一个短字段的值，短字段里没有的话再去长字段里找
+        '''
+        inline = self.docs[docnum][4]
+        if name in inline:
+            return inline[name]
+        return self.stored_fields(docnum).get(name)
+
+    def stored_fields(self, docnum):
+        doc_id, django_ct, django_id, length, inline, offset, size = self.docs[docnum]
+        fields = dict(inline)
+        if size:
+            fields.update(loads(self._mm[offset:offset + size]))
+        return fields
+
+    def to_mutable(self):
+        '''
+        把整个索引读出来，用于修改后重写
+        :return: {文档id: {'django_ct', 'django_id', 'fields', 'terms', 'length'}}
+        '''
+        docs = {}
+        for docnum, (doc_id, django_ct, django_id, length, inline, offset, size) in enumerate(self.docs):
+            docs[doc_id] = {
+                'django_ct': django_ct,
+                'django_id': django_id,
+                'fields': self.stored_fields(docnum),
+                'terms': {},
+                'length': length,
+            }
+        by_docnum = [d[0] for d in self.docs]
+        for term in self.terms:
+            for docnum, tf in self.postings(term):
+                docs[by_docnum[docnum]]['terms'][term] = tf
+        return docs
+
+
+class DeltaReader(IndexReader):
+    '''
+    主索引加上增量，接口和IndexReader相同；增量里的文档所有字段都放在短字段里
+    '''
+    def __init__(self, path=None, delta=None):
+        super(DeltaReader, self).__init__(path)
+        self.delta = delta or {}
+        self._base = len(self.docs)
+        self._deleted = {docnum for docnum, row in enumerate(self.docs) if row[0] in self.delta}
+        self._delta_postings = {}
+        self.docs = list(self.docs)
+        for doc_id, doc in sorted(self.delta.items()):
+            if doc is None:
+                continue
+            docnum = len(self.docs)
+            self.docs.append([doc_id, doc['django_ct'], doc['django_id'], doc['length'], doc['fields'], 0, 0])
+            for term, tf in doc['terms'].items():
+                self._delta_postings.setdefault(term, []).append((docnum, tf))
+        live = [self.docs[docnum][3] for docnum in self.docnums()]
+        self.avgdl = sum(live) / len(live) if live else 0.0
+
+    def __len__(self):
+        return len(self.docs) - len(self._deleted)
+
+    def docnums(self):
+        return (docnum for docnum in range(len(self.docs)) if docnum not in self._deleted)
+
+    def postings(self, term):
+        postings = super(DeltaReader, self).postings(term)
+        if self._deleted:
+            postings = [entry for entry in postings if entry[0] not in self._deleted]
+        return postings + self._delta_postings.get(term, [])
+
+    def stored_fields(self, docnum):
+        if docnum >= self._base:
+            return dict(self.docs[docnum][4])
+        return super(DeltaReader, self).stored_fields(docnum)
+
+    def to_mutable(self):
+        # 主索引里被修改、删除的文档和增量里的文档都以增量为准
+        docs = super(DeltaReader, self).to_mutable()
+        for doc_id, doc in self.delta.items():
+            if doc is None:
+                docs.pop(doc_id, None)
+            else:
+                docs[doc_id] = doc
+        return docs
+
+
+def delta_path(path):
+    return path + '.delta'
+
+
+def read_delta(path):
+    '''
+    :return: 增量 {文档id: 文档或None}，没有增量文件时返回空字典
+    '''
+    try:
+        with open(delta_path(path), 'rb') as f:
+            return loads(f.read())
+    except FileNotFoundError:
+        return {}
+
+
+def _replace(path, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_delta(path, delta):
+    _replace(delta_path(path), dumps(delta))
+
+
+def remove_delta(path):
+    try:
+        os.remove(delta_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def write_index(path, docs):
+    '''
+    把 IndexReader.to_mutable 格式的数据写成索引文件，先写临时文件再替换，正在读的进程不受影响
+    '''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+
+    postings = {}
+    table = []
+    for docnum, (doc_id, doc) in enumerate(sorted(docs.items())):
+        for term, tf in doc['terms'].items():
+            postings.setdefault(term, []).append((docnum, tf))
+        table.append((doc_id, doc))
+
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+        terms = {}
+        for term, entries in postings.items():
+            values = array('I')
+            for docnum, tf in entries:
+                values.append(docnum)
+                values.append(tf)
+            if sys.byteorder != 'little':
+                values.byteswap()
+            terms[term] = [f.tell(), len(entries)]
+            f.write(values.tobytes())
+
+        rows = []
+        for doc_id, doc in table:
+            inline, large = {}, {}
+            for name, value in doc['fields'].items():
+                if isinstance(value, str) and len(value) > INLINE_MAX_LENGTH:
+                    large[name] = value
+                else:
+                    inline[name] = value
+            offset, size = f.tell(), 0
+            if large:
+                data = dumps(large)
+                f.write(data)
+                size = len(data)
+            rows.append([doc_id, doc['django_ct'], doc['django_id'], doc['length'], inline, offset, size])
+
+        docs_data = dumps(rows)
+        docs_offset = f.tell()
+        f.write(docs_data)
+        terms_data = dumps(terms)
+        terms_offset = f.tell()
+        f.write(terms_data)
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, docs_offset, len(docs_data), terms_offset, len(terms_data)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,49 @@
+# 分词
+# 中文按字切成单字和相邻两个字的二元组（bigram），英文和数字按连续的单词切分，全部转成半角小写
+# 建索引时单字和二元组都保存；搜索时连续两个字以上的中文只用二元组，单个字才用单字
+import re
+import unicodedata
+
+# 中日韩统一表意文字
+_CJK = r'㐀-䶿一-鿿豈-﫿'
+_RUN_RE = re.compile(r'[{0}]+|[^\W{0}_]+'.format(_CJK))
+_CJK_RE = re.compile(r'[{}]'.format(_CJK))
+
+
+def normalize(text):
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+def _tokens(text, for_query):
+    for run in _RUN_RE.findall(normalize(text)):
+        if not _CJK_RE.match(run):
+            yield run
+            continue
+        if len(run) == 1:
+            yield run
+            continue
+        if not for_query:
+            for c in run:
+                yield c
+        for i in range(len(run) - 1):
+            yield run[i:i + 2]
+
+
+def tokenize(text):
+    '''
+    建索引用的分词
+    :return: 词的列表（有重复，用来统计词频）
+    '''
+    if not text:
+        return []
+    return list(_tokens(text, for_query=False))
+
+
+def tokenize_query(text):
+    '''
+    搜索用的分词
+    :return: 去重后的词的列表，保持原来的顺序
+    '''
+    if not text:
+        return []
+    return list(dict.fromkeys(_tokens(text, for_query=True)))
@@ -0,0 +1,44 @@
+# redis里的简单互斥锁
+# SET NX EX 加锁，值是随机的token；续期和释放时先比较token，只动自己加的锁：
+# 锁过期后被别人拿到的话，原来的持有者续期失败（应该停下来），释放时也不会删掉别人的锁
+import uuid
+
+# 值是自己的token才续期/删除，比较和修改在redis里一步完成
+_RENEW_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+'''
+
+_RELEASE_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+'''
+
+
+def acquire(con_redis, key, expires):
+    '''
+    :param expires: 锁的过期时间(秒)，持有者挂掉后锁自动释放
+    :return: 加锁成功返回token，锁已经被别人拿着时返回None
+    '''
+    token = uuid.uuid4().hex
+    if con_redis.set(key, token, nx=True, ex=expires):
+        return token
+    return None
+
+
+def renew(con_redis, key, token, expires):
+    '''
+    :return: 锁还是自己的并且续期成功时返回True
+    '''
+    return bool(con_redis.eval(_RENEW_SCRIPT, 1, key, token, expires))
+
+
+def release(con_redis, key, token):
+    '''
+    :return: 删掉了自己的锁返回True，锁已经过期或者被别人拿到时返回False
+    '''
+    return bool(con_redis.eval(_RELEASE_SCRIPT, 1, key, token))
@@ -15,6 +15,8 @@ class Code:
     ROLEERR = "4105"
     PWDERR = "4106"
 
+    REQERR = "4201"
+
     SERVERERR = "4500"
     UNKOWNERR = "4501"
 
@@ -36,6 +38,8 @@ error_map = {
     Code.ROLEERR: "用户身份错误",
     Code.PWDERR: "密码错误",
 
+    Code.REQERR: "请求过于频繁，请稍后再试",
+
     Code.SERVERERR: "内部错误",
     Code.UNKOWNERR: "未知错误",
 }
\ No newline at end of file
@@ -0,0 +1,183 @@
+# 上传文件的存储
+# 在settings的FILE_STORAGE中配置使用哪一个：
+#   FastDFSStorage 上传到FastDFS，客户端在第一次用到时才创建，每个进程一个有上限的连接池
+#   LocalStorage   保存到MEDIA_ROOT下面，没有FastDFS集群时也能跑通上传接口、做压测
+# 上传失败时抛出StorageError；保存后返回file_id，用url(file_id)得到访问地址
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('django')
+
+_storage = None
+_storage_pid = None
+_storage_lock = threading.Lock()
+
+
+class StorageError(Exception):
+    pass
+
+
+class BaseStorage(object):
+    def save(self, data, ext_name):
+        '''
+        :param data: 文件内容(bytes)
+        :param ext_name: 扩展名，不带点
+        :return: file_id
+        '''
+        raise NotImplementedError
+
+    def save_file(self, path):
+        '''
+        按文件路径保存，不把整个文件读进内存，扩展名取文件名的后缀
+        :return: file_id
+        '''
+        raise NotImplementedError
+
+    def url(self, file_id):
+        raise NotImplementedError
+
+
+class FastDFSStorage(BaseStorage):
+    '''
+    FastDFS，每个Fdfs_client保持着自己到tracker的连接，借出去一次只给一个线程用；
+    同时借出的客户端不超过POOL_SIZE个，用完放回去，上传出异常的客户端直接丢掉；
+    空闲超过HEALTH_CHECK_INTERVAL秒的客户端再借出前先查一次tracker，连不上就换一个新的
+    '''
+    def __init__(self, conf_path=None, pool_size=None, health_check_interval=None, base_url=None):
+        options = getattr(settings, 'FASTDFS_CLIENT', {})
+        self.conf_path = conf_path or options.get('CONF_PATH')
+        self.pool_size = pool_size or options.get('POOL_SIZE', 10)
+        self.health_check_interval = options.get('HEALTH_CHECK_INTERVAL', 60) \
+            if health_check_interval is None else health_check_interval
+        self.base_url = base_url or settings.FASTDFS_SERVER_DOMAIN
+        # 空闲的客户端 (客户端, 放回的时间)，后进先出，常用的几个一直保持连接
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def _new_client(self):
+        from utils.fastdfs.fdfs import new_client
+        return new_client(self.conf_path)
+
+    def _is_healthy(self, client):
+        try:
+            client.list_all_groups()
+        except Exception as e:
+            logger.warning('FastDFS连接检查失败，重新创建客户端：{}'.format(e))
+            return False
+        return True
+
+    def _acquire(self):
+        while True:
+            try:
+                client, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._new_client()
+            if time.monotonic() - released_at < self.health_check_interval or self._is_healthy(client):
+                return client
+
+    @contextmanager
+    def _client(self):
+        self._slots.acquire()
+        try:
+            client = self._acquire()
+            yield client
+            # 出异常时不会执行到这里，客户端里的连接可能已经不能用了，直接丢掉
+            self._idle.put((client, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def _upload(self, method, *args, **kwargs):
+        try:
+            with self._client() as client:
+                upload_res = getattr(client, method)(*args, **kwargs)
+        except Exception as e:
+            raise StorageError('上传到FastDFS异常：{}'.format(e))
+        if upload_res.get('Status') != 'Upload successed.':
+            raise StorageError('上传到FastDFS失败：{}'.format(upload_res.get('Status')))
+        return upload_res.get('Remote file_id')
+
+    def save(self, data, ext_name):
+        return self._upload('upload_by_buffer', data, file_ext_name=ext_name)
+
+    def save_file(self, path):
+        return self._upload('upload_by_filename', path)
+
+    def url(self, file_id):
+        return self.base_url + file_id
+
+
+class LocalStorage(BaseStorage):
+    '''
+    本地文件系统，文件保存为 <MEDIA_ROOT>/uploads/<两位>/<uuid>.<扩展名>，file_id是相对MEDIA_ROOT的路径
+    开发环境由django的static()提供访问，部署时交给nginx
+    '''
+    def __init__(self, location=None, base_url=None):
+        self.location = location or settings.MEDIA_ROOT
+        self.base_url = base_url or settings.SITE_DOMAIN_PORT.rstrip('/') + settings.MEDIA_URL
+
+    def _new_file_id(self, ext_name):
+        name = uuid.uuid4().hex
+        if ext_name:
+            name = '{}.{}'.format(name, ext_name.lower())
+        return '/'.join(('uploads', name[:2], name))
+
+    @contextmanager
+    def _open(self, file_id):
+        # 先写到临时文件再改名，访问地址上不会出现写了一半的文件
+        path = os.path.join(self.location, *file_id.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def save(self, data, ext_name):
+        file_id = self._new_file_id(ext_name)
+        try:
+            with self._open(file_id) as f:
+                f.write(data)
+        except OSError as e:
+            raise StorageError('保存文件失败：{}'.format(e))
+        return file_id
+
+    def save_file(self, path):
+        ext_name = path.rsplit('.', 1)[-1] if '.' in os.path.basename(path) else ''
+        file_id = self._new_file_id(ext_name)
+        try:
+            with open(path, 'rb') as src, self._open(file_id) as f:
+                for data in iter(lambda: src.read(64 * 1024), b''):
+                    f.write(data)
+        except OSError as e:
+            raise StorageError('保存文件失败：{}'.format(e))
+        return file_id
+
+    def url(self, file_id):
+        return self.base_url + file_id
+
+
+def get_storage():
+    '''
+    本进程的存储，第一次用到时按settings.FILE_STORAGE创建，所有线程共用；
+    fork出的子进程不沿用父进程的连接，重新创建
+    '''
+    global _storage, _storage_pid
+    if _storage is None or _storage_pid != os.getpid():
+        with _storage_lock:
+            if _storage is None or _storage_pid != os.getpid():
+                _storage = import_string(settings.FILE_STORAGE)()
+                _storage_pid = os.getpid()
+    return _storage
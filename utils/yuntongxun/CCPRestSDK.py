@@ -5,6 +5,7 @@ import datetime
 from urllib import request as urllib2
 import json
 from .xml_to_json import xmltojson
+from .transport import UrllibTransport, ResponseLost
 
 
 class REST:
@@ -18,17 +19,19 @@ class REST:
     SoftVersion = ''
     Iflog = False  # 是否打印日志
     Batch = ''  # 时间戳
-    BodyType = 'xml'  # 包体格式，可填值：json 、xml
+    BodyType = 'json'  # 包体格式，可填值：json 、xml，json解析比xml快得多（ivrDial只支持xml，不受影响）
 
     # 初始化
     # @param serverIP       必选参数    服务器地址
     # @param serverPort     必选参数    服务器端口
     # @param softVersion    必选参数    REST版本号
-    def __init__(self, ServerIP, ServerPort, SoftVersion):
+    # @param transport      可选参数    发送请求的传输层，默认每个请求新建连接（UrllibTransport）
+    def __init__(self, ServerIP, ServerPort, SoftVersion, transport=None):
 
         self.ServerIP = ServerIP
         self.ServerPort = ServerPort
         self.SoftVersion = SoftVersion
+        self.transport = transport or UrllibTransport()
 
     # 设置主帐号
     # @param AccountSid  必选参数    主帐号
@@ -93,7 +96,7 @@ class REST:
         data = ''
         req.data = body.encode()
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
 
@@ -144,7 +147,7 @@ class REST:
         data = ''
         req.data = body.encode()
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
 
@@ -195,7 +198,7 @@ class REST:
         data = ''
         req.data = body.encode()
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
 
@@ -223,14 +226,16 @@ class REST:
 
         self.accAuth()
         nowdate = datetime.datetime.now()
-        self.Batch = nowdate.strftime("%Y%m%d%H%M%S")
+        # 时间戳用局部变量，多个线程同时发送时不会互相覆盖
+        batch = nowdate.strftime("%Y%m%d%H%M%S")
+        self.Batch = batch
         # 生成sig
-        signature = self.AccountSid + self.AccountToken + self.Batch
+        signature = self.AccountSid + self.AccountToken + batch
         sig = md5(signature.encode()).hexdigest().upper()
         # 拼接URL
         url = "https://" + self.ServerIP + ":" + self.ServerPort + "/" + self.SoftVersion + "/Accounts/" + self.AccountSid + "/SMS/TemplateSMS?sig=" + sig
         # 生成auth
-        src = self.AccountSid + ":" + self.Batch
+        src = self.AccountSid + ":" + batch
         # auth = base64.encodestring(src).strip()
         auth = base64.encodebytes(src.encode()).decode().strip()
         req = urllib2.Request(url)
@@ -257,10 +262,8 @@ class REST:
             # 查找相关资料后确定为，Python 2.7.9 之后版本引入了一个新特性：
             # 当你urllib.urlopen一个 https 的时候会验证一次 SSL 证书，
             # 当目标使用的是自签名的证书时就会爆出该错误消息。
-            import ssl
-            ssl._create_default_https_context = ssl._create_unverified_context
-
-            res = urllib2.urlopen(req)
+            # 是否校验证书由transport的verify_ssl决定，不再修改全局的ssl设置
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
             if self.BodyType == 'json':
@@ -273,9 +276,17 @@ class REST:
             if self.Iflog:
                 self.log(url, body, data)
             return locations
+        except ResponseLost:
+            # 请求已经发到网关，短信可能已经发出去了，交给调用方处理，不能当作普通的失败重发
+            if self.Iflog:
+                self.log(url, body, data)
+            raise
         except Exception as error:
             if self.Iflog:
                 self.log(url, body, data)
+            if data:
+                # 收到了响应但是解析不了，同样不知道有没有发出去
+                raise ResponseLost('响应无法解析：{}'.format(error)) from error
             return {'172001': '网络错误'}
 
     # 外呼通知
@@ -326,7 +337,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
 
@@ -385,7 +396,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
 
@@ -437,7 +448,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
             xtj = xmltojson()
@@ -481,7 +492,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
 
             res.close()
@@ -522,7 +533,7 @@ class REST:
         req.add_header("Authorization", auth)
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
 
@@ -572,7 +583,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
 
@@ -613,7 +624,7 @@ class REST:
         req.add_header("Authorization", auth)
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
             res.close()
 
@@ -663,7 +674,7 @@ class REST:
         req.data = body.encode()
         data = ''
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
 
             res.close()
@@ -713,7 +724,7 @@ class REST:
         req.data = body.encode()
 
         try:
-            res = urllib2.urlopen(req)
+            res = self.transport.urlopen(req)
             data = res.read()
 
             res.close()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# 云通讯响应包体解析的性能测试
+# 使用（在项目根目录）：python -m utils.yuntongxun.benchmark -n 20000
+# legacy 是原来xmltojson的做法（fromstring建好整棵树，再对每个元素做多次children/tag/text的遍历）
+
+import argparse
+import json
+import timeit
+import xml.etree.ElementTree as ET
+
+from utils.yuntongxun.xml_to_json import xmltojson
+
+# 有代表性的几种响应包体
+PAYLOADS = {
+    'template_sms': b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response><statusCode>000000</statusCode>'
+                    b'<TemplateSMS><dateCreated>20190505103500</dateCreated>'
+                    b'<smsMessageSid>ff8080813c373cab013c94b0f0512345</smsMessageSid></TemplateSMS></Response>',
+    'error': b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response><statusCode>112300</statusCode>'
+             b'<statusMsg>error</statusMsg></Response>',
+    'sub_accounts': b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Response><statusCode>000000</statusCode>'
+                    b'<totalCount>20</totalCount>' + b''.join(
+                        b'<SubAccount><subAccountSid>%032d</subAccountSid><subToken>%032d</subToken>'
+                        b'<dateCreated>20190505103500</dateCreated><voipAccount>%014d</voipAccount>'
+                        b'<voipPwd>abcdefgh</voipPwd></SubAccount>' % (i, i, i) for i in range(20)) + b'</Response>',
+}
+
+JSON_PAYLOADS = {
+    'template_sms': b'{"statusCode": "000000", "templateSMS": {"dateCreated": "20190505103500", '
+                    b'"smsMessageSid": "ff8080813c373cab013c94b0f0512345"}}',
+    'error': b'{"statusCode": "112300", "statusMsg": "error"}',
+}
+
+
+def legacy(xml):
+    root = ET.fromstring(xml)
+    children = [c for c in root]
+    tags = [c.tag for c in children]
+    result = {}
+    items = []
+    for i, c in enumerate(children):
+        c_children = [x for x in c]
+        dict_text = dict(zip([x.tag for x in c_children], [x.text for x in c_children]))
+        if not dict_text:
+            result[tags[i]] = c.text
+        elif tags[i] == 'TemplateSMS':
+            result['templateSMS'] = dict_text
+        elif tags[i] == 'SubAccount' and 'totalCount' in tags:
+            items.append(dict_text)
+            result['SubAccount'] = items
+        else:
+            result[tags[i]] = dict_text
+    return result
+
+
+def bench(func, payload, number):
+    return number / timeit.timeit(lambda: func(payload), number=number)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='云通讯响应包体解析的性能测试')
+    parser.add_argument('-n', '--number', type=int, default=20000, help='每种包体解析的次数')
+    args = parser.parse_args()
+
+    decoder = xmltojson()
+    print('{:<14}{:>14}{:>14}{:>10}{:>14}'.format('payload', 'legacy/s', 'single-pass/s', 'speedup', 'json/s'))
+    for name, payload in PAYLOADS.items():
+        assert legacy(payload) == decoder.main(payload)
+        before = bench(legacy, payload, args.number)
+        after = bench(decoder.main, payload, args.number)
+        json_rate = bench(json.loads, JSON_PAYLOADS[name], args.number) if name in JSON_PAYLOADS else 0
+        print('{:<14}{:>14.0f}{:>14.0f}{:>9.2f}x{:>14}'.format(
+            name, before, after, after / before, '{:.0f}'.format(json_rate) if json_rate else '-'))
+
+
+if __name__ == '__main__':
+    main()
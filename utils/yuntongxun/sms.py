@@ -1,7 +1,10 @@
 # -*- coding:utf-8 -*-
 
+from concurrent.futures import ThreadPoolExecutor
+
 # 说明：主账号，登陆云通讯网站后，可在"控制台-应用"中看到开发者主账号ACCOUNT SID
 from utils.yuntongxun.CCPRestSDK import REST
+from utils.yuntongxun.transport import PooledTransport, ResponseLost
 
 _accountSid = '8aaf07086a58b9ec016a79c102921115'
 
@@ -20,6 +23,13 @@ _serverPort = "8883"
 # 说明：REST API版本号保持不变
 _softVersion = '2013-12-26'
 
+# 说明：建立连接和等待响应的超时时间，单位秒
+_connectTimeout = 3
+_readTimeout = 10
+
+# 说明：同时使用的最大连接数，也是批量发送时的并发数
+_maxConnections = 10
+
 
 class CCP(object):
     """发送短信的辅助类"""
@@ -28,7 +38,10 @@ class CCP(object):
         # 判断是否存在类属性_instance，_instance是类CCP的唯一对象，即单例
         if not hasattr(CCP, "_instance"):
             cls._instance = super(CCP, cls).__new__(cls, *args, **kwargs)
-            cls._instance.rest = REST(_serverIP, _serverPort, _softVersion)
+            # 使用keep-alive的连接池，不用每条短信都重新握手
+            transport = PooledTransport(_connectTimeout, _readTimeout, _maxConnections)
+            cls._instance.rest = REST(_serverIP, _serverPort, _softVersion, transport)
+            cls._instance.executor = ThreadPoolExecutor(max_workers=_maxConnections)
             cls._instance.rest.setAccount(_accountSid, _accountToken)
             cls._instance.rest.setAppId(_appId)
         return cls._instance
@@ -47,16 +60,28 @@ class CCP(object):
         res = None
         try:
             res = self.rest.sendTemplateSMS(to, datas, temp_id)
+        except ResponseLost as e:
+            print(e)
+            # 返回-2 表示请求已经发到云通讯，但不知道有没有发送成功，不能重发
+            return -2
         except Exception as e:
             print(e)
         # 如果云通讯发送短信成功，返回的字典数据result中statuCode字段的值为"000000"
-        if res.get("statusCode") == "000000":
+        if res and res.get("statusCode") == "000000":
             # 返回0 表示发送短信成功
             return 0
         else:
             # 返回-1 表示发送失败
             return -1
 
+    def send_template_sms_many(self, messages):
+        """
+        批量发送模板短信，分散到连接池的多个连接上并发发送
+        :param messages: [(to, datas, temp_id), ...]
+        :return: 和messages顺序一致的结果列表，0表示成功，-1表示失败，-2表示不知道是否发送成功
+        """
+        return list(self.executor.map(lambda m: self.send_template_sms(*m), messages))
+
 
 if __name__ == '__main__':
     ccp = CCP()
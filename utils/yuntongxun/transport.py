@@ -0,0 +1,157 @@
+# -*- coding: UTF-8 -*-
+# REST发送请求用的传输层
+# UrllibTransport：原来的做法，每个请求新建一次TCP+TLS连接
+# PooledTransport：按host保持keep-alive的长连接池，可以设置连接/读取超时和最大并发数
+# 请求已经发出去之后出错（读取超时、连接被断开）抛出ResponseLost，这时网关可能已经处理了请求，调用方不能重发
+import http.client
+import queue
+import select
+import socket
+import ssl
+import threading
+from urllib import error as urlerror
+from urllib import request as urllib2
+
+
+def _ssl_context(verify):
+    # 云通讯的沙箱环境使用的是自签名证书，默认不校验（和原来SDK里的处理一致）
+    if verify:
+        return ssl.create_default_context()
+    return ssl._create_unverified_context()
+
+
+class ResponseLost(Exception):
+    pass
+
+
+class Response:
+    def __init__(self, status, data):
+        self.status = status
+        self.data = data
+
+    def read(self):
+        return self.data
+
+    def close(self):
+        pass
+
+
+class UrllibTransport:
+    def __init__(self, timeout=10, verify_ssl=False):
+        self.timeout = timeout
+        self.context = _ssl_context(verify_ssl)
+
+    def urlopen(self, req):
+        try:
+            res = urllib2.urlopen(req, timeout=self.timeout, context=self.context)
+        except urlerror.HTTPError:
+            # HTTP错误状态是网关明确的响应，原样抛出
+            raise
+        except urlerror.URLError as e:
+            # urllib把连接、发送和等待响应时的错误都包装成URLError，分不清请求有没有发出去，
+            # 只有拒绝连接、域名解析失败、证书错误能确定请求没有发出
+            if isinstance(e.reason, (ConnectionRefusedError, socket.gaierror, ssl.CertificateError)):
+                raise
+            raise ResponseLost('请求网关失败：{}'.format(e.reason)) from e
+        except (OSError, http.client.HTTPException) as e:
+            raise ResponseLost('请求网关失败：{}'.format(e)) from e
+        try:
+            data = res.read()
+        except Exception as e:
+            raise ResponseLost('读取响应失败：{}'.format(e)) from e
+        finally:
+            res.close()
+        return Response(res.status, data)
+
+
+class PooledTransport:
+    # @param connect_timeout  建立连接的超时时间，单位秒
+    # @param read_timeout     等待响应的超时时间，单位秒
+    # @param max_connections  每个host最多同时使用的连接数，超过的请求会等待
+    def __init__(self, connect_timeout=3, read_timeout=10, max_connections=10, verify_ssl=False):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self.context = _ssl_context(verify_ssl)
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self, host):
+        with self._lock:
+            if host not in self._pools:
+                self._pools[host] = (queue.LifoQueue(), threading.BoundedSemaphore(self.max_connections))
+            return self._pools[host]
+
+    def _new_connection(self, scheme, host):
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, timeout=self.connect_timeout, context=self.context)
+        return http.client.HTTPConnection(host, timeout=self.connect_timeout)
+
+    def _send(self, conn, req):
+        if conn.sock is None:
+            conn.connect()
+            # 连接建立之后换成读取超时
+            conn.sock.settimeout(self.read_timeout)
+        conn.request(req.get_method(), req.selector, body=req.data, headers=dict(req.header_items()))
+
+    def _is_stale(self, conn):
+        # 空闲的连接上不应该有数据可读，可读说明服务器已经关闭了连接
+        if conn.sock is None:
+            return True
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+        return bool(readable)
+
+    def _acquire(self, idle, req):
+        while True:
+            try:
+                conn = idle.get_nowait()
+            except queue.Empty:
+                return self._new_connection(req.type, req.host), False
+            if not self._is_stale(conn):
+                return conn, True
+            conn.close()
+
+    def urlopen(self, req):
+        idle, semaphore = self._get_pool(req.host)
+        with semaphore:
+            conn, reused = self._acquire(idle, req)
+            try:
+                self._send(conn, req)
+            except ConnectionError:
+                conn.close()
+                if not reused:
+                    raise
+                # 复用的连接在发送时就断了（服务器已经关闭），请求没有发出去，换一个新连接重发一次
+                conn = self._new_connection(req.type, req.host)
+                try:
+                    self._send(conn, req)
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+
+            try:
+                res = conn.getresponse()
+                data = res.read()
+            except Exception as e:
+                # 请求已经发出去了，网关可能已经收到并发送了短信，读取出错或超时都不能重发
+                conn.close()
+                raise ResponseLost('读取响应失败：{}'.format(e)) from e
+
+            if res.will_close:
+                conn.close()
+            else:
+                idle.put(conn)
+
+        if res.status >= 400:
+            raise http.client.HTTPException('HTTP {} {}'.format(res.status, res.reason))
+        return Response(res.status, data)
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for idle, _ in pools.values():
+            while not idle.empty():
+                idle.get_nowait().close()
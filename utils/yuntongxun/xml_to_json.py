@@ -1,179 +1,47 @@
 # -*- coding: utf-8 -*-
 # python xml.etree.ElementTree
+# 把云通讯返回的XML包体转成字典，二级元素只遍历一次，不生成中间的列表
 
-import os
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
 
 
 class xmltojson:
-    # global var
-    SHOW_LOG = True
-    # XML file
-    XML_PATH = None
-    a = {}
-    m = []
 
-    def get_root(self, path):
-        """
-        parse the XML file,and get the tree of the XML file
-        finally,return the root element of the tree.
-        if the XML file dose not exist,then print the information
-        """
-        tree = ET.fromstring(path)
-        return tree
-
-    def get_element_tag(self, element):
-        """
-        return the element tag if the element is not None.
-        """
-        if element is not None:
-
-            return element.tag
-        else:
-            print('the element is None!')
-
-    def get_element_attrib(self, element):
-        """
-        return the element attrib if the element is not None.
-        """
-        if element is not None:
-
-            return element.attrib
-        else:
-            print('the element is None!')
-
-    def get_element_text(self, element):
-        """
-        return the text of the element.
-        """
-        if element is not None:
-            return element.text
-        else:
-            print('the element is None!')
-
-    def get_element_children(self, element):
-        """
-        return the element children if the element is not None.
-        """
-        if element is not None:
-
-            return [c for c in element]
-        else:
-            print('the element is None!')
-
-    def get_elements_tag(self, elements):
-        """
-        return the list of tags of element's tag
-        """
-        if elements is not None:
-            tags = []
-            for e in elements:
-                tags.append(e.tag)
-            return tags
-        else:
-            print('the elements is None!')
-
-    def get_elements_attrib(self, elements):
-        """
-        return the list of attribs of element's attrib
-        """
-        if elements is not None:
-            attribs = []
-            for a in elements:
-                attribs.append(a.attrib)
-            return attribs
-        else:
-            print('the elements is None!')
+    def decode(self, xml, list_tag):
+        """
+        把 <Response> 下面的二级元素转成字典：
+        没有子元素的取文本，有子元素的转成 {子元素名: 文本}。
+        list_tag 元素在包体里带有 totalCount 时是一个列表，否则是单个字典。
+        """
+        result = {}
+        items = []
+        has_total = False
+        # 包体只有几百字节，C实现的fromstring建树比iterparse逐个事件回调到python更快
+        for element in ET.fromstring(xml):
+            tag = element.tag
+            if tag == 'totalCount':
+                has_total = True
+            if not len(element):
+                result[tag] = element.text
+                continue
+            dict_text = {c.tag: c.text for c in element}
+            if tag == list_tag:
+                items.append(dict_text)
+                result[tag] = dict_text
+            elif tag == 'TemplateSMS':
+                result['templateSMS'] = dict_text
+            else:
+                result[tag] = dict_text
 
-    def get_elements_text(self, elements):
-        """
-        return the dict of element
-        """
-        if elements is not None:
-            text = []
-            for t in elements:
-                text.append(t.text)
-            return dict(zip(self.get_elements_tag(elements), text))
-        else:
-            print('the elements is None!')
+        # totalCount 可能出现在列表元素之后，所以遍历完再决定是不是列表
+        if has_total and items:
+            result[list_tag] = items
+        return result
 
     def main(self, xml):
-        # root
-        root = self.get_root(xml)
-
-        # children
-        children = self.get_element_children(root)
-
-        children_tags = self.get_elements_tag(children)
-
-        children_attribs = self.get_elements_attrib(children)
-
-        i = 0
-
-        # 获取二级元素的每一个子节点的名称和值
-        for c in children:
-            p = 0
-            c_children = self.get_element_children(c)
-            dict_text = self.get_elements_text(c_children)
-            if dict_text:
-                # print (children_tags[i])
-                if children_tags[i] == 'TemplateSMS':
-                    self.a['templateSMS'] = dict_text
-                else:
-                    if children_tags[i] == 'SubAccount':
-                        k = 0
-
-                        for x in children:
-                            if children_tags[k] == 'totalCount':
-                                self.m.append(dict_text)
-                                self.a['SubAccount'] = self.m
-                                p = 1
-                            k = k + 1
-                        if p == 0:
-                            self.a[children_tags[i]] = dict_text
-                    else:
-                        self.a[children_tags[i]] = dict_text
-
-            else:
-                self.a[children_tags[i]] = c.text
-            i = i + 1
-        return self.a
+        # 子帐号查询：带 totalCount 时 SubAccount 是列表
+        return self.decode(xml, 'SubAccount')
 
     def main2(self, xml):
-        # root
-        root = self.get_root(xml)
-
-        # children
-        children = self.get_element_children(root)
-
-        children_tags = self.get_elements_tag(children)
-
-        children_attribs = self.get_elements_attrib(children)
-
-        i = 0
-
-        # 获取二级元素的每一个子节点的名称和值
-        for c in children:
-            p = 0
-            c_children = self.get_element_children(c)
-            dict_text = self.get_elements_text(c_children)
-            if dict_text:
-                if children_tags[i] == 'TemplateSMS':
-                    k = 0
-
-                    for x in children:
-                        if children_tags[k] == 'totalCount':
-                            self.m.append(dict_text)
-                            self.a['TemplateSMS'] = self.m
-                            p = 1
-                        k = k + 1
-                    if p == 0:
-                        self.a[children_tags[i]] = dict_text
-                else:
-                    self.a[children_tags[i]] = dict_text
-
-            else:
-                self.a[children_tags[i]] = c.text
-            i = i + 1
-        return self.a
+        # 短信模板查询：带 totalCount 时 TemplateSMS 是列表
+        return self.decode(xml, 'TemplateSMS')